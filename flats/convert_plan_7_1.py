@@ -1,16 +1,26 @@
 from __future__ import annotations
 
+import argparse
+import itertools
 import json
-from dataclasses import dataclass
+import sys
+from dataclasses import asdict, dataclass
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
 import numpy as np
 from PIL import Image
 from scipy import ndimage as ndi
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
 from shapely.geometry import LineString, Point, Polygon
+from shapely.geometry.polygon import orient
 from shapely.ops import unary_union
 from skimage import measure
+from skimage.draw import polygon2mask
+from skimage.measure import block_reduce
+from skimage.morphology import h_maxima
+from skimage.segmentation import watershed
 
 
 ROOT = Path(__file__).resolve().parent
@@ -18,9 +28,20 @@ IMAGE_PATH = ROOT / "7.1 2Д.png"
 OUTPUT_DIR = ROOT / "testFlat4"
 OUTPUT_PATH = OUTPUT_DIR / "plan_2d_converted.json"
 
-# Dimension reference extracted via OCR: 1410 mm across 166 pixels of the plan
-REFERENCE_MM = 1410.0
-REFERENCE_PX = 166.0
+# Dimension reference: the 3400 mm inner width of the top room spans 133 pixels of the plan
+REFERENCE_MM = 3400.0
+REFERENCE_PX = 133.0
+
+# Pixels darker than this (mean over RGB) are treated as wall strokes.
+WALL_GRAY_THRESHOLD = 80
+BALCONY_FILL_COLOR = (193, 176, 213)
+BALCONY_COLOR_TOLERANCE = 30
+
+# Zone segmentation runs on a grid downsampled by this factor (pixels per cell).
+ZONE_GRID_FACTOR = 3
+# Minimal depth (in cells) of a distance-transform peak to seed its own zone.
+ZONE_MARKER_DEPTH = 2.0
+MAIN_ZONE_ID = "z_main"
 
 
 @dataclass
@@ -35,6 +56,115 @@ class PlanExtractionError(RuntimeError):
     pass
 
 
+@dataclass(frozen=True)
+class DetectorThresholds:
+    """Tunable limits of the opening/balcony detectors (pixels of the source image)
+    and of zone segmentation (millimetres and square metres of the plan)."""
+
+    window_area_min: float = 30
+    window_area_max: float = 600
+    # Distance from the window centroid to the outline side it runs along.
+    window_wall_margin: float = 12
+    window_max_thickness: float = 16
+    window_min_length: float = 11
+    # Degrees between the component's major axis and the wall direction.
+    window_max_skew: float = 10
+    balcony_area_min: float = 4000
+    balcony_area_max: float = 7000
+    door_area_min: float = 150
+    door_area_max: float = 4000
+    door_top_limit: float = 150
+    door_min_size: float = 20
+    # Shorter dark strokes are text, fixtures or dotted door swings, not walls.
+    zone_wall_min_length: float = 500
+    # Passages up to this wide are doorways between rooms; wider ones join one room.
+    zone_door_width: float = 1200
+    # Smaller zones are slivers between wall strokes, not rooms (m²).
+    zone_area_min: float = 1.0
+
+
+DEFAULT_THRESHOLDS = DetectorThresholds()
+
+# Default grid for ``--sweep``; each list replaces the corresponding threshold.
+SWEEP_GRID: Dict[str, List[float]] = {
+    "window_area_min": [20, 30, 45],
+    "window_area_max": [300, 600, 900],
+    "window_wall_margin": [6, 12, 20],
+    "balcony_area_min": [3000, 4000, 5000],
+    "balcony_area_max": [6000, 7000, 9000],
+    "door_area_min": [100, 150, 250],
+    "door_area_max": [2500, 4000, 6000],
+    "door_top_limit": [100, 150, 250],
+}
+
+
+@dataclass
+class ComponentTable:
+    """Connected components of a binary mask with areas, bounding boxes and moments.
+
+    ``cx``/``cy`` and the central second moments ``mu20``/``mu02``/``mu11`` are
+    normalised by the component mass and may be weighted by ink coverage.
+    """
+
+    labels: np.ndarray
+    area: np.ndarray
+    x0: np.ndarray
+    y0: np.ndarray
+    x1: np.ndarray
+    y1: np.ndarray
+    cx: np.ndarray
+    cy: np.ndarray
+    mu20: np.ndarray
+    mu02: np.ndarray
+    mu11: np.ndarray
+
+    def __len__(self) -> int:
+        return int(self.area.size)
+
+
+# Outline sides an opening can sit on, as stored in OpeningMeasurements.side.
+WALL_SIDES = ("bottom", "top", "left", "right")
+
+
+@dataclass
+class OpeningMeasurements:
+    """Orientation and size of every wall component, measured in one vectorised pass.
+
+    ``length``/``thickness`` are sub-pixel extents along/across the major axis
+    derived from the second moments (exact for uniform strokes); ``extent`` is
+    the bounding-box span along the wall the component is parallel to.
+    """
+
+    horizontal: np.ndarray
+    skew: np.ndarray
+    length: np.ndarray
+    thickness: np.ndarray
+    extent: np.ndarray
+    side: np.ndarray
+    wall_distance: np.ndarray
+
+
+@dataclass
+class PlanArtifacts:
+    """Everything the detectors share, computed once per image."""
+
+    image_path: Path
+    arr: np.ndarray
+    mask: np.ndarray
+    walls: ComponentTable
+    openings: OpeningMeasurements
+    balcony_fill: ComponentTable
+    outline_px: Polygon
+    outline_mm: Polygon
+    scale: float
+    minx: float
+    miny: float
+
+    @property
+    def height(self) -> int:
+        return int(self.arr.shape[0])
+
+
 def load_plan_mask(image_path: Path) -> Tuple[np.ndarray, np.ndarray]:
     image = Image.open(image_path).convert("RGB")
     arr = np.array(image)
@@ -43,6 +173,100 @@ def load_plan_mask(image_path: Path) -> Tuple[np.ndarray, np.ndarray]:
     return arr, mask
 
 
+def build_component_table(mask: np.ndarray, weights: Optional[np.ndarray] = None) -> ComponentTable:
+    labeled, num = ndi.label(mask)
+    flat = labeled.ravel()
+    area = np.bincount(flat, minlength=num + 1)[1:]
+    mass = np.ones(flat.size) if weights is None else weights.ravel().astype(float)
+    rows, cols = np.indices(mask.shape, dtype=float)
+    xs, ys = cols.ravel(), rows.ravel()
+
+    def per_label(values: np.ndarray) -> np.ndarray:
+        return np.bincount(flat, weights=mass * values, minlength=num + 1)[1:]
+
+    m00 = np.maximum(per_label(np.ones_like(xs)), np.finfo(float).tiny)
+    cx = per_label(xs) / m00
+    cy = per_label(ys) / m00
+    mu20 = np.maximum(per_label(xs * xs) / m00 - cx**2, 0.0)
+    mu02 = np.maximum(per_label(ys * ys) / m00 - cy**2, 0.0)
+    mu11 = per_label(xs * ys) / m00 - cx * cy
+    boxes = np.zeros((num, 4), dtype=np.int64)
+    for idx, slices in enumerate(ndi.find_objects(labeled)):
+        if slices is None:
+            continue
+        rows, cols = slices
+        boxes[idx] = (cols.start, rows.start, cols.stop - 1, rows.stop - 1)
+    return ComponentTable(
+        labels=labeled,
+        area=area,
+        x0=boxes[:, 0],
+        y0=boxes[:, 1],
+        x1=boxes[:, 2],
+        y1=boxes[:, 3],
+        cx=cx,
+        cy=cy,
+        mu20=mu20,
+        mu02=mu02,
+        mu11=mu11,
+    )
+
+
+def measure_openings(table: ComponentTable, outline_px: Polygon, image_height: int) -> OpeningMeasurements:
+    """Orientation, sub-pixel size and host wall of every component of ``table``.
+
+    The major axis comes from the second moments and is snapped to the nearest
+    wall direction; the host wall is the closest parallel edge of the outline
+    itself that the centroid projects onto, so recessed and L-shaped walls are
+    measured where they are. Its side is named by the edge's outward normal.
+    """
+    theta = 0.5 * np.arctan2(2.0 * table.mu11, table.mu20 - table.mu02)
+    half_sum = (table.mu20 + table.mu02) / 2.0
+    spread = np.hypot((table.mu20 - table.mu02) / 2.0, table.mu11)
+    # A uniform run of n pixels has variance (n^2 - 1) / 12.
+    length = np.sqrt(12.0 * (half_sum + spread) + 1.0)
+    thickness = np.sqrt(np.maximum(12.0 * (half_sum - spread), 0.0) + 1.0)
+
+    angle = np.degrees(np.abs(theta))
+    horizontal = angle <= 45.0
+    skew = np.where(horizontal, angle, 90.0 - angle)
+    extent = np.where(horizontal, table.x1 - table.x0 + 1, table.y1 - table.y0 + 1).astype(float)
+
+    starts, ends, edge_side = outline_walls(outline_px)
+    # Outline coordinates are y-up; rows grow downwards.
+    centers = np.column_stack([table.cx, image_height - table.cy])
+    direction = ends - starts
+    along = np.einsum("nmk,mk->nm", centers[:, None, :] - starts, direction) / np.einsum("mk,mk->m", direction, direction)
+    distances = np.linalg.norm(centers[:, None, :] - (starts + along[..., None] * direction), axis=2)
+    # Only parallel edges the centroid projects onto can host the opening.
+    distances[np.not_equal.outer(horizontal, edge_side < 2) | (along < 0.0) | (along > 1.0)] = np.inf
+    edge = np.argmin(distances, axis=1) if distances.shape[1] else np.zeros(len(centers), dtype=np.int64)
+    return OpeningMeasurements(
+        horizontal=horizontal,
+        skew=skew,
+        length=length,
+        thickness=thickness,
+        extent=extent,
+        side=edge_side[edge] if edge_side.size else np.zeros(len(centers), dtype=np.int64),
+        wall_distance=distances[np.arange(len(centers)), edge] if distances.shape[1] else np.full(len(centers), np.inf),
+    )
+
+
+def outline_walls(outline_px: Polygon, tolerance: float = 0.8) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Edges of the simplified outline: ``(m, 2)`` starts and ends and their ``WALL_SIDES`` index.
+
+    Each edge is named by its outward normal, snapped to the nearest axis.
+    """
+    ring = np.asarray(orient(simplify_polygon(outline_px, tolerance)).exterior.coords)
+    starts, ends = ring[:-1], ring[1:]
+    keep = np.any(ends != starts, axis=1)
+    starts, ends = starts[keep], ends[keep]
+    dx, dy = (ends - starts).T
+    # A counter-clockwise exterior has its outside on the right: normal (dy, -dx).
+    horizontal = np.abs(dx) >= np.abs(dy)
+    side = np.where(horizontal, np.where(dx > 0, 0, 1), np.where(dy > 0, 3, 2))
+    return starts, ends, side
+
+
 def extract_outline(mask: np.ndarray) -> Polygon:
     contours = measure.find_contours(mask.astype(float), 0.5)
     polygons: List[Polygon] = []
@@ -111,30 +335,109 @@ def to_mm(x_px: float, y_px: float, minx: float, miny: float, scale: float, heig
     return x_mm, y_mm
 
 
-def detect_windows(arr: np.ndarray, minx: float, miny: float, scale: float, outline: Polygon) -> List[Dict[str, object]]:
+def prepare_plan(image_path: Path) -> PlanArtifacts:
+    arr, mask = load_plan_mask(image_path)
+    outline_px = extract_outline(mask)
+    scale = REFERENCE_MM / REFERENCE_PX
+    outline_mm = polygon_to_mm(simplify_polygon(outline_px, 0.8), scale)
+    minx, miny, _, _ = outline_px.bounds
     gray = np.mean(arr, axis=2)
-    wall_mask = gray < 80
-    labeled, num = ndi.label(wall_mask)
-    height, width = wall_mask.shape
+    balcony_mask = np.linalg.norm(arr - np.array(BALCONY_FILL_COLOR), axis=2) < BALCONY_COLOR_TOLERANCE
+    # Moments are weighted by ink coverage so anti-aliased stroke ends count partially.
+    walls = build_component_table(gray < WALL_GRAY_THRESHOLD, weights=(255.0 - gray) / 255.0)
+    return PlanArtifacts(
+        image_path=Path(image_path),
+        arr=arr,
+        mask=mask,
+        walls=walls,
+        openings=measure_openings(walls, outline_px, arr.shape[0]),
+        balcony_fill=build_component_table(balcony_mask),
+        outline_px=outline_px,
+        outline_mm=outline_mm,
+        scale=scale,
+        minx=minx,
+        miny=miny,
+    )
+
+
+def window_candidates(
+    table: ComponentTable,
+    openings: OpeningMeasurements,
+    area_min=DEFAULT_THRESHOLDS.window_area_min,
+    area_max=DEFAULT_THRESHOLDS.window_area_max,
+    wall_margin=DEFAULT_THRESHOLDS.window_wall_margin,
+    max_thickness=DEFAULT_THRESHOLDS.window_max_thickness,
+    min_length=DEFAULT_THRESHOLDS.window_min_length,
+    max_skew=DEFAULT_THRESHOLDS.window_max_skew,
+) -> np.ndarray:
+    """Boolean mask of window components.
+
+    Thresholds may be scalars or column arrays of shape ``(k, 1)``; in the latter
+    case the result is a ``(k, n)`` matrix, one row per threshold combination.
+    """
+    # Thin components running along any exterior wall, close to it
+    return (
+        (table.area >= area_min)
+        & (table.area <= area_max)
+        & (openings.wall_distance <= wall_margin)
+        & (openings.thickness <= max_thickness)
+        & (openings.length >= min_length)
+        & (openings.skew <= max_skew)
+    )
+
+
+def balcony_candidates(
+    table: ComponentTable,
+    area_min=DEFAULT_THRESHOLDS.balcony_area_min,
+    area_max=DEFAULT_THRESHOLDS.balcony_area_max,
+) -> np.ndarray:
+    return (table.area >= area_min) & (table.area <= area_max)
+
+
+def door_candidates(
+    table: ComponentTable,
+    area_min=DEFAULT_THRESHOLDS.door_area_min,
+    area_max=DEFAULT_THRESHOLDS.door_area_max,
+    top_limit=DEFAULT_THRESHOLDS.door_top_limit,
+    min_size=DEFAULT_THRESHOLDS.door_min_size,
+) -> np.ndarray:
+    return (
+        (table.area >= area_min)
+        & (table.area <= area_max)
+        & (table.y0 <= top_limit)
+        & (table.x1 - table.x0 >= min_size)
+        & (table.y1 - table.y0 >= min_size)
+    )
+
+
+def select_balcony(table: ComponentTable, candidates: np.ndarray) -> np.ndarray:
+    """Index of the top-most candidate (ties broken by label) per row, -1 if none."""
+    if candidates.shape[-1] == 0:
+        return np.full(candidates.shape[:-1], -1)
+    order = np.where(candidates, table.y0 * (len(table) + 1) + np.arange(len(table)), np.iinfo(np.int64).max)
+    chosen = np.argmin(order, axis=-1)
+    return np.where(np.any(candidates, axis=-1), chosen, -1)
+
+
+def select_door(candidates: np.ndarray) -> np.ndarray:
+    """Index of the first candidate in label order per row, -1 if none."""
+    if candidates.shape[-1] == 0:
+        return np.full(candidates.shape[:-1], -1)
+    chosen = np.argmax(candidates, axis=-1)
+    return np.where(np.any(candidates, axis=-1), chosen, -1)
+
+
+def _window_entries(plan: PlanArtifacts, indices: Iterable[int]) -> List[Dict[str, object]]:
+    table = plan.walls
+    indices = np.asarray(list(indices), dtype=np.int64)
+    centers_mm = zip(
+        ((table.cx[indices] - plan.minx) * plan.scale).tolist(),
+        ((plan.height - table.cy[indices] - plan.miny) * plan.scale).tolist(),
+    )
+    widths_mm = (plan.openings.length[indices] * plan.scale).tolist()
     raw_entries: List[Dict[str, object]] = []
-    for idx in range(1, num + 1):
-        component = labeled == idx
-        area = int(component.sum())
-        if not (30 <= area <= 600):
-            continue
-        ys, xs = np.where(component)
-        if ys.size == 0:
-            continue
-        y0, y1 = ys.min(), ys.max()
-        x0, x1 = xs.min(), xs.max()
-        # Only consider thin horizontal components near нижняя стена
-        if (y0 < height - 50) or (y1 - y0 > 15) or (x1 - x0 < 10):
-            continue
-        cx_px = (x0 + x1) / 2.0
-        cy_px = (y0 + y1) / 2.0
-        center_mm = to_mm(cx_px, cy_px, minx, miny, scale, height)
-        width_mm = (x1 - x0 + 1) * scale
-        projection = project_point_to_outline(center_mm, outline)
+    for center_mm, width_mm in zip(centers_mm, widths_mm):
+        projection = project_point_to_outline(center_mm, plan.outline_mm)
         raw_entries.append(
             {
                 "edge": [
@@ -151,65 +454,29 @@ def detect_windows(arr: np.ndarray, minx: float, miny: float, scale: float, outl
     return raw_entries
 
 
-def detect_balcony(arr: np.ndarray, minx: float, miny: float, scale: float) -> Tuple[List[List[float]], Polygon]:
-    target_color = np.array([193, 176, 213])
-    mask = np.linalg.norm(arr - target_color, axis=2) < 30
-    labeled, num = ndi.label(mask)
-    areas = ndi.sum(mask, labeled, index=range(1, num + 1))
-    candidates: List[Tuple[int, int]] = []
-    for label_idx, area in enumerate(areas, start=1):
-        if 4000 <= area <= 7000:
-            ys, _ = np.where(labeled == label_idx)
-            if ys.size == 0:
-                continue
-            candidates.append((int(ys.min()), label_idx))
-    if not candidates:
-        raise PlanExtractionError("Не удалось определить геометрию балкона")
-    top_candidate = min(candidates)[1]
-    component_mask = labeled == top_candidate
+def _balcony_geometry(plan: PlanArtifacts, index: int) -> Tuple[List[List[float]], Polygon]:
+    component_mask = plan.balcony_fill.labels == index + 1
     contour = max(measure.find_contours(component_mask.astype(float), 0.5), key=len)
-    height = arr.shape[0]
     coords = []
     for y, x in contour:
-        x_mm, y_mm = to_mm(float(x), float(y), minx, miny, scale, height)
+        x_mm, y_mm = to_mm(float(x), float(y), plan.minx, plan.miny, plan.scale, plan.height)
         coords.append((x_mm, y_mm))
-    polygon = Polygon(coords).simplify(5)
+    # About half a pixel: drops the contour's staircase, keeps the real corners.
+    polygon = Polygon(coords).simplify(0.6 * plan.scale)
     vertices = [[round(x, 1), round(y, 1)] for x, y in polygon.exterior.coords]
     return vertices, polygon
 
 
-def detect_balcony_door(arr: np.ndarray, minx: float, miny: float, scale: float, outline: Polygon) -> Dict[str, object]:
-    gray = np.mean(arr, axis=2)
-    wall_mask = gray < 80
-    labeled, num = ndi.label(wall_mask)
-    height = wall_mask.shape[0]
-    door_candidate = None
-    for idx in range(1, num + 1):
-        component = labeled == idx
-        area = int(component.sum())
-        if not (150 <= area <= 4000):
-            continue
-        ys, xs = np.where(component)
-        if ys.size == 0:
-            continue
-        if ys.min() > 150:
-            continue
-        x0, x1 = xs.min(), xs.max()
-        y0, y1 = ys.min(), ys.max()
-        width = x1 - x0
-        height_px = y1 - y0
-        if width < 20 or height_px < 20:
-            continue
-        door_candidate = (x0, y0, x1, y1)
-        break
-    if door_candidate is None:
-        raise PlanExtractionError("Не удалось определить дверной проём на балкон")
-    x0, y0, x1, y1 = door_candidate
+def _door_entry(plan: PlanArtifacts, index: int) -> Dict[str, object]:
+    table = plan.walls
+    x0, y0, x1, y1 = table.x0[index], table.y0[index], table.x1[index], table.y1[index]
     cx_px = (x0 + x1) / 2.0
     cy_px = (y0 + y1) / 2.0
-    center_mm = to_mm(cx_px, cy_px, minx, miny, scale, height)
-    width_mm = (x1 - x0 + 1) * scale
-    projection = project_point_to_outline(center_mm, outline)
+    center_mm = to_mm(cx_px, cy_px, plan.minx, plan.miny, plan.scale, plan.height)
+    # Door symbols are frames and swing arcs rather than uniform strokes, so their
+    # width is the span along the wall picked by the moment orientation.
+    width_mm = plan.openings.extent[index] * plan.scale
+    projection = project_point_to_outline(center_mm, plan.outline_mm)
     door = {
         "id": "door_balcony_1",
         "edge": [
@@ -217,7 +484,7 @@ def detect_balcony_door(arr: np.ndarray, minx: float, miny: float, scale: float,
             [round(projection.edge[1][0], 1), round(projection.edge[1][1], 1)],
         ],
         "offset": round(projection.offset, 1),
-        "width": round(width_mm, 1),
+        "width": round(float(width_mm), 1),
         "height": 2040.0,
         "swing": "out",
         "hinge": "right",
@@ -227,20 +494,289 @@ def detect_balcony_door(arr: np.ndarray, minx: float, miny: float, scale: float,
     return door
 
 
+def detect_windows(plan: PlanArtifacts, thresholds: DetectorThresholds = DEFAULT_THRESHOLDS) -> List[Dict[str, object]]:
+    candidates = window_candidates(
+        plan.walls,
+        plan.openings,
+        thresholds.window_area_min,
+        thresholds.window_area_max,
+        thresholds.window_wall_margin,
+        thresholds.window_max_thickness,
+        thresholds.window_min_length,
+        thresholds.window_max_skew,
+    )
+    return _window_entries(plan, np.flatnonzero(candidates))
+
+
+def detect_balcony(
+    plan: PlanArtifacts, thresholds: DetectorThresholds = DEFAULT_THRESHOLDS
+) -> Tuple[List[List[float]], Polygon]:
+    table = plan.balcony_fill
+    candidates = balcony_candidates(table, thresholds.balcony_area_min, thresholds.balcony_area_max)
+    index = int(select_balcony(table, candidates))
+    if index < 0:
+        raise PlanExtractionError("Не удалось определить геометрию балкона")
+    return _balcony_geometry(plan, index)
+
+
+def detect_balcony_door(plan: PlanArtifacts, thresholds: DetectorThresholds = DEFAULT_THRESHOLDS) -> Dict[str, object]:
+    candidates = door_candidates(
+        plan.walls,
+        thresholds.door_area_min,
+        thresholds.door_area_max,
+        thresholds.door_top_limit,
+        thresholds.door_min_size,
+    )
+    index = int(select_door(candidates))
+    if index < 0:
+        raise PlanExtractionError("Не удалось определить дверной проём на балкон")
+    return _door_entry(plan, index)
+
+
+def wall_strokes(plan: PlanArtifacts, min_length: float = DEFAULT_THRESHOLDS.zone_wall_min_length) -> np.ndarray:
+    """Pixel mask of the wall components whose bounding box spans at least ``min_length`` mm."""
+    table = plan.walls
+    longest = np.maximum(table.x1 - table.x0, table.y1 - table.y0) + 1
+    keep = np.concatenate([[False], longest * plan.scale >= min_length])
+    return keep[table.labels]
+
+
+def free_space_grid(
+    plan: PlanArtifacts,
+    exclude: Sequence[Polygon] = (),
+    factor: int = ZONE_GRID_FACTOR,
+    wall_min_length: float = DEFAULT_THRESHOLDS.zone_wall_min_length,
+    exclude_margin: float = 0.0,
+) -> np.ndarray:
+    """Cells of the downsampled grid that lie inside the outline and contain no wall stroke.
+
+    Cells within ``exclude_margin`` mm of an ``exclude`` polygon are left out with it.
+    """
+    walls = block_reduce(wall_strokes(plan, wall_min_length), (factor, factor), np.max)
+    shape = walls.shape
+
+    def to_grid(coords: np.ndarray) -> np.ndarray:
+        coords = coords / plan.scale + (plan.minx, plan.miny)
+        rows = (plan.height - coords[:, 1]) / factor - 0.5
+        cols = coords[:, 0] / factor - 0.5
+        return np.column_stack([rows, cols])
+
+    # The simplified millimetre outline has a few dozen vertices instead of thousands.
+    inside = polygon2mask(shape, to_grid(np.asarray(plan.outline_mm.exterior.coords)))
+    for polygon in exclude:
+        area = polygon.buffer(exclude_margin) if exclude_margin > 0 else polygon
+        inside &= ~polygon2mask(shape, to_grid(np.asarray(area.exterior.coords)))
+    # A one-cell opening drops slivers between the strokes of hollow walls.
+    return ndi.binary_opening(inside & ~walls)
+
+
+def label_zones(free: np.ndarray, merge_distance: float = np.inf, marker_depth: float = ZONE_MARKER_DEPTH) -> np.ndarray:
+    """Watershed basins of the free-space distance map, merged across wide passages.
+
+    Long rooms get a seed per bulge; two basins whose saddle on their shared border
+    is further than ``merge_distance`` cells from any wall are one room.
+    """
+    distance = ndi.distance_transform_edt(free)
+    markers, _ = ndi.label(h_maxima(distance, marker_depth))
+    labels = watershed(-distance, markers, mask=free)
+    return merge_basins(labels, distance, merge_distance)
+
+
+def merge_basins(labels: np.ndarray, distance: np.ndarray, merge_distance: float) -> np.ndarray:
+    """Relabel ``labels`` so basins linked by a border cell pair above ``merge_distance`` share a label."""
+    pairs = []
+    for first, second, first_distance, second_distance in (
+        (labels[:, :-1], labels[:, 1:], distance[:, :-1], distance[:, 1:]),
+        (labels[:-1], labels[1:], distance[:-1], distance[1:]),
+    ):
+        wide = (first != second) & (first > 0) & (second > 0) & (np.minimum(first_distance, second_distance) > merge_distance)
+        pairs.append(np.column_stack([first[wide], second[wide]]))
+    pairs = np.concatenate(pairs)
+    count = int(labels.max()) + 1
+    graph = coo_matrix((np.ones(len(pairs)), (pairs[:, 0], pairs[:, 1])), shape=(count, count))
+    _, roots = connected_components(graph, directed=False)
+    return np.where(labels > 0, roots[labels] + 1, 0)
+
+
+def polygonize_labels(labels: np.ndarray) -> Dict[int, List[np.ndarray]]:
+    """Trace every labelled region of ``labels`` into closed rings of grid vertices.
+
+    All cell boundaries are extracted at once; each boundary between two regions
+    is produced a single time and handed to both of them in opposite directions.
+    Rings are ``(m, 2)`` arrays of ``(row, col)`` vertices without the closing point.
+    """
+    padded = np.pad(labels, 1)
+    cols = labels.shape[1] + 1
+
+    above, below = padded[:-1, 1:-1], padded[1:, 1:-1]
+    hr, hc = np.nonzero(above != below)
+    left, right = padded[1:-1, :-1], padded[1:-1, 1:]
+    vr, vc = np.nonzero(left != right)
+
+    h_start, h_end = hr * cols + hc, hr * cols + hc + 1
+    v_start, v_end = vr * cols + vc, (vr + 1) * cols + vc
+    # Cells are walked clockwise on screen: top edge left-to-right, left edge upwards.
+    owners = np.concatenate([below[hr, hc], above[hr, hc], right[vr, vc], left[vr, vc]])
+    starts = np.concatenate([h_start, h_end, v_end, v_start])
+    ends = np.concatenate([h_end, h_start, v_start, v_end])
+    keep = owners > 0
+    owners, starts, ends = owners[keep], starts[keep], ends[keep]
+
+    order = np.argsort(owners, kind="stable")
+    owners, starts, ends = owners[order], starts[order], ends[order]
+    bounds = np.flatnonzero(np.diff(owners)) + 1
+    group_labels = owners[np.concatenate([[0], bounds])] if owners.size else owners
+    rings: Dict[int, List[np.ndarray]] = {}
+    for label, group_starts, group_ends in zip(group_labels, np.split(starts, bounds), np.split(ends, bounds)):
+        rings[int(label)] = _chain_edges(group_starts, group_ends, cols)
+    return rings
+
+
+def _chain_edges(starts: np.ndarray, ends: np.ndarray, cols: int) -> List[np.ndarray]:
+    outgoing: Dict[int, List[int]] = {}
+    for idx, start in enumerate(starts.tolist()):
+        outgoing.setdefault(start, []).append(idx)
+    used = np.zeros(starts.size, dtype=bool)
+    rings: List[np.ndarray] = []
+    for first in range(starts.size):
+        if used[first]:
+            continue
+        vertices = [int(starts[first])]
+        current = first
+        while True:
+            used[current] = True
+            vertex = int(ends[current])
+            if vertex == vertices[0]:
+                break
+            vertices.append(vertex)
+            options = [idx for idx in outgoing[vertex] if not used[idx]]
+            if len(options) > 1:
+                # Pinch point: take the sharpest right turn so diagonal neighbours stay apart.
+                previous = int(starts[current])
+                heading = (vertex // cols - previous // cols, vertex % cols - previous % cols)
+                options.sort(key=lambda idx: _turn_rank(heading, int(starts[idx]), int(ends[idx]), cols))
+            current = options[0]
+        ring = np.array([divmod(v, cols) for v in vertices], dtype=float)
+        rings.append(_drop_collinear(ring))
+    return rings
+
+
+def _turn_rank(heading: Tuple[int, int], start: int, end: int, cols: int) -> int:
+    step = (end // cols - start // cols, end % cols - start % cols)
+    cross = heading[0] * step[1] - heading[1] * step[0]
+    dot = heading[0] * step[0] + heading[1] * step[1]
+    # In (row, col) space a clockwise (right) turn has a negative cross product.
+    if cross < 0:
+        return 0
+    if dot > 0:
+        return 1
+    return 2
+
+
+def _drop_collinear(ring: np.ndarray) -> np.ndarray:
+    before = ring - np.roll(ring, 1, axis=0)
+    after = np.roll(ring, -1, axis=0) - ring
+    turns = before[:, 0] * after[:, 1] - before[:, 1] * after[:, 0]
+    return ring[turns != 0]
+
+
+def segment_zones(
+    plan: PlanArtifacts,
+    exclude: Sequence[Polygon] = (),
+    thresholds: DetectorThresholds = DEFAULT_THRESHOLDS,
+    factor: int = ZONE_GRID_FACTOR,
+) -> List[Dict[str, object]]:
+    """Split the free space of the plan into rooms, largest first.
+
+    Rooms are the wall-bounded spaces joined only through doorways up to
+    ``zone_door_width``. Free space within half a door width of an ``exclude``
+    polygon is left out and zones smaller than ``zone_area_min`` are dropped.
+    The largest zone keeps the ``z_main`` id so that openings referring to it
+    stay valid; the others are numbered by decreasing area.
+    """
+    cell_mm = factor * plan.scale
+    # Strips between a balcony fill and its walls (split off by dimension lines), the
+    # walls themselves and the door gap in front of it belong to the balcony.
+    free = free_space_grid(plan, exclude, factor, thresholds.zone_wall_min_length, thresholds.zone_door_width / 2.0)
+    labels = label_zones(free, thresholds.zone_door_width / 2.0 / cell_mm)
+    polygons: List[Polygon] = []
+    for label, rings in polygonize_labels(labels).items():
+        shells = []
+        for ring in rings:
+            if len(ring) < 3:
+                continue
+            xs = (ring[:, 1] * factor - plan.minx) * plan.scale
+            ys = (plan.height - ring[:, 0] * factor - plan.miny) * plan.scale
+            shell = Polygon(np.column_stack([xs, ys]))
+            # Clockwise on screen turns into clockwise in y-up millimetres too: holes come out CCW.
+            if shell.is_valid and not shell.exterior.is_ccw:
+                shells.append(shell)
+        if not shells:
+            continue
+        polygon = orient(max(shells, key=lambda p: p.area)).simplify(cell_mm, preserve_topology=True)
+        if polygon.area >= thresholds.zone_area_min * 1e6:
+            polygons.append(polygon)
+    polygons.sort(key=lambda p: p.area, reverse=True)
+
+    zones: List[Dict[str, object]] = []
+    for idx, polygon in enumerate(polygons, start=1):
+        main = idx == 1
+        zones.append(
+            {
+                "id": MAIN_ZONE_ID if main else f"z_{idx}",
+                "name": "Жилая зона" if main else f"Зона {idx}",
+                "polygon": [[round(x, 1), round(y, 1)] for x, y in polygon.exterior.coords],
+                "area": round(polygon.area / 1e6, 2),
+            }
+        )
+    return zones
+
+
+def zone_at(zones: Sequence[Dict[str, object]], edge: Sequence[Sequence[float]], offset: float) -> str:
+    """Id of the zone closest to the point ``offset`` mm along ``edge``."""
+    point = LineString(edge).interpolate(offset)
+    best = min(zones, key=lambda zone: Polygon(zone["polygon"]).distance(point))
+    return str(best["id"])
+
+
+def left_wall(outline: Polygon) -> List[List[float]]:
+    """The longest outline edge on its left side, bottom to top; the entrance is drawn there."""
+    coords = np.asarray(outline.exterior.coords)
+    starts, ends = coords[:-1], coords[1:]
+    minx = coords[:, 0].min()
+    on_left = (np.abs(starts[:, 0] - minx) < 1.0) & (np.abs(ends[:, 0] - minx) < 1.0)
+    idx = np.flatnonzero(on_left)[np.argmax(np.abs(ends[on_left, 1] - starts[on_left, 1]))]
+    bottom, top = sorted((starts[idx], ends[idx]), key=lambda point: point[1])
+    return [[round(float(v), 1) for v in bottom], [round(float(v), 1) for v in top]]
+
+
 def build_json(
     outline_mm: Polygon,
     windows: List[Dict[str, object]],
     balcony_vertices: List[List[float]],
     balcony_door: Dict[str, object],
+    zones: Optional[List[Dict[str, object]]] = None,
 ) -> dict:
     minx, miny, maxx, maxy = outline_mm.bounds
     outline_coords = [[round(x, 1), round(y, 1)] for x, y in outline_mm.exterior.coords]
 
-    entrance_edge = [[round(0.0, 1), round(123.2, 1)], [round(0.0, 1), round(1813.5, 1)]]
+    entrance_edge = left_wall(outline_mm)
+    entrance_zone = MAIN_ZONE_ID
+    if zones:
+        entrance_zone = zone_at(zones, entrance_edge, 900.0)
+        balcony_door = {**balcony_door, "from": zone_at(zones, balcony_door["edge"], balcony_door["offset"])}
+    else:
+        zones = [
+            {
+                "id": MAIN_ZONE_ID,
+                "name": "Жилая зона",
+                "polygon": outline_coords,
+            }
+        ]
 
     return {
         "version": "apartment.v1",
-        "units": {"length": "mm"},
+        "units": {"length": "mm", "area": "m2"},
         "coordinateSystem": {
             "origin": [0.0, 0.0],
             "x": "right",
@@ -260,15 +796,9 @@ def build_json(
             "swing": "in",
             "hinge": "left",
             "from": "exterior",
-            "to": "z_main",
+            "to": entrance_zone,
         },
-        "zones": [
-            {
-                "id": "z_main",
-                "name": "Жилая зона",
-                "polygon": outline_coords,
-            }
-        ],
+        "zones": zones,
         "balconies": [
             {
                 "id": "balcony_1",
@@ -301,19 +831,292 @@ def build_json(
     }
 
 
-def main() -> None:
-    arr, mask = load_plan_mask(IMAGE_PATH)
-    outline_px = extract_outline(mask)
-    scale = REFERENCE_MM / REFERENCE_PX
-    outline_mm = polygon_to_mm(simplify_polygon(outline_px, 0.8), scale)
-    minx, miny, _, _ = outline_px.bounds
-    windows = detect_windows(arr, minx, miny, scale, outline_mm)
-    balcony_vertices, _ = detect_balcony(arr, minx, miny, scale)
-    balcony_door = detect_balcony_door(arr, minx, miny, scale, outline_mm)
-    plan_json = build_json(outline_mm, windows, balcony_vertices, balcony_door)
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    OUTPUT_PATH.write_text(json.dumps(plan_json, ensure_ascii=False, indent=2), encoding="utf-8")
-    print(f"Saved {OUTPUT_PATH}")
+def validate_apartment(plan_json: dict) -> List[str]:
+    """Return a list of problems that make ``plan_json`` an unusable apartment.v1 record."""
+    errors: List[str] = []
+    if plan_json.get("version") != "apartment.v1":
+        errors.append("version must be apartment.v1")
+    if len(plan_json.get("outline", {}).get("vertices", [])) < 4:
+        errors.append("outline has fewer than 3 distinct vertices")
+    zones = plan_json.get("zones", [])
+    if not zones:
+        errors.append("no zones")
+    for zone in zones:
+        if len(zone.get("polygon", [])) < 4:
+            errors.append(f"{zone.get('id')} polygon is degenerate")
+    windows = plan_json.get("openings", {}).get("windows", [])
+    if not windows:
+        errors.append("no windows detected")
+    for window in windows:
+        if window.get("width", 0.0) <= 0.0:
+            errors.append(f"{window.get('id')} has non-positive width")
+    for balcony in plan_json.get("balconies", []):
+        if len(balcony.get("polygon", [])) < 4:
+            errors.append(f"{balcony.get('id')} polygon is degenerate")
+    doors = plan_json.get("openings", {}).get("doors", [])
+    if not doors:
+        errors.append("no balcony door detected")
+    for door in doors:
+        if door.get("width", 0.0) <= 0.0:
+            errors.append(f"{door.get('id')} has non-positive width")
+    return errors
+
+
+def convert_plan(plan: PlanArtifacts, thresholds: DetectorThresholds = DEFAULT_THRESHOLDS) -> dict:
+    windows = detect_windows(plan, thresholds)
+    balcony_vertices, balcony_polygon = detect_balcony(plan, thresholds)
+    balcony_door = detect_balcony_door(plan, thresholds)
+    zones = segment_zones(plan, exclude=[balcony_polygon], thresholds=thresholds)
+    return build_json(plan.outline_mm, windows, balcony_vertices, balcony_door, zones)
+
+
+def _grid_product(grid: Dict[str, Sequence[float]], names: Sequence[str]) -> Dict[str, np.ndarray]:
+    """Cartesian product of ``grid`` restricted to ``names`` as ``(k, 1)`` columns."""
+    values = [np.asarray(grid[name], dtype=float) for name in names]
+    mesh = np.meshgrid(*values, indexing="ij") if values else []
+    return {name: column.reshape(-1, 1) for name, column in zip(names, mesh)}
+
+
+def sweep_plan(plan: PlanArtifacts, grid: Dict[str, Sequence[float]]) -> List[Dict[str, object]]:
+    """Evaluate every threshold combination of ``grid`` against one prepared plan.
+
+    Each detector is evaluated only over the product of its own parameters, as a
+    single ``(k, n)`` boolean matrix over the component table. Full outputs are
+    materialised and validated once per distinct detector outcome.
+    """
+    defaults = asdict(DEFAULT_THRESHOLDS)
+    unknown = set(grid) - set(defaults)
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {', '.join(sorted(unknown))}")
+    full_grid = {name: list(grid.get(name, [value])) for name, value in defaults.items()}
+    groups = {
+        prefix: [name for name in defaults if name.startswith(prefix + "_")]
+        for prefix in ("window", "balcony", "door")
+    }
+    columns = {prefix: _grid_product(full_grid, names) for prefix, names in groups.items()}
+
+    def params(prefix: str) -> List[np.ndarray]:
+        return [columns[prefix][name] for name in groups[prefix]]
+
+    window_rows = window_candidates(plan.walls, plan.openings, *params("window"))
+    balcony_rows = select_balcony(plan.balcony_fill, balcony_candidates(plan.balcony_fill, *params("balcony")))
+    door_rows = select_door(door_candidates(plan.walls, *params("door")))
+
+    window_sets, window_index = np.unique(window_rows, axis=0, return_inverse=True)
+    window_index = window_index.reshape(-1)
+    outcomes: Dict[Tuple[int, int, int], List[str]] = {}
+    results: List[Dict[str, object]] = []
+    for wi, bi, di in itertools.product(
+        range(window_rows.shape[0]), range(balcony_rows.shape[0]), range(door_rows.shape[0])
+    ):
+        key = (int(window_index[wi]), int(balcony_rows[bi]), int(door_rows[di]))
+        if key not in outcomes:
+            outcomes[key] = _validate_outcome(plan, window_sets[key[0]], key[1], key[2])
+        thresholds = {name: float(columns["window"][name][wi, 0]) for name in groups["window"]}
+        thresholds.update({name: float(columns["balcony"][name][bi, 0]) for name in groups["balcony"]})
+        thresholds.update({name: float(columns["door"][name][di, 0]) for name in groups["door"]})
+        errors = outcomes[key]
+        results.append(
+            {
+                "thresholds": thresholds,
+                "windows": int(window_sets[key[0]].sum()),
+                "balcony": key[1] >= 0,
+                "door": key[2] >= 0,
+                "valid": not errors,
+                "errors": errors,
+            }
+        )
+    return results
+
+
+def _validate_outcome(plan: PlanArtifacts, window_mask: np.ndarray, balcony_index: int, door_index: int) -> List[str]:
+    if balcony_index < 0:
+        return ["no balcony detected"]
+    if door_index < 0:
+        return ["no balcony door detected"]
+    windows = _window_entries(plan, np.flatnonzero(window_mask))
+    balcony_vertices, _ = _balcony_geometry(plan, balcony_index)
+    door = _door_entry(plan, door_index)
+    return validate_apartment(build_json(plan.outline_mm, windows, balcony_vertices, door))
+
+
+def sweep_catalog(image_paths: Sequence[Path], grid: Dict[str, Sequence[float]]) -> Dict[str, object]:
+    per_image = []
+    for image_path in image_paths:
+        per_image.append((Path(image_path), sweep_plan(prepare_plan(image_path), grid)))
+    combinations = []
+    for rows in zip(*(results for _, results in per_image)):
+        combinations.append(
+            {
+                "thresholds": rows[0]["thresholds"],
+                "validImages": sum(1 for row in rows if row["valid"]),
+                "images": [
+                    {"image": str(path), **{k: v for k, v in row.items() if k != "thresholds"}}
+                    for (path, _), row in zip(per_image, rows)
+                ],
+            }
+        )
+    combinations.sort(key=lambda c: -c["validImages"])
+    return {
+        "images": [str(path) for path, _ in per_image],
+        "grid": {name: list(values) for name, values in grid.items()},
+        "combinations": combinations,
+    }
+
+
+def print_sweep_summary(report: Dict[str, object], limit: int = 10) -> None:
+    combinations = report["combinations"]
+    total_images = len(report["images"])
+    fully_valid = [c for c in combinations if c["validImages"] == total_images]
+    print(f"{len(fully_valid)}/{len(combinations)} threshold combinations are valid for all {total_images} image(s)")
+    swept = list(report["grid"])
+    for combination in combinations[:limit]:
+        values = ", ".join(f"{name}={combination['thresholds'][name]:g}" for name in swept)
+        print(f"  {combination['validImages']}/{total_images}  {values}")
+
+
+class JsonlPlanWriter:
+    """Append compact apartment.v1 records to a JSON Lines stream, optionally sharded.
+
+    Every record gets a line in ``<stream>.index.jsonl`` with the shard file name,
+    byte offset and length, so a single plan can be read back with one seek.
+    ``count`` covers the whole stream, ``written`` only this writer's records.
+    """
+
+    def __init__(self, path: Path, shard_size: Optional[int] = None) -> None:
+        if shard_size is not None and shard_size < 1:
+            raise ValueError("shard_size must be positive")
+        self.path = Path(path)
+        self.shard_size = shard_size
+        self.index_path = index_path_for(self.path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.count = 0
+        self.written = 0
+        if self.index_path.exists():
+            with self.index_path.open("rb") as fh:
+                self.count = sum(1 for line in fh if line.strip())
+        self._shard: Optional[Path] = None
+        self._stream = None
+        self._index = self.index_path.open("a", encoding="utf-8")
+
+    def shard_path(self, number: int) -> Path:
+        if self.shard_size is None:
+            return self.path
+        return self.path.with_name(f"{self.path.stem}-{number:05d}{self.path.suffix}")
+
+    def write(self, plan_id: str, plan_json: dict) -> Dict[str, object]:
+        shard = self.shard_path(self.count // self.shard_size if self.shard_size else 0)
+        if shard != self._shard:
+            if self._stream is not None:
+                self._stream.close()
+            self._stream = shard.open("ab")
+            self._shard = shard
+        record = json.dumps({"id": plan_id, **plan_json}, ensure_ascii=False, separators=(",", ":"))
+        payload = record.encode("utf-8") + b"\n"
+        offset = self._stream.seek(0, 2)
+        self._stream.write(payload)
+        self._stream.flush()
+        entry = {"id": plan_id, "file": shard.name, "offset": offset, "length": len(payload)}
+        self._index.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._index.flush()
+        self.count += 1
+        self.written += 1
+        return entry
+
+    def close(self) -> None:
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+        self._index.close()
+
+    def __enter__(self) -> "JsonlPlanWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def index_path_for(stream_path: Path) -> Path:
+    stream_path = Path(stream_path)
+    return stream_path.with_name(f"{stream_path.stem}.index.jsonl")
+
+
+def read_jsonl_record(stream_path: Path, plan_id: str) -> dict:
+    """Load the latest record with ``plan_id`` from a stream written by :class:`JsonlPlanWriter`."""
+    stream_path = Path(stream_path)
+    entry = None
+    with index_path_for(stream_path).open("r", encoding="utf-8") as fh:
+        for line in fh:
+            if line.strip():
+                candidate = json.loads(line)
+                if candidate["id"] == plan_id:
+                    entry = candidate
+    if entry is None:
+        raise KeyError(plan_id)
+    with (stream_path.parent / entry["file"]).open("rb") as fh:
+        fh.seek(entry["offset"])
+        return json.loads(fh.read(entry["length"]))
+
+
+def output_path_for(image_path: Path, image_count: int, output: Path) -> Path:
+    if image_count == 1:
+        return output
+    return output.parent / f"{Path(image_path).stem}.json"
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Convert a 2D apartment plan image into apartment.v1 JSON")
+    parser.add_argument("images", nargs="*", type=Path, default=[IMAGE_PATH], help="Plan images to convert")
+    parser.add_argument("--output", type=Path, default=OUTPUT_PATH,
+                        help="Output JSON (with several images, files are written next to it by image name)")
+    parser.add_argument("--jsonl", type=Path, default=None,
+                        help="Append compact records to this JSON Lines stream instead of writing one file per image")
+    parser.add_argument("--shard-size", type=int, default=None,
+                        help="With --jsonl, start a new numbered shard every N records")
+    parser.add_argument("--sweep", action="store_true", help="Evaluate a grid of detector thresholds instead of converting")
+    parser.add_argument("--sweep-grid", type=Path, default=None,
+                        help="JSON object mapping threshold names to lists of values (defaults to SWEEP_GRID)")
+    parser.add_argument("--sweep-report", type=Path, default=None, help="Where to write the full sweep report as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    if args.sweep:
+        grid = SWEEP_GRID
+        if args.sweep_grid is not None:
+            grid = json.loads(args.sweep_grid.read_text(encoding="utf-8"))
+        report = sweep_catalog(args.images, grid)
+        print_sweep_summary(report)
+        if args.sweep_report is not None:
+            args.sweep_report.parent.mkdir(parents=True, exist_ok=True)
+            args.sweep_report.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+            print(f"Saved {args.sweep_report}")
+        return
+
+    if args.jsonl is not None:
+        failures = 0
+        with JsonlPlanWriter(args.jsonl, args.shard_size) as writer:
+            for image_path in args.images:
+                try:
+                    plan_json = convert_plan(prepare_plan(image_path))
+                except PlanExtractionError as exc:
+                    failures += 1
+                    print(f"Skipped {image_path}: {exc}", file=sys.stderr)
+                    continue
+                entry = writer.write(Path(image_path).stem, plan_json)
+                print(f"Appended {image_path} to {entry['file']} @ {entry['offset']}")
+        print(f"Saved {writer.written} record(s), {writer.count} in stream, index {writer.index_path}")
+        if failures:
+            raise SystemExit(1)
+        return
+
+    for image_path in args.images:
+        plan_json = convert_plan(prepare_plan(image_path))
+        output_path = output_path_for(image_path, len(args.images), args.output)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        output_path.write_text(json.dumps(plan_json, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"Saved {output_path}")
 
 
 if __name__ == "__main__":
@@ -4,23 +4,45 @@
 from __future__ import annotations
 
 import argparse
+import hashlib
 import json
 import math
-from dataclasses import dataclass
+import os
+import re
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass, field, replace
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Iterable, List, Sequence, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, TextIO, Tuple, Union
 
 import matplotlib
 
 matplotlib.use("Agg")
+from matplotlib import artist as martist
 from matplotlib import pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 from mpl_toolkits.mplot3d import Axes3D  # noqa: F401 - side effect registration
-from mpl_toolkits.mplot3d.art3d import Poly3DCollection
+from mpl_toolkits.mplot3d.art3d import Line3DCollection, Poly3DCollection
 import numpy as np
 
 
 Vec3 = Tuple[float, float, float]
 Vec2 = Tuple[float, float]
+# A hex string or an RGB triple in [0, 1].
+Color = Union[str, Vec3]
+
+LABEL_STYLE = {"ha": "center", "va": "bottom", "fontsize": 9, "color": "#3a2d2a", "weight": "bold"}
+TITLE_STYLE = {"fontsize": 16, "fontweight": "bold", "color": "#3a2d2a"}
+FIGURE_SIZE = (11, 7)
 
 
 @dataclass
@@ -30,6 +52,281 @@ class RenderContext:
     toon_levels: int = 4
     min_intensity: float = 0.35
     max_intensity: float = 1.05
+    lod: Optional["LodPolicy"] = None
+
+    def shading_key(self) -> Tuple[float, ...]:
+        return (*(float(v) for v in self.light_direction), self.toon_levels, self.min_intensity, self.max_intensity)
+
+    def cache_key(self) -> str:
+        """Everything besides the room itself that changes generated geometry."""
+        lod = None if self.lod is None else self.lod.cache_key()
+        return json.dumps({"shading": self.shading_key(), "outline": self.outline_width, "lod": lod})
+
+
+@dataclass
+class PolyBlock:
+    """Polygons with the same vertex count, stored as flat arrays."""
+
+    verts: np.ndarray  # (n, k, 3)
+    facecolors: np.ndarray  # (n, 4) RGBA
+    edgecolors: np.ndarray  # (n, 4) RGBA
+    linewidths: np.ndarray  # (n,)
+    # Outward normals of closed opaque solids; only these faces may be back-face culled.
+    normals: Optional[np.ndarray] = None  # (n, 3)
+
+    def __len__(self) -> int:
+        return int(self.verts.shape[0])
+
+    def select(self, mask: np.ndarray) -> "PolyBlock":
+        normals = None if self.normals is None else self.normals[mask]
+        return PolyBlock(self.verts[mask], self.facecolors[mask], self.edgecolors[mask], self.linewidths[mask], normals)
+
+
+@dataclass
+class SegmentBlock:
+    segments: np.ndarray  # (n, 2, 3)
+    color: Tuple[float, float, float]
+    linewidth: float
+
+
+@dataclass
+class PointBlock:
+    points: np.ndarray  # (n, 3)
+    color: Tuple[float, float, float]
+    size: float
+    alpha: float
+
+
+@dataclass
+class Label:
+    position: Tuple[float, float, float]
+    text: str
+
+
+@dataclass
+class KindStats:
+    calls: int = 0
+    polygons: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+
+
+@dataclass
+class RenderStats:
+    """Polygon counts and timings per room and item kind, plus whole-render stages.
+
+    Rooms are keyed by ``(position in the layout, name)``, so rooms sharing a
+    name are reported separately.
+    """
+
+    rooms: Dict[Tuple[int, str], Dict[str, KindStats]] = field(default_factory=dict)
+    stages: Dict[str, float] = field(default_factory=dict)
+
+    def reset_rooms(self) -> None:
+        self.rooms.clear()
+
+    @contextmanager
+    def measure(self, scene: "Scene", room: Tuple[int, str], kind: str) -> Iterator[None]:
+        first_block = len(scene.polys)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = self.rooms.setdefault(room, {}).setdefault(kind, KindStats())
+            entry.seconds += time.perf_counter() - started
+            entry.calls += 1
+            entry.batches += len(scene.polys) - first_block
+            entry.polygons += sum(len(block) for block in scene.polys[first_block:])
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - started
+
+    @property
+    def total_polygons(self) -> int:
+        return sum(entry.polygons for kinds in self.rooms.values() for entry in kinds.values())
+
+    def to_dict(self) -> dict:
+        rooms = [
+            {
+                "index": index,
+                "name": name,
+                "polygons": sum(entry.polygons for entry in kinds.values()),
+                "seconds": sum(entry.seconds for entry in kinds.values()),
+                "kinds": {kind: asdict(entry) for kind, entry in kinds.items()},
+            }
+            for (index, name), kinds in sorted(self.rooms.items())
+        ]
+        return {"total_polygons": self.total_polygons, "stages": dict(self.stages), "rooms": rooms}
+
+    def table(self) -> str:
+        rows = [(f"{index} {name}", kind, entry) for (index, name), kinds in self.rooms.items() for kind, entry in kinds.items()]
+        rows.sort(key=lambda row: row[2].seconds, reverse=True)
+        width = max([len(room) for room, _, _ in rows] + [4])
+        kind_width = max([len(kind) for _, kind, _ in rows] + [4])
+        lines = [f"{'room':<{width}}  {'kind':<{kind_width}} {'calls':>5} {'polygons':>9} {'ms':>8}"]
+        for room, kind, entry in rows:
+            lines.append(f"{room:<{width}}  {kind:<{kind_width}} {entry.calls:>5} {entry.polygons:>9} {entry.seconds * 1e3:>8.1f}")
+        lines.append(f"total polygons: {self.total_polygons}")
+        for name, seconds in self.stages.items():
+            lines.append(f"{name}: {seconds * 1e3:.1f} ms")
+        return "\n".join(lines)
+
+
+def write_stats(stats: RenderStats, path: Path) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(stats.to_dict(), ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+@dataclass
+class Scene:
+    """Geometry collected by the draw_* helpers and submitted as a few large artists.
+
+    Creating one ``Poly3DCollection`` per face makes matplotlib pay its per-artist
+    draw and depth-sort overhead thousands of times; here faces only become
+    artists in :meth:`flush`.
+    """
+
+    polys: List[PolyBlock] = field(default_factory=list)
+    segments: List[SegmentBlock] = field(default_factory=list)
+    points: List[PointBlock] = field(default_factory=list)
+    labels: List[Label] = field(default_factory=list)
+    # (2, 3) min/max corners of closed opaque room shells (floor, walls, ceiling).
+    occluders: List[np.ndarray] = field(default_factory=list)
+    stats: Optional[RenderStats] = None
+
+    def measure(self, room: Tuple[int, str], kind: str):
+        return nullcontext() if self.stats is None else self.stats.measure(self, room, kind)
+
+    @property
+    def polygon_count(self) -> int:
+        return sum(len(block) for block in self.polys)
+
+    def add_polys(
+        self,
+        verts: np.ndarray,
+        colors: np.ndarray,
+        outline: Color,
+        linewidth: float,
+        alpha: float = 1.0,
+        normals: Optional[np.ndarray] = None,
+    ) -> None:
+        verts = np.asarray(verts, dtype=float)
+        if verts.ndim != 3 or verts.shape[0] == 0:
+            return
+        count = verts.shape[0]
+        facecolors = np.empty((count, 4))
+        facecolors[:, :3] = np.asarray(colors, dtype=float).reshape(-1, 3)
+        facecolors[:, 3] = alpha
+        edgecolors = np.empty((count, 4))
+        edgecolors[:, :3] = to_rgb(outline)
+        edgecolors[:, 3] = alpha
+        if normals is not None:
+            normals = np.asarray(normals, dtype=float).reshape(count, 3)
+        self.polys.append(PolyBlock(verts, facecolors, edgecolors, np.full(count, float(linewidth)), normals))
+
+    def add_surface(
+        self,
+        x: np.ndarray,
+        y: np.ndarray,
+        z: np.ndarray,
+        colors: np.ndarray,
+        outline: Color,
+        alpha: float,
+        linewidth: float = 0.0,
+    ) -> None:
+        """Add the quads of a ``plot_surface``-style grid; ``colors[i, j]`` shades quad ``(i, j)``."""
+        face_colors = np.broadcast_to(np.asarray(colors, dtype=float), x.shape + (3,))[:-1, :-1]
+        self.add_polys(grid_quads(np.stack([x, y, z], axis=-1)), face_colors.reshape(-1, 3), outline, linewidth, alpha)
+
+    def add_segments(self, segments: np.ndarray, color: Color, linewidth: float) -> None:
+        segments = np.asarray(segments, dtype=float).reshape(-1, 2, 3)
+        if segments.shape[0]:
+            self.segments.append(SegmentBlock(segments, to_rgb(color), linewidth))
+
+    def add_points(self, points: np.ndarray, color: Tuple[float, float, float], size: float, alpha: float) -> None:
+        self.points.append(PointBlock(np.asarray(points, dtype=float).reshape(-1, 3), tuple(color), size, alpha))
+
+    def add_label(self, position: Sequence[float], text: str) -> None:
+        self.labels.append(Label(tuple(float(v) for v in position), text))
+
+    def add_occluder(self, mins: Sequence[float], maxs: Sequence[float]) -> None:
+        box = np.array([mins, maxs], dtype=float)
+        if (box[1] > box[0]).all():
+            self.occluders.append(box)
+
+    def translated(self, offset: Sequence[float]) -> "Scene":
+        """A copy moved by ``offset``; geometry arrays are new, colours are shared."""
+        offset = np.asarray(offset, dtype=float)
+        return Scene(
+            polys=[replace(block, verts=block.verts + offset) for block in self.polys],
+            segments=[replace(block, segments=block.segments + offset) for block in self.segments],
+            points=[replace(block, points=block.points + offset) for block in self.points],
+            labels=[Label(tuple(float(v) for v in np.add(label.position, offset)), label.text) for label in self.labels],
+            occluders=[box + offset for box in self.occluders],
+        )
+
+    def extend(self, other: "Scene") -> None:
+        self.polys.extend(other.polys)
+        self.segments.extend(other.segments)
+        self.points.extend(other.points)
+        self.labels.extend(other.labels)
+        self.occluders.extend(other.occluders)
+
+    def merged_polys(self) -> Optional[PolyBlock]:
+        """All polygons as one block; shorter polygons repeat their last vertex."""
+        if not self.polys:
+            return None
+        width = max(block.verts.shape[1] for block in self.polys)
+        verts = []
+        for block in self.polys:
+            pad = width - block.verts.shape[1]
+            if pad:
+                tail = np.repeat(block.verts[:, -1:, :], pad, axis=1)
+                verts.append(np.concatenate([block.verts, tail], axis=1))
+            else:
+                verts.append(block.verts)
+        return PolyBlock(
+            verts=np.concatenate(verts),
+            facecolors=np.concatenate([block.facecolors for block in self.polys]),
+            edgecolors=np.concatenate([block.edgecolors for block in self.polys]),
+            linewidths=np.concatenate([block.linewidths for block in self.polys]),
+        )
+
+    def flush(self, ax) -> None:
+        # One collection keeps mplot3d's per-polygon depth sort global. The sort
+        # reorders face and edge colours but not line widths, so faces without an
+        # outline get a transparent edge instead of a zero width. Sorting by the
+        # nearest vertex matches the old one-artist-per-face ordering.
+        merged = self.merged_polys()
+        if merged is not None:
+            edgecolors = merged.edgecolors.copy()
+            edgecolors[merged.linewidths <= 0, 3] = 0.0
+            poly = Poly3DCollection(merged.verts, zsort="min")
+            poly.set_facecolor(merged.facecolors)
+            poly.set_edgecolor(edgecolors)
+            poly.set_linewidth(float(merged.linewidths.max()))
+            ax.add_collection3d(poly)
+        for block in self.segments:
+            lines = Line3DCollection(block.segments, colors=[block.color], linewidths=block.linewidth)
+            ax.add_collection3d(lines)
+        for block in self.points:
+            pts = block.points
+            ax.scatter(pts[:, 0], pts[:, 1], pts[:, 2], color=block.color, s=block.size, alpha=block.alpha)
+        for label in self.labels:
+            x, y, z = label.position
+            ax.text(x, y, z, label.text, **LABEL_STYLE)
+
+
+def grid_quads(grid: np.ndarray) -> np.ndarray:
+    """Quads of a ``(rows, cols, 3)`` surface grid, as ``plot_surface`` builds them with stride 1."""
+    quads = np.stack([grid[:-1, :-1], grid[:-1, 1:], grid[1:, 1:], grid[1:, :-1]], axis=2)
+    return quads.reshape(-1, 4, 3)
 
 
 @dataclass
@@ -40,7 +337,165 @@ class FurnitureInfo:
     rotation: float
     elevation: float
 
-
+    def aabb(self) -> np.ndarray:
+        """``(2, 3)`` world-space bounds of the rotated box."""
+        theta = math.radians(self.rotation)
+        cos_t, sin_t = abs(math.cos(theta)), abs(math.sin(theta))
+        half = self.size / 2.0
+        extent = np.array([cos_t * half[0] + sin_t * half[1], sin_t * half[0] + cos_t * half[1], half[2]])
+        return np.stack([self.center - extent, self.center + extent])
+
+
+# Side of a furniture index cell in metres, about one piece of furniture.
+INDEX_CELL = 1.0
+
+
+def _boxes_in_view(bounds: np.ndarray, view: View, viewport: Viewport) -> np.ndarray:
+    """Mask of ``(m, 2, 3)`` boxes that reach into the camera frustum of ``viewport``."""
+    corners = np.stack([bounds[:, [i, j, k], [0, 1, 2]] for i in (0, 1) for j in (0, 1) for k in (0, 1)], axis=1)
+    screen, depth = view.project(corners)
+    front = depth > NEAR_DEPTH
+    # Boxes straddling the eye plane are kept; their projection is unbounded.
+    straddle = front.any(axis=1) & ~front.all(axis=1)
+    pixels = viewport.to_pixels(np.where(front[..., None], screen, 0.0))
+    lo = np.where(front[..., None], pixels, np.inf).min(axis=1)
+    hi = np.where(front[..., None], pixels, -np.inf).max(axis=1)
+    top = viewport.top
+    inside = (hi[:, 0] >= 0) & (lo[:, 0] <= viewport.width) & (hi[:, 1] >= top) & (lo[:, 1] <= top + viewport.height)
+    return straddle | (front.all(axis=1) & inside)
+
+
+class FurnitureIndex:
+    """Uniform grid over the floor-plan bounds of furniture, shared by every room of a layout.
+
+    Anchors are keyed by ``(room number, label)``, so equal labels in different
+    rooms do not collide, even in rooms sharing a name. Box and radius queries
+    only visit the cells they overlap; frustum queries descend a quadtree of
+    cell bounds built on first use.
+    """
+
+    def __init__(self, cell: float = INDEX_CELL) -> None:
+        self.cell = cell
+        self.items: List[FurnitureInfo] = []
+        # (number, name) of the room each piece belongs to.
+        self.rooms: List[Tuple[int, str]] = []
+        self._bounds: List[np.ndarray] = []
+        self._cells: Dict[Tuple[int, int], List[int]] = {}
+        self._anchors: Dict[Tuple[int, str], int] = {}
+        self._levels: Optional[List[Dict[Tuple[int, int], np.ndarray]]] = None
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def _cell_range(self, lo: np.ndarray, hi: np.ndarray) -> Iterator[Tuple[int, int]]:
+        (i0, j0), (i1, j1) = np.floor(lo[:2] / self.cell).astype(int), np.floor(hi[:2] / self.cell).astype(int)
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                yield i, j
+
+    def add(self, room: Tuple[int, str], info: FurnitureInfo) -> int:
+        """Index ``info`` for ``room`` = ``(number, name)``; a later piece with the same label there takes over the anchor."""
+        idx = len(self.items)
+        bounds = info.aabb()
+        self.items.append(info)
+        self.rooms.append(room)
+        self._bounds.append(bounds)
+        for key in self._cell_range(*bounds):
+            self._cells.setdefault(key, []).append(idx)
+        self._anchors[(room[0], info.label)] = idx
+        self._levels = None
+        return idx
+
+    def anchor(self, room: int, label: str) -> Optional[FurnitureInfo]:
+        """The piece labelled ``label`` in room number ``room``, if any."""
+        idx = self._anchors.get((room, label))
+        return None if idx is None else self.items[idx]
+
+    def bounds(self) -> np.ndarray:
+        """``(n, 2, 3)`` bounds of every indexed piece, in insertion order."""
+        return np.array(self._bounds).reshape(-1, 2, 3)
+
+    def query(self, mins: Sequence[float], maxs: Sequence[float]) -> List[int]:
+        """Indices of furniture whose bounds intersect the box ``mins``–``maxs``."""
+        lo, hi = np.asarray(mins, dtype=float), np.asarray(maxs, dtype=float)
+        found = set()
+        for key in self._cell_range(lo, hi):
+            for idx in self._cells.get(key, ()):
+                if idx not in found:
+                    b_lo, b_hi = self._bounds[idx]
+                    if np.all(b_lo <= hi) and np.all(b_hi >= lo):
+                        found.add(idx)
+        return sorted(found)
+
+    def near(self, point: Sequence[float], radius: float) -> List[int]:
+        """Indices of furniture whose bounds come within ``radius`` of ``point``."""
+        point = np.asarray(point, dtype=float)
+        candidates = self.query(point - radius, point + radius)
+        return [idx for idx in candidates if np.linalg.norm(point - np.clip(point, *self._bounds[idx])) <= radius]
+
+    def overlaps(self, tolerance: float = 0.01) -> List[Tuple[int, int]]:
+        """Pairs ``(i, j)``, ``i < j``, whose bounds interpenetrate by more than ``tolerance`` on every axis."""
+        pairs = set()
+        for members in self._cells.values():
+            for pos, i in enumerate(members):
+                for j in members[pos + 1:]:
+                    a, b = self._bounds[i], self._bounds[j]
+                    if np.all(np.minimum(a[1], b[1]) - np.maximum(a[0], b[0]) > tolerance):
+                        pairs.add((min(i, j), max(i, j)))
+        return sorted(pairs)
+
+    def _hierarchy(self) -> List[Dict[Tuple[int, int], np.ndarray]]:
+        """Cell bounds per level: level 0 holds the grid cells, each next one merges 2x2 blocks."""
+        if self._levels is None:
+            level = {
+                key: np.stack([np.min([self._bounds[i][0] for i in members], axis=0), np.max([self._bounds[i][1] for i in members], axis=0)])
+                for key, members in self._cells.items()
+            }
+            levels = [level]
+            while len(level) > 4:
+                parents: Dict[Tuple[int, int], np.ndarray] = {}
+                for (i, j), bounds in level.items():
+                    key = (i >> 1, j >> 1)
+                    merged = parents.get(key)
+                    parents[key] = bounds if merged is None else np.stack([np.minimum(merged[0], bounds[0]), np.maximum(merged[1], bounds[1])])
+                level = parents
+                levels.append(level)
+            self._levels = levels
+        return self._levels
+
+    def visible(self, view: View, viewport: Viewport, pad: float = 0.0) -> List[int]:
+        """Indices of furniture whose bounds, grown by ``pad``, reach into the camera frustum of ``viewport``.
+
+        Whole quadtree nodes outside the frustum are skipped, so the cost follows
+        the visible part of the layout rather than its size.
+        """
+        if not self.items:
+            return []
+        levels = self._hierarchy()
+        keys = list(levels[-1])
+        for depth in range(len(levels) - 1, -1, -1):
+            level = levels[depth]
+            boxes = np.array([level[key] for key in keys]) + [[-pad], [pad]]
+            keys = [key for key, seen in zip(keys, _boxes_in_view(boxes, view, viewport)) if seen]
+            if not keys:
+                return []
+            if depth:
+                below = levels[depth - 1]
+                keys = [child for i, j in keys for child in ((2 * i, 2 * j), (2 * i + 1, 2 * j), (2 * i, 2 * j + 1), (2 * i + 1, 2 * j + 1)) if child in below]
+        candidates = sorted({idx for key in keys for idx in self._cells[key]})
+        boxes = np.array([self._bounds[idx] for idx in candidates]) + [[-pad], [pad]]
+        return [idx for idx, seen in zip(candidates, _boxes_in_view(boxes, view, viewport)) if seen]
+
+
+# Bounds of the per-process memo caches; a long --serve run sees an open-ended
+# stream of colours, angles and sizes.
+COLOR_CACHE_SIZE = 4096
+ROTATION_CACHE_SIZE = 4096
+TEMPLATE_CACHE_SIZE = 2048
+SHADE_CACHE_SIZE = 16384
+
+
+@lru_cache(maxsize=COLOR_CACHE_SIZE)
 def hex_to_rgb(color: str) -> Tuple[float, float, float]:
     color = color.lstrip("#")
     if len(color) == 3:
@@ -51,6 +506,58 @@ def hex_to_rgb(color: str) -> Tuple[float, float, float]:
     return r, g, b
 
 
+def to_rgb(color: Color) -> Tuple[float, float, float]:
+    if isinstance(color, str):
+        return hex_to_rgb(color)
+    r, g, b = color
+    return float(r), float(g), float(b)
+
+
+class Palette:
+    """Colours of a layout interned once; the IR refers to them by index.
+
+    ``colors`` is the ``(N, 3)`` RGB table, so per-face colours are a fancy-index
+    gather instead of one hex parse per face.
+    """
+
+    def __init__(self) -> None:
+        self.hex: List[str] = []
+        self._rgb: List[Tuple[float, float, float]] = []
+        self._index: Dict[str, int] = {}
+        self._table: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.hex)
+
+    def __getstate__(self) -> dict:
+        return {"hex": self.hex}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__()
+        for color in state["hex"]:
+            self.index(color)
+
+    def index(self, color: str) -> int:
+        key = color.lower()
+        idx = self._index.get(key)
+        if idx is None:
+            idx = self._index[key] = len(self.hex)
+            self.hex.append(color)
+            self._rgb.append(hex_to_rgb(color))
+            self._table = None
+        return idx
+
+    def rgb(self, index: int) -> Tuple[float, float, float]:
+        return self._rgb[index]
+
+    @property
+    def colors(self) -> np.ndarray:
+        if self._table is None:
+            self._table = np.array(self._rgb, dtype=float).reshape(-1, 3)
+            self._table.setflags(write=False)
+        return self._table
+
+
 def rotate_xy(x: float, y: float, angle_deg: float) -> Tuple[float, float]:
     theta = math.radians(angle_deg)
     cos_t, sin_t = math.cos(theta), math.sin(theta)
@@ -59,9 +566,44 @@ def rotate_xy(x: float, y: float, angle_deg: float) -> Tuple[float, float]:
     return xr, yr
 
 
+@lru_cache(maxsize=ROTATION_CACHE_SIZE)
+def rotation_z(angle_deg: float) -> np.ndarray:
+    """Read-only 3x3 matrix rotating about the vertical axis."""
+    theta = math.radians(angle_deg)
+    cos_t, sin_t = math.cos(theta), math.sin(theta)
+    rot = np.array([[cos_t, -sin_t, 0.0], [sin_t, cos_t, 0.0], [0.0, 0.0, 1.0]])
+    rot.setflags(write=False)
+    return rot
+
+
+def transform_points(points: np.ndarray, rotation: float, offset: Sequence[float] = (0.0, 0.0, 0.0)) -> np.ndarray:
+    """Rotate ``(..., 3)`` points about z and translate them, in one matmul."""
+    points = np.asarray(points, dtype=float)
+    if rotation:
+        points = points @ rotation_z(float(rotation)).T
+    return points + np.asarray(offset, dtype=float)
+
+
+@lru_cache(maxsize=None)
+def unit_grid(n_u: int, n_v: int) -> Tuple[np.ndarray, np.ndarray]:
+    """``(n_v, n_u)`` meshgrid over [-0.5, 0.5]²; scale it to the item size."""
+    uu, vv = np.meshgrid(np.linspace(-0.5, 0.5, n_u), np.linspace(-0.5, 0.5, n_v))
+    uu.setflags(write=False)
+    vv.setflags(write=False)
+    return uu, vv
+
+
+@lru_cache(maxsize=None)
+def unit_sphere(n_u: int, n_v: int) -> np.ndarray:
+    """``(n_v, n_u, 3)`` points of the unit sphere, longitude along u and colatitude along v."""
+    uu, vv = np.meshgrid(np.linspace(0, 2 * math.pi, n_u), np.linspace(0, math.pi, n_v))
+    sphere = np.stack((np.cos(uu) * np.sin(vv), np.sin(uu) * np.sin(vv), np.cos(vv)), axis=-1)
+    sphere.setflags(write=False)
+    return sphere
+
+
 def apply_offset(base: np.ndarray, offset: Sequence[float], rotation: float) -> np.ndarray:
-    ox, oy = rotate_xy(offset[0], offset[1], rotation)
-    return np.array([base[0] + ox, base[1] + oy, base[2] + offset[2]])
+    return transform_points(offset, rotation, base)
 
 
 def normalize(vector: np.ndarray) -> np.ndarray:
@@ -76,28 +618,35 @@ def normalize(vector: np.ndarray) -> np.ndarray:
     return arr / lengths
 
 
+def toon_shade_batch(base_colors: np.ndarray, normals: np.ndarray, ctx: RenderContext) -> np.ndarray:
+    """Quantised cartoon shading for ``(..., 3)`` normals; colours broadcast against them."""
+    normals = np.asarray(normals, dtype=float)
+    if normals.shape[-1:] != (3,):
+        raise ValueError("Normals must be 3D vectors")
+    lengths = np.sqrt(np.einsum("...i,...i->...", normals, normals))
+    lengths = np.where(lengths == 0, 1.0, lengths)
+    # abs(): always keep faces lit from the cartoon sun
+    dots = np.minimum(np.abs(normals @ ctx.light_direction) / lengths, 1.0)
+    # A single level stays flat toon shading: every face gets min_intensity.
+    dots = np.round(dots * (ctx.toon_levels - 1)) / max(1, ctx.toon_levels - 1)
+    intensities = ctx.min_intensity + (ctx.max_intensity - ctx.min_intensity) * dots
+    return np.clip(np.asarray(base_colors, dtype=float) * intensities[..., None], 0.0, 1.0)
+
+
 def toon_shade(base_color: Tuple[float, float, float], normal: np.ndarray, ctx: RenderContext) -> Tuple[float, float, float]:
-    normal = normalize(normal)
+    normal = np.asarray(normal, dtype=float)
     if normal.shape != (3,):
         raise ValueError("Normal must be a 3D vector")
-    dot = float(np.dot(normal, ctx.light_direction))
-    if dot < 0:
-        dot = -dot  # always keep faces lit from the cartoon sun
-    dot = max(0.0, min(1.0, dot))
-    if ctx.toon_levels > 1:
-        dot = round(dot * (ctx.toon_levels - 1)) / (ctx.toon_levels - 1)
-    intensity = ctx.min_intensity + (ctx.max_intensity - ctx.min_intensity) * dot
-    shaded = tuple(np.clip(np.array(base_color) * intensity, 0.0, 1.0))
-    return shaded
-
-
-def add_poly(ax, vertices: Sequence[Sequence[float]], color: Tuple[float, float, float], outline: str, ctx: RenderContext) -> None:
-    poly = Poly3DCollection([vertices])
-    poly.set_facecolor(color)
-    poly.set_edgecolor(outline)
-    poly.set_linewidth(ctx.outline_width)
-    poly.set_alpha(1.0)
-    ax.add_collection3d(poly)
+    return tuple(toon_shade_batch(base_color, normal, ctx))
+
+
+def face_normals(faces: np.ndarray) -> np.ndarray:
+    """Unnormalised normals of ``(n, k, 3)`` planar faces from their first three vertices."""
+    return np.cross(faces[:, 1] - faces[:, 0], faces[:, 2] - faces[:, 1])
+
+
+def add_poly(scene: Scene, vertices: Sequence[Sequence[float]], color: Tuple[float, float, float], outline: Color, ctx: RenderContext) -> None:
+    scene.add_polys([vertices], [color], outline, ctx.outline_width)
 
 
 def create_box_faces(center: np.ndarray, size: np.ndarray, rotation: float) -> Tuple[np.ndarray, List[List[int]]]:
@@ -115,13 +664,9 @@ def create_box_faces(center: np.ndarray, size: np.ndarray, rotation: float) -> T
             [-hx, hy, hz],
         ]
     )
-    if rotation:
-        cos_t, sin_t = math.cos(math.radians(rotation)), math.sin(math.radians(rotation))
-        rot = np.array([[cos_t, -sin_t, 0.0], [sin_t, cos_t, 0.0], [0.0, 0.0, 1.0]])
-        corners = corners @ rot.T
-    corners += center
+    corners = transform_points(corners, rotation, center)
     faces = [
-        [0, 1, 2, 3],  # bottom
+        [0, 3, 2, 1],  # bottom
         [4, 5, 6, 7],  # top
         [0, 1, 5, 4],  # front
         [1, 2, 6, 5],  # right
@@ -131,23 +676,141 @@ def create_box_faces(center: np.ndarray, size: np.ndarray, rotation: float) -> T
     return corners, faces
 
 
-def draw_box(ax, center: np.ndarray, size: np.ndarray, rotation: float, color: str, outline: str, ctx: RenderContext) -> None:
-    base_color = hex_to_rgb(color)
-    corners, faces = create_box_faces(center, size, rotation)
-    for idx in faces:
-        face = corners[idx]
-        v1 = face[1] - face[0]
-        v2 = face[2] - face[1]
-        normal = np.cross(v1, v2)
-        shade = toon_shade(base_color, normal, ctx)
-        add_poly(ax, face, shade, outline, ctx)
+@dataclass(frozen=True)
+class MeshTemplate:
+    """Faces of a reusable mesh in its local frame, centred on the origin."""
+
+    key: Tuple
+    faces: np.ndarray  # (n, k, 3)
+    normals: np.ndarray  # (n, 3) shading normals
+    # Cloth meshes shade with grid-space slopes that do not turn with the item.
+    rotate_normals: bool = True
+
+    def place(self, rotation: float, center: Sequence[float]) -> np.ndarray:
+        return transform_points(self.faces, rotation, center)
+
+
+def _box_template(size: Tuple[float, ...], resolution: Tuple[int, ...]) -> Tuple[np.ndarray, np.ndarray, bool]:
+    corners, faces = create_box_faces(np.zeros(3), np.array(size), 0.0)
+    quads = corners[np.array(faces)]
+    return quads, face_normals(quads), True
+
+
+def _ellipsoid_template(size: Tuple[float, ...], resolution: Tuple[int, ...]) -> Tuple[np.ndarray, np.ndarray, bool]:
+    rx, ry, rz = size
+    grid = unit_sphere(*resolution) * (rx, ry, rz)
+    normals = grid.copy()
+    if rz:
+        normals[..., 2] *= rx / rz
+    else:
+        normals[..., 2] = 1.0
+    return grid_quads(grid), normals[:-1, :-1].reshape(-1, 3), True
 
 
-def draw_floor(ax, room: dict, ctx: RenderContext) -> None:
-    origin = np.array(room["origin"], dtype=float)
-    width, depth = room["size"]
-    floor_color = hex_to_rgb(room["floor"]["color"])
-    x0, y0 = origin
+def _throw_template(size: Tuple[float, ...], resolution: Tuple[int, ...]) -> Tuple[np.ndarray, np.ndarray, bool]:
+    length, ripple, depth = size
+    grid_u, grid_v = unit_grid(*resolution)
+    uu, vv = grid_u * length, grid_v * depth
+    amplitude = ripple if ripple > 0 else 0.015
+    wave = amplitude * np.sin(uu * 3.2 / max(length, 0.5)) * np.cos(vv * 2.6 / max(depth, 0.5))
+    slope = np.gradient(wave)
+    normals = np.stack((-slope[0], -slope[1], np.ones_like(wave)), axis=-1)
+    return grid_quads(np.stack((uu, vv, wave), axis=-1)), normals[:-1, :-1].reshape(-1, 3), False
+
+
+def _drape_template(size: Tuple[float, ...], resolution: Tuple[int, ...]) -> Tuple[np.ndarray, np.ndarray, bool]:
+    depth, width, height = size
+    grid_u, grid_v = unit_grid(*resolution)
+    uu, vv = grid_u * width, (grid_v + 0.5) * height
+    ripple = 0.05 * np.sin(uu * 4 / max(width, 0.5))
+    slope = np.gradient(ripple + vv)
+    normals = np.stack((-slope[0], -slope[1], np.ones_like(uu)), axis=-1)
+    sheet = np.stack((np.full_like(uu, depth / 2.0), uu, vv - height / 2.0 + ripple), axis=-1)
+    return grid_quads(sheet), normals[:-1, :-1].reshape(-1, 3), False
+
+
+TEMPLATE_BUILDERS = {
+    "box": _box_template,
+    "ellipsoid": _ellipsoid_template,
+    "throw": _throw_template,
+    "drape": _drape_template,
+}
+
+
+def _store_bounded(cache: dict, key, value, limit: int) -> None:
+    """Insert ``value`` as the most recent entry, evicting the oldest past ``limit``."""
+    cache[key] = value
+    while len(cache) > limit:
+        del cache[next(iter(cache))]
+
+
+class MeshTemplateCache:
+    """Templates keyed by (kind, size, resolution) and their shaded colours.
+
+    Repeated furniture only pays for a transform of cached faces; the shading
+    of an instance is reused for every item with the same colour and rotation.
+    Both maps drop their least recently used entries past ``TEMPLATE_CACHE_SIZE``
+    and ``SHADE_CACHE_SIZE``.
+    """
+
+    def __init__(self) -> None:
+        self._templates: Dict[Tuple, MeshTemplate] = {}
+        self._shades: Dict[Tuple, np.ndarray] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+    def clear(self) -> None:
+        self._templates.clear()
+        self._shades.clear()
+        self.hits = self.misses = 0
+
+    def get(self, kind: str, size: Sequence[float], resolution: Tuple[int, ...] = ()) -> MeshTemplate:
+        key = (kind, tuple(float(v) for v in size), tuple(resolution))
+        template = self._templates.pop(key, None)
+        if template is not None:
+            self.hits += 1
+            self._templates[key] = template
+            return template
+        self.misses += 1
+        faces, normals, rotate_normals = TEMPLATE_BUILDERS[kind](key[1], key[2])
+        faces.setflags(write=False)
+        normals.setflags(write=False)
+        template = MeshTemplate(key, faces, normals, rotate_normals)
+        _store_bounded(self._templates, key, template, TEMPLATE_CACHE_SIZE)
+        return template
+
+    def shade(self, template: MeshTemplate, color: Color, rotation: float, ctx: RenderContext) -> np.ndarray:
+        rotation = float(rotation) if template.rotate_normals else 0.0
+        color = to_rgb(color)
+        key = (template.key, color, rotation, ctx.shading_key())
+        shades = self._shades.pop(key, None)
+        if shades is None:
+            normals = transform_points(template.normals, rotation)
+            shades = toon_shade_batch(color, normals, ctx)
+            shades.setflags(write=False)
+        _store_bounded(self._shades, key, shades, SHADE_CACHE_SIZE)
+        return shades
+
+
+
+TEMPLATES = MeshTemplateCache()
+
+
+def draw_box(scene: Scene, center: np.ndarray, size: np.ndarray, rotation: float, color: Color, outline: Color, ctx: RenderContext) -> None:
+    template = TEMPLATES.get("box", size)
+    shades = TEMPLATES.shade(template, color, rotation, ctx)
+    normals = transform_points(template.normals, rotation)
+    scene.add_polys(template.place(rotation, center), shades, outline, ctx.outline_width, normals=normals)
+
+
+def draw_floor(scene: Scene, room: RoomIR, ctx: RenderContext) -> None:
+    width, depth = room.size
+    palette = room.palette
+    floor_color = palette.rgb(room.floor_color)
+    x0, y0 = room.origin
     x1, y1 = x0 + width, y0 + depth
     base_vertices = [
         (x0, y0, 0.0),
@@ -157,319 +820,480 @@ def draw_floor(ax, room: dict, ctx: RenderContext) -> None:
     ]
     normal = np.array([0.0, 0.0, 1.0])
     shade = toon_shade(floor_color, normal, ctx)
-    add_poly(ax, base_vertices, shade, room.get("baseboard_color", "#3b2b27"), ctx)
+    baseboard = "#3b2b27" if room.baseboard_color is None else palette.rgb(room.baseboard_color)
+    add_poly(scene, base_vertices, shade, baseboard, ctx)
 
     # Stylised pattern overlays
-    pattern = room["floor"].get("pattern")
+    pattern = room.pattern
     if pattern == "broad_planks":
         stripes = max(4, int(depth / 0.4))
-        for i in range(1, stripes):
-            y = y0 + (depth / stripes) * i
-            ax.plot([x0, x1], [y, y], zs=0.01, color="#d8b890", linewidth=1.0, zdir="z")
+        ys = y0 + (depth / stripes) * np.arange(1, stripes)
+        segments = np.zeros((len(ys), 2, 3))
+        segments[:, 0, 0], segments[:, 1, 0] = x0, x1
+        segments[:, :, 1] = ys[:, None]
+        segments[:, :, 2] = 0.01
+        scene.add_segments(segments, "#d8b890", 1.0)
     elif pattern == "checker":
-        tiles_x = max(4, int(width / 0.45))
-        tiles_y = max(4, int(depth / 0.45))
-        for ix in range(tiles_x):
-            for iy in range(tiles_y):
-                if (ix + iy) % 2 == 0:
-                    px0 = x0 + ix * (width / tiles_x)
-                    py0 = y0 + iy * (depth / tiles_y)
-                    px1 = px0 + (width / tiles_x)
-                    py1 = py0 + (depth / tiles_y)
-                    patch_color = tuple(np.clip(np.array(floor_color) * 0.92, 0, 1))
-                    add_poly(ax, [(px0, py0, 0.001), (px1, py0, 0.001), (px1, py1, 0.001), (px0, py1, 0.001)], patch_color, "#c3c3c3", ctx)
+        # Over budget the tiles grow, down to a coarse 2x2 tint of the floor.
+        coarse = math.sqrt(pattern_detail(ctx))
+        tiles_x = max(2 if coarse < 1 else 4, int(width / 0.45 * coarse))
+        tiles_y = max(2 if coarse < 1 else 4, int(depth / 0.45 * coarse))
+        ix, iy = np.nonzero((np.arange(tiles_x)[:, None] + np.arange(tiles_y)) % 2 == 0)
+        corners = np.array([(0, 0), (1, 0), (1, 1), (0, 1)])
+        tiles = np.empty((len(ix), 4, 3))
+        tiles[..., 0] = x0 + (ix[:, None] + corners[:, 0]) * (width / tiles_x)
+        tiles[..., 1] = y0 + (iy[:, None] + corners[:, 1]) * (depth / tiles_y)
+        tiles[..., 2] = 0.001
+        patch_color = np.clip(np.array(floor_color) * 0.92, 0, 1)
+        scene.add_polys(tiles, np.broadcast_to(patch_color, (len(tiles), 3)), "#c3c3c3", ctx.outline_width)
     elif pattern == "plush":
-        for i in range(6):
-            angle = math.radians(i * 30)
-            cx, cy = (x0 + width / 2), (y0 + depth / 2)
-            radius = min(width, depth) / 2.2
-            pts = [
-                (cx + radius * math.cos(angle + j * math.pi / 3), cy + radius * math.sin(angle + j * math.pi / 3), 0.015)
-                for j in range(6)
-            ]
-            add_poly(ax, pts, tuple(np.clip(np.array(floor_color) * 1.05, 0, 1)), "#bba7a0", ctx)
+        cx, cy = (x0 + width / 2), (y0 + depth / 2)
+        radius = min(width, depth) / 2.2
+        angles = np.radians(np.arange(6) * 30)[:, None] + np.arange(6) * math.pi / 3
+        petals = np.stack([cx + radius * np.cos(angles), cy + radius * np.sin(angles), np.full_like(angles, 0.015)], axis=-1)
+        plush_color = np.clip(np.array(floor_color) * 1.05, 0, 1)
+        scene.add_polys(petals, np.broadcast_to(plush_color, (len(petals), 3)), "#bba7a0", ctx.outline_width)
     elif pattern == "bubble":
-        bubbles = int(width * depth * 1.2)
+        detail = pattern_detail(ctx)
+        bubbles = int(width * depth * 1.2 * detail)
+        segments = 12 if detail >= 1 else 6
         rng = np.random.default_rng(42)
-        for _ in range(bubbles):
-            bx = rng.uniform(x0 + 0.1, x1 - 0.1)
-            by = rng.uniform(y0 + 0.1, y1 - 0.1)
-            radius = rng.uniform(0.05, 0.12)
-            circle = []
-            for a in np.linspace(0, 2 * math.pi, 12):
-                circle.append((bx + radius * math.cos(a), by + radius * math.sin(a), 0.02))
-            bubble_color = tuple(np.clip(np.array(floor_color) * 1.08, 0, 1))
-            add_poly(ax, circle, bubble_color, "#a9cbe4", ctx)
-
-
-def draw_walls(ax, room: dict, ctx: RenderContext) -> None:
-    origin = np.array(room["origin"], dtype=float)
-    width, depth = room["size"]
-    height = room["height"]
-    wall_color = hex_to_rgb(room["wall_color"])
-    x0, y0 = origin
+        # One (x, y, radius) row per bubble, drawn in the same order as a per-bubble loop.
+        bx, by, radius = rng.uniform((x0 + 0.1, y0 + 0.1, 0.05), (x1 - 0.1, y1 - 0.1, 0.12), size=(max(bubbles, 0), 3)).T
+        angles = np.linspace(0, 2 * math.pi, segments)
+        circles = np.stack(
+            [bx[:, None] + radius[:, None] * np.cos(angles), by[:, None] + radius[:, None] * np.sin(angles), np.full((len(bx), segments), 0.02)],
+            axis=-1,
+        )
+        bubble_color = np.clip(np.array(floor_color) * 1.08, 0, 1)
+        scene.add_polys(circles, np.broadcast_to(bubble_color, (len(circles), 3)), "#a9cbe4", ctx.outline_width)
+
+
+def draw_walls(scene: Scene, room: RoomIR, ctx: RenderContext) -> None:
+    width, depth = room.size
+    height = room.height
+    palette = room.palette
+    x0, y0 = room.origin
     x1, y1 = x0 + width, y0 + depth
-    faces = [
+    faces = np.array([
         [(x0, y0, 0.0), (x1, y0, 0.0), (x1, y0, height), (x0, y0, height)],  # south wall
         [(x1, y0, 0.0), (x1, y1, 0.0), (x1, y1, height), (x1, y0, height)],  # east wall
         [(x1, y1, 0.0), (x0, y1, 0.0), (x0, y1, height), (x1, y1, height)],  # north wall
         [(x0, y1, 0.0), (x0, y0, 0.0), (x0, y0, height), (x0, y1, height)],  # west wall
-    ]
-    outline = room.get("baseboard_color", "#3b2b27")
-    for face in faces:
-        v1 = np.array(face[1]) - np.array(face[0])
-        v2 = np.array(face[2]) - np.array(face[1])
-        normal = np.cross(v1, v2)
-        shade = toon_shade(wall_color, normal, ctx)
-        add_poly(ax, face, shade, outline, ctx)
-
-    # Baseboard accent
-    base_color = room.get("baseboard_color")
-    if base_color:
-        base_rgb = hex_to_rgb(base_color)
-        trim_height = 0.12
-        trim_faces = [
-            [(x0, y0, 0.0), (x1, y0, 0.0), (x1, y0, trim_height), (x0, y0, trim_height)],
-            [(x1, y0, 0.0), (x1, y1, 0.0), (x1, y1, trim_height), (x1, y0, trim_height)],
-            [(x1, y1, 0.0), (x0, y1, 0.0), (x0, y1, trim_height), (x1, y1, trim_height)],
-            [(x0, y1, 0.0), (x0, y0, 0.0), (x0, y0, trim_height), (x0, y1, trim_height)],
-        ]
-        for face in trim_faces:
-            normal = np.cross(np.array(face[1]) - np.array(face[0]), np.array(face[2]) - np.array(face[1]))
-            shade = toon_shade(base_rgb, normal, ctx)
-            add_poly(ax, face, shade, "#4c4138", ctx)
-
-
-def draw_ceiling(ax, room: dict, ctx: RenderContext) -> None:
-    origin = np.array(room["origin"], dtype=float)
-    width, depth = room["size"]
-    height = room["height"]
-    x0, y0 = origin
+    ])
+    if room.baseboard_color is None:
+        scene.add_polys(faces, toon_shade_batch(palette.colors[room.wall_color], face_normals(faces), ctx), "#3b2b27", ctx.outline_width)
+        return
+
+    # Baseboard accent: trims are shaded together with the walls from one palette gather.
+    trim_height = 0.12
+    trim_faces = faces.copy()
+    trim_faces[:, 2:, 2] = trim_height
+    both = np.concatenate([faces, trim_faces])
+    colors = palette.colors[np.repeat([room.wall_color, room.baseboard_color], len(faces))]
+    shades = toon_shade_batch(colors, face_normals(both), ctx)
+    scene.add_polys(faces, shades[: len(faces)], palette.rgb(room.baseboard_color), ctx.outline_width)
+    scene.add_polys(trim_faces, shades[len(faces) :], "#4c4138", ctx.outline_width)
+
+
+def draw_ceiling(scene: Scene, room: RoomIR, ctx: RenderContext) -> None:
+    width, depth = room.size
+    height = room.height
+    x0, y0 = room.origin
     x1, y1 = x0 + width, y0 + depth
-    color = hex_to_rgb(room.get("ceiling_color", "#ffffff"))
+    color = room.palette.rgb(room.ceiling_color)
     vertices = [(x0, y0, height), (x1, y0, height), (x1, y1, height), (x0, y1, height)]
     shade = toon_shade(color, np.array([0.0, 0.0, -1.0]), ctx)
-    add_poly(ax, vertices, shade, "#c4c1bc", ctx)
+    add_poly(scene, vertices, shade, "#c4c1bc", ctx)
 
 
-def draw_rug(ax, center: np.ndarray, size: Sequence[float], rotation: float, color: str, outline: str, ctx: RenderContext) -> None:
+def draw_rug(scene: Scene, center: np.ndarray, size: Sequence[float], rotation: float, color: Color, outline: Color, ctx: RenderContext) -> None:
     length, width, thickness = size
     rug_center = np.array(center)
     rug_center[2] += thickness / 2.0
-    draw_box(ax, rug_center, np.array([length, width, thickness]), rotation, color, outline, ctx)
+    draw_box(scene, rug_center, np.array([length, width, thickness]), rotation, color, outline, ctx)
 
 
-def draw_throw(ax, center: np.ndarray, size: Sequence[float], rotation: float, color: str, outline: str, ctx: RenderContext) -> None:
-    length, ripple, depth = size
-    u = np.linspace(-length / 2.0, length / 2.0, 20)
-    v = np.linspace(-depth / 2.0, depth / 2.0, 16)
-    uu, vv = np.meshgrid(u, v)
-    amplitude = ripple if ripple > 0 else 0.015
-    wave = amplitude * np.sin(uu * 3.2 / max(length, 0.5)) * np.cos(vv * 2.6 / max(depth, 0.5))
-    zz = center[2] + wave
-    xx = uu
-    yy = vv
-    if rotation:
-        flat = np.stack([uu.ravel(), vv.ravel()], axis=1)
-        rotated = np.array([rotate_xy(p[0], p[1], rotation) for p in flat])
-        xx = rotated[:, 0].reshape(uu.shape)
-        yy = rotated[:, 1].reshape(uu.shape)
-    xx = xx + center[0]
-    yy = yy + center[1]
-    base_rgb = np.array(hex_to_rgb(color))
-    normals = np.dstack(np.gradient(zz))
-    normals = np.dstack((-normals[:, :, 0], -normals[:, :, 1], np.ones_like(zz)))
-    normals = normalize(normals)
-    dots = np.clip(np.abs(normals @ ctx.light_direction), 0, 1)
-    dots = np.round(dots * (ctx.toon_levels - 1)) / max(1, (ctx.toon_levels - 1))
-    intensities = ctx.min_intensity + (ctx.max_intensity - ctx.min_intensity) * dots
-    colors = np.clip(base_rgb * intensities[..., None], 0, 1)
-    ax.plot_surface(xx, yy, zz, rstride=1, cstride=1, linewidth=0.0, antialiased=False, shade=False, facecolors=colors, edgecolor=outline, alpha=0.95)
+def mesh_resolution(ctx: RenderContext, base: Tuple[int, int], center: Sequence[float], radius: float) -> Tuple[int, int]:
+    return base if ctx.lod is None else ctx.lod.mesh_resolution(base, center, radius)
+
+
+def pattern_detail(ctx: RenderContext) -> float:
+    return 1.0 if ctx.lod is None else ctx.lod.pattern_detail
+
+
+def draw_throw(scene: Scene, center: np.ndarray, size: Sequence[float], rotation: float, color: Color, outline: Color, ctx: RenderContext) -> None:
+    resolution = mesh_resolution(ctx, (20, 16), center, max(size[0], size[2]) / 2.0)
+    template = TEMPLATES.get("throw", size, resolution)
+    shades = TEMPLATES.shade(template, color, rotation, ctx)
+    scene.add_polys(template.place(rotation, center), shades, outline, 0.0, alpha=0.95)
 
 
 def draw_ellipsoid(
-    ax,
+    scene: Scene,
     center: np.ndarray,
     radius: Sequence[float],
     rotation: float,
-    color: str,
-    outline: str,
+    color: Color,
+    outline: Color,
     ctx: RenderContext,
 ) -> None:
-    rx, ry, rz = radius
-    u = np.linspace(0, 2 * math.pi, 28)
-    v = np.linspace(0, math.pi, 18)
-    uu, vv = np.meshgrid(u, v)
-    x = rx * np.cos(uu) * np.sin(vv)
-    y = ry * np.sin(uu) * np.sin(vv)
-    z = rz * np.cos(vv)
-    if rotation:
-        flat = np.stack([x.ravel(), y.ravel()], axis=1)
-        rotated = np.array([rotate_xy(px, py, rotation) for px, py in flat])
-        x = rotated[:, 0].reshape(x.shape)
-        y = rotated[:, 1].reshape(y.shape)
-    x = x + center[0]
-    y = y + center[1]
-    z = z + center[2]
-    normals = np.stack((x - center[0], y - center[1], (z - center[2]) * (rx / rz) if rz else z * 0 + 1), axis=-1)
-    normals = normals.reshape(-1, 3)
-    normals = np.apply_along_axis(normalize, 1, normals)
-    dots = np.dot(normals, ctx.light_direction)
-    dots = np.abs(dots)
-    if ctx.toon_levels > 1:
-        dots = np.round(dots * (ctx.toon_levels - 1)) / (ctx.toon_levels - 1)
-    intensities = ctx.min_intensity + (ctx.max_intensity - ctx.min_intensity) * dots
-    base_rgb = np.array(hex_to_rgb(color))
-    colors = np.clip(base_rgb * intensities[:, None], 0, 1)
-    colors = colors.reshape(x.shape + (3,))
-    ax.plot_surface(x, y, z, rstride=1, cstride=1, linewidth=0.0, antialiased=False, shade=False, facecolors=colors, edgecolor=outline, alpha=0.98)
+    template = TEMPLATES.get("ellipsoid", radius, mesh_resolution(ctx, (28, 18), center, max(radius)))
+    shades = TEMPLATES.shade(template, color, rotation, ctx)
+    scene.add_polys(template.place(rotation, center), shades, outline, 0.0, alpha=0.98)
 
 
-def draw_panel(ax, center: np.ndarray, size: Sequence[float], rotation: float, color: str, outline: str, ctx: RenderContext) -> None:
-    draw_box(ax, center, np.array(size), rotation, color, outline, ctx)
+def draw_panel(scene: Scene, center: np.ndarray, size: Sequence[float], rotation: float, color: Color, outline: Color, ctx: RenderContext) -> None:
+    draw_box(scene, center, np.array(size), rotation, color, outline, ctx)
 
 
-def draw_soft_item(
-    ax,
-    furniture: FurnitureInfo,
-    item: dict,
-    ctx: RenderContext,
-) -> None:
-    offset = item.get("offset", [0.0, 0.0, 0.0])
-    item_center = apply_offset(furniture.center, offset, furniture.rotation)
-    kind = item.get("kind", "pillow")
-    color = item.get("color", "#ffffff")
-    outline = item.get("outline", "#2e2e2e")
-    if kind in {"pillow", "pillow_cluster", "seat_cushion", "bolster", "foam"}:
-        radius = item.get("radius", [0.4, 0.3, 0.18])
-        draw_ellipsoid(ax, item_center, radius, furniture.rotation + item.get("rotation", 0.0), color, outline, ctx)
+def draw_drape(scene: Scene, center: np.ndarray, size: Sequence[float], rotation: float, color: Color, outline: Color, ctx: RenderContext) -> None:
+    resolution = mesh_resolution(ctx, (18, 20), center, max(size[1], size[2]) / 2.0)
+    template = TEMPLATES.get("drape", size, resolution)
+    shades = TEMPLATES.shade(template, color, rotation, ctx)
+    scene.add_polys(template.place(rotation, center), shades, outline, 0.0, alpha=0.9)
+
+
+ITEM_DRAWERS = {
+    "ellipsoid": draw_ellipsoid,
+    "throw": draw_throw,
+    "drape": draw_drape,
+    "rug": draw_rug,
+    "panel": draw_panel,
+}
+
+
+def draw_item(scene: Scene, item: ItemIR, palette: Palette, ctx: RenderContext) -> None:
+    color, outline = palette.rgb(item.color), palette.rgb(item.outline)
+    ITEM_DRAWERS[item.shape](scene, item.center, item.size, item.rotation, color, outline, ctx)
+
+
+def draw_light(scene: Scene, position: Sequence[float], radius: float, color: Color, ctx: RenderContext) -> None:
+    center = np.array(position, dtype=float)
+    template = TEMPLATES.get("ellipsoid", (radius, radius, radius), mesh_resolution(ctx, (18, 12), center, radius))
+    base_rgb = np.array(to_rgb(color))
+    glow = np.clip(base_rgb * 1.2, 0, 1)
+    faces = template.place(0.0, center)
+    scene.add_polys(faces, np.broadcast_to(glow, (len(faces), 3)), color, 0.0, alpha=0.55)
+    scene.add_points(center, glow, size=40, alpha=0.9)
+
+
+class LayoutError(ValueError):
+    """The layout does not match the renderer's schema; ``path`` locates the bad value."""
+
+    def __init__(self, path: str, message: str) -> None:
+        super().__init__(f"{path}: {message}")
+        self.path = path
+
+
+HEX_COLOR = re.compile(r"#?(?:[0-9a-fA-F]{3}){1,2}")
+ELLIPSOID_ITEMS = {"pillow", "pillow_cluster", "seat_cushion", "bolster", "foam"}
+
+
+@dataclass
+class ItemIR:
+    """A soft item or decor piece with its anchor, offset and rotation already resolved."""
+
+    __slots__ = ("kind", "shape", "center", "size", "rotation", "color", "outline")
+    kind: str
+    shape: str  # key of ITEM_DRAWERS
+    center: np.ndarray
+    size: Tuple[float, float, float]  # radii for ellipsoids
+    rotation: float
+    color: int  # palette index
+    outline: int
+
+
+@dataclass
+class FurnitureIR:
+    __slots__ = ("info", "color", "outline", "soft_items", "entry")
+    info: FurnitureInfo
+    color: int
+    outline: int
+    soft_items: List[ItemIR]
+    entry: int  # position in the layout's FurnitureIndex
+
+
+@dataclass
+class LightIR:
+    __slots__ = ("position", "radius", "color")
+    position: np.ndarray
+    radius: float
+    color: int
+
+
+@dataclass
+class RoomIR:
+    """One room of a compiled layout; ``source`` is the JSON it came from, for cache keys.
+
+    Colour fields index ``palette`` and furniture is registered in ``index``;
+    all rooms of a layout share both.
+    """
+
+    __slots__ = (
+        "name", "mood", "origin", "size", "height", "floor_color", "pattern", "wall_color", "ceiling_color",
+        "baseboard_color", "furniture", "decor", "lights", "palette", "index", "number", "source",
+    )
+    name: str
+    mood: str
+    origin: Tuple[float, float]
+    size: Tuple[float, float]
+    height: float
+    floor_color: int
+    pattern: Optional[str]
+    wall_color: int
+    ceiling_color: int
+    baseboard_color: Optional[int]
+    furniture: List[FurnitureIR]
+    decor: List[ItemIR]
+    lights: List[LightIR]
+    palette: Palette
+    index: FurnitureIndex
+    number: int  # position in the layout's room list
+    source: dict
+
+
+_MISSING = object()
+
+
+def _get(data: dict, key: str, path: str, default=_MISSING):
+    if key in data:
+        return data[key]
+    if default is _MISSING:
+        raise LayoutError(f"{path}.{key}", "is required")
+    return default
+
+
+def _mapping(value, path: str) -> dict:
+    if not isinstance(value, dict):
+        raise LayoutError(path, f"expected an object, got {type(value).__name__}")
+    return value
+
+
+def _items(value, path: str) -> List[dict]:
+    if not isinstance(value, list):
+        raise LayoutError(path, f"expected a list, got {type(value).__name__}")
+    return [_mapping(entry, f"{path}[{idx}]") for idx, entry in enumerate(value)]
+
+
+def _number(value, path: str) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise LayoutError(path, f"expected a number, got {value!r}")
+    return float(value)
+
+
+def _vector(value, path: str, lengths: Tuple[int, ...] = (3,)) -> Tuple[float, ...]:
+    if not isinstance(value, (list, tuple)) or len(value) not in lengths:
+        expected = " or ".join(str(n) for n in lengths)
+        raise LayoutError(path, f"expected a list of {expected} numbers, got {value!r}")
+    return tuple(_number(v, f"{path}[{idx}]") for idx, v in enumerate(value))
+
+
+def _color(value, path: str, palette: Palette) -> int:
+    if not isinstance(value, str) or not HEX_COLOR.fullmatch(value):
+        raise LayoutError(path, f"expected a hex colour like '#a1b2c3', got {value!r}")
+    return palette.index(value)
+
+
+def _text(value, path: str) -> str:
+    if not isinstance(value, str):
+        raise LayoutError(path, f"expected a string, got {value!r}")
+    return value
+
+
+def compile_item(entry: dict, path: str, center: np.ndarray, rotation: float, decor: bool, palette: Palette) -> ItemIR:
+    """Resolve the drawing shape and default size of a soft item (or decor piece) placed at ``center``."""
+    kind = _text(entry.get("kind", "rug" if decor else "pillow"), f"{path}.kind")
+    if decor:
+        shape, key, default = {
+            "rug": ("rug", "size", (2.0, 1.6, 0.04)),
+            "wall_art": ("panel", "size", (1.2, 0.05, 1.0)),
+            "panel": ("panel", "size", (1.2, 0.05, 1.0)),
+            "throw": ("throw", "size", (1.4, 0.03, 0.9)),
+            "drape": ("drape", "size", (0.05, 1.5, 2.0)),
+            "towel": ("drape", "size", (0.05, 1.5, 2.0)),
+        }.get(kind, ("panel", "size", (1.0, 0.3, 0.8)))
+    elif kind in ELLIPSOID_ITEMS:
+        shape, key, default = "ellipsoid", "radius", (0.4, 0.3, 0.18)
     elif kind == "throw":
-        size = item.get("size", [1.0, 0.02, 0.6])
-        draw_throw(ax, item_center, size, furniture.rotation + item.get("rotation", 0.0), color, outline, ctx)
-    elif kind in {"basket"}:
-        radius = item.get("radius", [0.4, 0.3, 0.25])
-        draw_ellipsoid(ax, item_center, radius, furniture.rotation + item.get("rotation", 0.0), color, outline, ctx)
+        shape, key, default = "throw", "size", (1.0, 0.02, 0.6)
+    elif kind == "basket":
+        shape, key, default = "ellipsoid", "radius", (0.4, 0.3, 0.25)
     else:
-        size = item.get("size", [0.6, 0.4, 0.25])
-        draw_panel(ax, item_center, size, furniture.rotation + item.get("rotation", 0.0), color, outline, ctx)
+        shape, key, default = "panel", "size", (0.6, 0.4, 0.25)
+    return ItemIR(
+        kind=kind,
+        shape=shape,
+        center=center,
+        size=_vector(entry.get(key, default), f"{path}.{key}"),
+        rotation=rotation,
+        color=_color(entry.get("color", "#ffffff"), f"{path}.color", palette),
+        outline=_color(entry.get("outline", "#3c2b2a" if decor else "#2e2e2e"), f"{path}.outline", palette),
+    )
 
 
-def draw_soft_decor(
-    ax,
-    room_origin: np.ndarray,
-    decor: dict,
-    furniture_lookup: Dict[str, FurnitureInfo],
-    ctx: RenderContext,
-) -> None:
-    kind = decor.get("kind", "rug")
-    outline = decor.get("outline", "#3c2b2a")
-    color = decor.get("color", "#ffffff")
-    rotation = decor.get("rotation", 0.0)
-    if "anchor" in decor:
-        anchor = furniture_lookup.get(decor["anchor"])
-        if not anchor:
-            return
-        offset = decor.get("offset", [0.0, 0.0, 0.0])
-        center = apply_offset(anchor.center, offset, anchor.rotation)
-        effective_rotation = anchor.rotation + rotation
-    else:
-        pos = decor.get("position", [0.0, 0.0])
-        if len(pos) == 2:
-            center = np.array([room_origin[0] + pos[0], room_origin[1] + pos[1], decor.get("elevation", 0.02)])
+def compile_room(
+    room: dict,
+    path: str = "room",
+    palette: Optional[Palette] = None,
+    index: Optional[FurnitureIndex] = None,
+    number: int = 0,
+) -> RoomIR:
+    """Validate one room of the layout and resolve every placement into world coordinates."""
+    room = _mapping(room, path)
+    palette = palette if palette is not None else Palette()
+    index = index if index is not None else FurnitureIndex()
+    name = _text(room.get("name", "room"), f"{path}.name")
+    origin = _vector(_get(room, "origin", path), f"{path}.origin", (2,))
+    size = _vector(_get(room, "size", path), f"{path}.size", (2,))
+    height = _number(_get(room, "height", path), f"{path}.height")
+    floor = _mapping(_get(room, "floor", path), f"{path}.floor")
+    pattern = floor.get("pattern")
+    if pattern is not None:
+        _text(pattern, f"{path}.floor.pattern")
+    baseboard = room.get("baseboard_color")
+
+    furniture: List[FurnitureIR] = []
+    for idx, item in enumerate(_items(room.get("furniture", []), f"{path}.furniture")):
+        item_path = f"{path}.furniture[{idx}]"
+        item_size = np.array(_vector(item.get("size", [1.0, 1.0, 1.0]), f"{item_path}.size"))
+        pos = _vector(item.get("position", [0.0, 0.0]), f"{item_path}.position", (2, 3))
+        elevation = _number(item.get("elevation", 0.0), f"{item_path}.elevation")
+        rotation = _number(item.get("rotation", 0.0), f"{item_path}.rotation")
+        center = np.array([origin[0] + pos[0], origin[1] + pos[1], elevation + item_size[2] / 2.0])
+        info = FurnitureInfo(
+            label=_text(item.get("label", "Furniture"), f"{item_path}.label"),
+            center=center,
+            size=item_size,
+            rotation=rotation,
+            elevation=elevation,
+        )
+        soft_items = []
+        for soft_idx, soft in enumerate(_items(item.get("soft_items", []), f"{item_path}.soft_items")):
+            soft_path = f"{item_path}.soft_items[{soft_idx}]"
+            offset = _vector(soft.get("offset", [0.0, 0.0, 0.0]), f"{soft_path}.offset")
+            soft_rotation = rotation + _number(soft.get("rotation", 0.0), f"{soft_path}.rotation")
+            soft_items.append(compile_item(soft, soft_path, apply_offset(center, offset, rotation), soft_rotation, False, palette))
+        color = _color(item.get("color", "#ffffff"), f"{item_path}.color", palette)
+        outline = _color(item.get("outline", "#3b2b27"), f"{item_path}.outline", palette)
+        furniture.append(FurnitureIR(info, color, outline, soft_items, index.add((number, name), info)))
+
+    decor: List[ItemIR] = []
+    for idx, entry in enumerate(_items(room.get("soft_decor", []), f"{path}.soft_decor")):
+        entry_path = f"{path}.soft_decor[{idx}]"
+        rotation = _number(entry.get("rotation", 0.0), f"{entry_path}.rotation")
+        if "anchor" in entry:
+            # Decor anchored to furniture this room does not have is skipped, as before.
+            anchor = index.anchor(number, _text(entry["anchor"], f"{entry_path}.anchor"))
+            if anchor is None:
+                continue
+            offset = _vector(entry.get("offset", [0.0, 0.0, 0.0]), f"{entry_path}.offset")
+            center = apply_offset(anchor.center, offset, anchor.rotation)
+            rotation += anchor.rotation
         else:
-            center = np.array([room_origin[0] + pos[0], room_origin[1] + pos[1], pos[2]])
-        effective_rotation = rotation
-
-    if kind == "rug":
-        size = decor.get("size", [2.0, 1.6, 0.04])
-        draw_rug(ax, center, size, effective_rotation, color, outline, ctx)
-    elif kind in {"wall_art", "panel"}:
-        size = decor.get("size", [1.2, 0.05, 1.0])
-        draw_panel(ax, center, size, effective_rotation, color, outline, ctx)
-    elif kind in {"throw"}:
-        size = decor.get("size", [1.4, 0.03, 0.9])
-        draw_throw(ax, center, size, effective_rotation, color, outline, ctx)
-    elif kind in {"drape", "towel"}:
-        depth, width, height = decor.get("size", [0.05, 1.5, 2.0])
-        u = np.linspace(-width / 2, width / 2, 18)
-        v = np.linspace(0.0, height, 20)
-        uu, vv = np.meshgrid(u, v)
-        ripple = 0.05 * np.sin(uu * 4 / max(width, 0.5))
-        xx = np.full_like(uu, depth / 2.0)
-        yy = uu
-        zz = center[2] + vv - height / 2.0
-        if effective_rotation:
-            flat = np.stack([xx.ravel(), yy.ravel()], axis=1)
-            rotated = np.array([rotate_xy(px, py, effective_rotation) for px, py in flat])
-            xx = rotated[:, 0].reshape(xx.shape)
-            yy = rotated[:, 1].reshape(yy.shape)
-        xx = xx + center[0]
-        yy = yy + center[1]
-        base_rgb = np.array(hex_to_rgb(color))
-        normals = np.dstack(np.gradient(ripple + vv))
-        normals = np.dstack((-normals[:, :, 0], -normals[:, :, 1], np.ones_like(zz)))
-        normals = normalize(normals)
-        dots = np.clip(np.abs(normals @ ctx.light_direction), 0, 1)
-        if ctx.toon_levels > 1:
-            dots = np.round(dots * (ctx.toon_levels - 1)) / (ctx.toon_levels - 1)
-        intensities = ctx.min_intensity + (ctx.max_intensity - ctx.min_intensity) * dots
-        colors = np.clip(base_rgb * intensities[..., None], 0, 1)
-        ax.plot_surface(xx, yy, zz + ripple, rstride=1, cstride=1, linewidth=0.0, antialiased=False, shade=False, facecolors=colors, edgecolor=outline, alpha=0.9)
-    else:
-        size = decor.get("size", [1.0, 0.3, 0.8])
-        draw_panel(ax, center, size, effective_rotation, color, outline, ctx)
-
-
-def draw_light(ax, position: Sequence[float], radius: float, color: str, ctx: RenderContext) -> None:
-    center = np.array(position)
-    r = radius
-    u = np.linspace(0, 2 * math.pi, 18)
-    v = np.linspace(0, math.pi, 12)
-    uu, vv = np.meshgrid(u, v)
-    x = r * np.cos(uu) * np.sin(vv) + center[0]
-    y = r * np.sin(uu) * np.sin(vv) + center[1]
-    z = r * np.cos(vv) + center[2]
-    base_rgb = np.array(hex_to_rgb(color))
-    glow = np.clip(base_rgb * 1.2, 0, 1)
-    ax.plot_surface(x, y, z, rstride=1, cstride=1, color=glow, linewidth=0.0, alpha=0.55, shade=False)
-    ax.scatter([center[0]], [center[1]], [center[2]], color=glow, s=40, alpha=0.9)
+            pos = _vector(entry.get("position", [0.0, 0.0]), f"{entry_path}.position", (2, 3))
+            elevation = pos[2] if len(pos) == 3 else _number(entry.get("elevation", 0.02), f"{entry_path}.elevation")
+            center = np.array([origin[0] + pos[0], origin[1] + pos[1], elevation])
+        decor.append(compile_item(entry, entry_path, center, rotation, True, palette))
+
+    lights: List[LightIR] = []
+    for idx, light in enumerate(_items(room.get("lighting", []), f"{path}.lighting")):
+        light_path = f"{path}.lighting[{idx}]"
+        position = _vector(light.get("position", [origin[0], origin[1], height - 0.4]), f"{light_path}.position")
+        lights.append(LightIR(
+            position=np.array(position),
+            radius=_number(light.get("radius", 0.18), f"{light_path}.radius"),
+            color=_color(light.get("color", "#fff5d0"), f"{light_path}.color", palette),
+        ))
+
+    return RoomIR(
+        name=name,
+        mood=str(room.get("mood", "")),
+        origin=origin,
+        size=size,
+        height=height,
+        floor_color=_color(_get(floor, "color", f"{path}.floor"), f"{path}.floor.color", palette),
+        pattern=pattern,
+        wall_color=_color(_get(room, "wall_color", path), f"{path}.wall_color", palette),
+        ceiling_color=_color(room.get("ceiling_color", "#ffffff"), f"{path}.ceiling_color", palette),
+        baseboard_color=None if not baseboard else _color(baseboard, f"{path}.baseboard_color", palette),
+        furniture=furniture,
+        decor=decor,
+        lights=lights,
+        palette=palette,
+        index=index,
+        number=number,
+        source=room,
+    )
+
+
+def compile_layout(layout: dict) -> List[RoomIR]:
+    """Parse the layout once into room IR; raises :class:`LayoutError` on the first schema problem."""
+    layout = _mapping(layout, "layout")
+    palette, index = Palette(), FurnitureIndex()
+    rooms = _items(layout.get("rooms", []), "rooms")
+    return [compile_room(room, f"rooms[{idx}]", palette, index, idx) for idx, room in enumerate(rooms)]
+
+
+def overlap_report(rooms: Sequence[RoomIR], tolerance: float = 0.01) -> List[str]:
+    """One line per pair of furniture pieces whose bounds interpenetrate."""
+    if not rooms:
+        return []
+    index = rooms[0].index
+    return [
+        f"{index.rooms[i][1]}/{index.items[i].label} overlaps {index.rooms[j][1]}/{index.items[j].label}"
+        for i, j in index.overlaps(tolerance)
+    ]
+
+
+# Soft items rest on their furniture and may stick out of its box by this much.
+FURNITURE_CULL_PAD = 0.5
 
 
-def draw_room(ax, room: dict, ctx: RenderContext) -> None:
-    draw_floor(ax, room, ctx)
-    draw_walls(ax, room, ctx)
+def visible_furniture(rooms: Sequence[RoomIR], ctx: RenderContext) -> Optional[Set[int]]:
+    """Index entries of the furniture inside ``ctx.lod.viewport``; None when nothing is culled."""
+    lod = ctx.lod
+    if lod is None or lod.viewport is None or not rooms:
+        return None
+    return set(rooms[0].index.visible(lod.view, lod.viewport, FURNITURE_CULL_PAD))
+
+
+def draw_room(scene: Scene, room: RoomIR, ctx: RenderContext, shown: Optional[Set[int]] = None) -> None:
+    """Draw one room; with ``shown`` only furniture whose index entry is in it is drawn."""
+    name = (room.number, room.name)
+    with scene.measure(name, "floor"):
+        draw_floor(scene, room, ctx)
+    with scene.measure(name, "walls"):
+        draw_walls(scene, room, ctx)
     # leave ceiling airy for readability but add a faint outline
-    draw_ceiling(ax, room, ctx)
-
-    furniture_lookup: Dict[str, FurnitureInfo] = {}
-    origin = np.array(room["origin"], dtype=float)
-
-    for item in room.get("furniture", []):
-        label = item.get("label", "Furniture")
-        size = np.array(item.get("size", [1.0, 1.0, 1.0]), dtype=float)
-        pos = item.get("position", [0.0, 0.0])
-        elevation = float(item.get("elevation", 0.0))
-        rotation = float(item.get("rotation", 0.0))
-        center = np.array([origin[0] + pos[0], origin[1] + pos[1], elevation + size[2] / 2.0])
-        outline = item.get("outline", "#3b2b27")
-        draw_box(ax, center, size, rotation, item.get("color", "#ffffff"), outline, ctx)
-        info = FurnitureInfo(label=label, center=center, size=size, rotation=rotation, elevation=elevation)
-        furniture_lookup[label] = info
-        for soft in item.get("soft_items", []):
-            draw_soft_item(ax, info, soft, ctx)
-
-    for decor in room.get("soft_decor", []):
-        draw_soft_decor(ax, origin, decor, furniture_lookup, ctx)
-
-    for light in room.get("lighting", []):
-        position = light.get("position", [origin[0], origin[1], room["height"] - 0.4])
-        radius = light.get("radius", 0.18)
-        color = light.get("color", "#fff5d0")
-        draw_light(ax, position, radius, color, ctx)
-
-    label_position = origin + np.array([room["size"][0] / 2.0, room["size"][1] / 2.0])
-    ax.text(label_position[0], label_position[1], room["height"] + 0.2, f"{room['name']}\n{room.get('mood', '')}",
-            ha="center", va="bottom", fontsize=9, color="#3a2d2a", weight="bold")
+    with scene.measure(name, "ceiling"):
+        draw_ceiling(scene, room, ctx)
+
+    palette = room.palette
+    for item in room.furniture:
+        if shown is not None and item.entry not in shown:
+            continue
+        info = item.info
+        with scene.measure(name, "furniture"):
+            draw_box(scene, info.center, info.size, info.rotation, palette.rgb(item.color), palette.rgb(item.outline), ctx)
+        for soft in item.soft_items:
+            with scene.measure(name, f"soft:{soft.kind}"):
+                draw_item(scene, soft, palette, ctx)
+
+    for decor in room.decor:
+        with scene.measure(name, f"decor:{decor.kind}"):
+            draw_item(scene, decor, palette, ctx)
+
+    for light in room.lights:
+        with scene.measure(name, "light"):
+            draw_light(scene, light.position, light.radius, palette.rgb(light.color), ctx)
+
+    # Floor, walls and ceiling close the room, so its contents are hidden from outside.
+    x0, y0 = room.origin
+    width, depth = room.size
+    scene.add_occluder((x0, y0, 0.0), (x0 + width, y0 + depth, room.height))
+
+    scene.add_label((x0 + width / 2.0, y0 + depth / 2.0, room.height + 0.2), f"{room.name}\n{room.mood}")
 
 
 def configure_axes(ax, bounds: Tuple[float, float, float, float, float]) -> None:
@@ -498,56 +1322,1567 @@ def compute_bounds(rooms: Iterable[dict]) -> Tuple[float, float, float, float, f
     return min_x - margin, max_x + margin, min_y - margin, max_y + margin, max_z + 1.2
 
 
-def parse_args() -> argparse.Namespace:
-    parser = argparse.ArgumentParser(description="Cartoon 3D renderer for the apartment layout")
-    parser.add_argument("--layout", default=Path(__file__).with_name("apartment_layout.json"), type=Path,
-                        help="Path to the layout JSON file")
-    parser.add_argument("--output", default=Path(__file__).with_name("render_output.png"), type=Path,
-                        help="Where to save the rendered image")
-    parser.add_argument("--dpi", type=int, default=None, help="Override render DPI")
-    return parser.parse_args()
+# Constants of mplot3d's camera, from Axes3D.set_box_aspect / get_proj / set_top_view
+# (matplotlib >= 3.9). The box aspect is normalised to a diagonal of 1.8294...,
+# tuned to the mpl 3.2 look, times 25/24 to undo the 1/48 margins 3.9 dropped.
+MPLOT3D_BOX_DIAGONAL = 1.8294640721620434 * 25 / 24
+# The eye sits this far from the box centre...
+MPLOT3D_DISTANCE = 10.0
+# ...and the square axes shows screen x and y over (-0.95, 0.9) / distance.
+MPLOT3D_VIEW_LIMITS = (-0.95 / MPLOT3D_DISTANCE, 0.9 / MPLOT3D_DISTANCE)
 
 
-def main() -> None:
-    args = parse_args()
-    with args.layout.open("r", encoding="utf-8") as fh:
-        layout = json.load(fh)
+@dataclass
+class View:
+    """A camera looking at a bounds box, with mplot3d's perspective conventions."""
 
-    render_cfg = layout.get("render", {})
-    background = render_cfg.get("background", "#fef8ef")
+    mins: np.ndarray
+    scale: float  # world units -> normalised box units
+    eye: np.ndarray  # in box units
+    basis: np.ndarray  # rows: screen right, screen up, towards the eye
+
+    @property
+    def eye_world(self) -> np.ndarray:
+        return self.mins + self.eye / self.scale
+
+    def project(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Screen-plane coordinates ``(..., 2)`` and view depth ``(...)`` of world points."""
+        rel = (np.asarray(points, dtype=float) - self.mins) * self.scale - self.eye
+        local = rel @ self.basis.T
+        depth = -local[..., 2]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            screen = local[..., :2] / depth[..., None]
+        return screen, depth
+
+
+@dataclass
+class Camera:
+    elev: float = 25.0
+    azim: float = -60.0
+    distance: Optional[float] = None
+
+    @classmethod
+    def from_render(cls, render_cfg: dict) -> "Camera":
+        camera = render_cfg.get("camera", {})
+        distance = camera.get("distance")
+        return cls(float(camera.get("elev", 25)), float(camera.get("azim", -60)), None if distance is None else float(distance))
+
+    def apply(self, ax) -> None:
+        ax.view_init(elev=self.elev, azim=self.azim)
+        if self.distance is not None:
+            # mplot3d keeps its eye at MPLOT3D_DISTANCE; scaling the box by the
+            # inverse ratio gives the same perspective as moving the eye.
+            aspect = [hi - lo for lo, hi in (ax.get_xlim(), ax.get_ylim(), ax.get_zlim())]
+            ax.set_box_aspect(aspect, zoom=MPLOT3D_DISTANCE / self.distance)
+
+    def view(self, bounds: Tuple[float, float, float, float, float]) -> View:
+        min_x, max_x, min_y, max_y, max_z = bounds
+        mins = np.array([min_x, min_y, 0.0])
+        extent = np.array([max_x - min_x, max_y - min_y, max_z])
+        scale = MPLOT3D_BOX_DIAGONAL / float(np.linalg.norm(extent))
+        elev, azim = math.radians(self.elev), math.radians(self.azim)
+        direction = np.array([math.cos(elev) * math.cos(azim), math.cos(elev) * math.sin(azim), math.sin(elev)])
+        eye = extent * scale / 2.0 + (self.distance or MPLOT3D_DISTANCE) * direction
+        right = normalize(np.cross([0.0, 0.0, 1.0], direction))
+        up = np.cross(direction, right)
+        return View(mins=mins, scale=scale, eye=eye, basis=np.stack([right, up, direction]))
+
+
+@dataclass
+class Viewport:
+    """Maps screen-plane coordinates of a view onto a pixel grid."""
+
+    width: int
+    height: int
+    center: np.ndarray
+    zoom: float
+    # A band of rows ``top:top + height`` of a viewport ``full_height`` rows tall.
+    top: int = 0
+    full_height: Optional[int] = None
+
+    @classmethod
+    def fit(cls, view: View, bounds: Tuple[float, float, float, float, float], width: int, height: int, margin: float = 0.04) -> "Viewport":
+        min_x, max_x, min_y, max_y, max_z = bounds
+        corners = np.array([[x, y, z] for x in (min_x, max_x) for y in (min_y, max_y) for z in (0.0, max_z)])
+        screen, _ = view.project(corners)
+        lo, hi = screen.min(axis=0), screen.max(axis=0)
+        span = np.maximum(hi - lo, 1e-9)
+        zoom = min(width * (1 - 2 * margin) / span[0], height * (1 - 2 * margin) / span[1])
+        return cls(width, height, (lo + hi) / 2.0, zoom)
+
+    @classmethod
+    def mplot3d(cls, width: int, height: int) -> "Viewport":
+        """The framing mplot3d gives a 3D axes of ``width`` x ``height`` pixels.
+
+        The axes draws in a centred square and shows the same screen-plane window
+        whatever the scene, so the raster and matplotlib backends line up.
+        """
+        lo, hi = MPLOT3D_VIEW_LIMITS
+        center = (lo + hi) / 2.0
+        return cls(width, height, np.array([center, center]), min(width, height) / (hi - lo))
+
+    def placed(self, left: float, top: float, width: int, height: int) -> "Viewport":
+        """This viewport drawn with its top-left corner at ``(left, top)`` of a ``width`` x ``height`` image."""
+        shift = np.array([left + self.width / 2.0 - width / 2.0, -(top + self.height / 2.0 - height / 2.0)])
+        return replace(self, width=width, height=height, center=self.center - shift / self.zoom)
+
+    def band(self, start: int, stop: int) -> "Viewport":
+        """Rows ``start:stop`` of this viewport; pixel coordinates stay those of the full image."""
+        return replace(self, height=stop - start, top=self.top + start, full_height=self.full_height or self.height)
+
+    def to_pixels(self, screen: np.ndarray) -> np.ndarray:
+        pixels = np.empty_like(screen)
+        pixels[..., 0] = self.width / 2.0 + (screen[..., 0] - self.center[0]) * self.zoom
+        pixels[..., 1] = (self.full_height or self.height) / 2.0 - (screen[..., 1] - self.center[1]) * self.zoom
+        return pixels
+
+
+# Coarsest mesh grid (u, v) any level of detail may use.
+MIN_MESH_RESOLUTION = (7, 5)
+LOD_LEVELS = 3
+LOD_BUDGET_PASSES = 3
+# LodPolicy.scale of the coarsest meshes and floor patterns, tried when the
+# proportional passes still miss the budget.
+LOD_FLOOR_SCALE = 0.0
+
+
+@dataclass(frozen=True)
+class LodPolicy:
+    """Mesh and floor-pattern detail from on-screen size and a polygon budget.
+
+    Grids are halved per level, so nearby sizes share cached templates. ``scale``
+    is the share of full detail the budget allows; 1.0 means within budget.
+    With a ``viewport`` the scene is for that one frame of ``view``, and
+    furniture outside it is not built at all.
+    """
+
+    view: Optional[View] = None
+    zoom: float = 1.0  # pixels per screen-plane unit of ``view``
+    pixels_per_segment: float = 6.0
+    scale: float = 1.0
+    viewport: Optional[Viewport] = None
+
+    @classmethod
+    def for_camera(
+        cls, camera: Camera, bounds: Tuple[float, float, float, float, float], width: int, height: int, cull: bool = False, **kwargs
+    ) -> "LodPolicy":
+        view = camera.view(bounds)
+        viewport = Viewport.mplot3d(width, height)
+        return cls(view=view, zoom=viewport.zoom, viewport=viewport if cull else None, **kwargs)
+
+    @property
+    def pattern_detail(self) -> float:
+        return min(1.0, self.scale)
+
+    def cache_key(self) -> list:
+        view = None
+        if self.view is not None:
+            view = [round(float(v), 9) for v in np.concatenate([self.view.mins, [self.view.scale], self.view.eye, self.view.basis.ravel()])]
+        frame = None if self.viewport is None else [self.viewport.width, self.viewport.height]
+        return [view, round(self.zoom, 6), self.pixels_per_segment, round(self.scale, 9), frame]
+
+    def mesh_resolution(self, base: Tuple[int, int], center: Sequence[float], radius: float) -> Tuple[int, int]:
+        factor = math.sqrt(min(1.0, self.scale))
+        if self.view is not None:
+            _, depth = self.view.project(np.asarray(center, dtype=float))
+            radius_px = radius * self.view.scale * self.zoom / max(float(depth), NEAR_DEPTH)
+            factor = min(factor, 2 * math.pi * radius_px / self.pixels_per_segment / base[0])
+        level = 0 if factor >= 1 else min(LOD_LEVELS, int(math.ceil(-math.log2(max(factor, 1e-6)))))
+        return tuple(max(low, round((full - 1) / 2**level) + 1) for full, low in zip(base, MIN_MESH_RESOLUTION))
+
+
+# World-space slack for "inside a room" and "on a wall plane" tests.
+CULL_TOLERANCE = 1e-6
+
+
+def _hidden_by_occluders(points: np.ndarray, occluders: Sequence[np.ndarray], eyes: np.ndarray) -> np.ndarray:
+    """Mask of ``(n, k, 3)`` primitives inside a closed room that every eye sees from outside.
+
+    Such a primitive is covered by the room shell unless it lies on one of the
+    shell sides facing an eye, like the near walls themselves.
+    """
+    hidden = np.zeros(points.shape[0], dtype=bool)
+    lo_all, hi_all = points.min(axis=1), points.max(axis=1)
+    for lo, hi in occluders:
+        outside = ((eyes < lo) | (eyes > hi)).any(axis=1)
+        if not outside.all():
+            continue
+        inside = ((lo_all >= lo - CULL_TOLERANCE) & (hi_all <= hi + CULL_TOLERANCE)).all(axis=1)
+        for eye in eyes:
+            for axis in range(3):
+                if lo[axis] <= eye[axis] <= hi[axis]:
+                    continue
+                plane = lo[axis] if eye[axis] < lo[axis] else hi[axis]
+                on_side = (lo_all[:, axis] >= plane - CULL_TOLERANCE) & (hi_all[:, axis] <= plane + CULL_TOLERANCE)
+                inside &= ~on_side
+        hidden |= inside
+    return hidden
+
+
+def cull_scene(scene: Scene, eyes: np.ndarray) -> Scene:
+    """Drop geometry no eye can see: back faces of solids and the contents of closed rooms.
+
+    ``eyes`` are world positions, shape ``(3,)`` or ``(m, 3)``; a primitive is kept
+    when any of them may see it, so a turntable can share one culled scene.
+    """
+    eyes = np.asarray(eyes, dtype=float).reshape(-1, 3)
+    culled = Scene(labels=list(scene.labels), occluders=list(scene.occluders))
+    for block in scene.polys:
+        keep = ~_hidden_by_occluders(block.verts, scene.occluders, eyes)
+        if block.normals is not None:
+            towards = np.einsum("nj,mnj->mn", block.normals, eyes[:, None, :] - block.verts[None, :, 0])
+            keep &= (towards >= 0).any(axis=0)
+        if keep.any():
+            culled.polys.append(block if keep.all() else block.select(keep))
+    for block in scene.segments:
+        keep = ~_hidden_by_occluders(block.segments, scene.occluders, eyes)
+        if keep.any():
+            culled.segments.append(replace(block, segments=block.segments[keep]))
+    for block in scene.points:
+        keep = ~_hidden_by_occluders(block.points[:, None], scene.occluders, eyes)
+        if keep.any():
+            culled.points.append(replace(block, points=block.points[keep]))
+    return culled
+
+
+def matplotlib_eye(camera: Camera, bounds: Tuple[float, float, float, float, float]) -> np.ndarray:
+    return camera.view(bounds).eye_world
+
+
+# Fragments generated per rasterisation chunk; bounds peak memory.
+RASTER_CHUNK = 1 << 21
+# Outlines stay visible on the faces they belong to despite depth quantisation.
+EDGE_DEPTH_BIAS = 2e-3
+NEAR_DEPTH = 1e-6
+
+
+def _triangle_fragments(
+    tri_xy: np.ndarray, tri_depth: np.ndarray, width: int, height: int, top: int = 0
+) -> Iterable[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Yield ``(pixel, depth, triangle)`` for pixel centres covered by each triangle.
+
+    Vectorised scanline: every (triangle, row) pair gets its covered x-span,
+    spans are expanded to pixels, and inverse depth, which is affine in screen
+    space, gives perspective-correct depth. Only rows ``top:top + height`` are
+    scanned; pixel indices are relative to that band.
+    """
+    a, b, c = tri_xy[:, 0], tri_xy[:, 1], tri_xy[:, 2]
+    area = (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0])
+    y_lo = np.maximum(np.ceil(tri_xy[:, :, 1].min(axis=1) - 0.5), top).astype(np.int64)
+    y_hi = np.minimum(np.floor(tri_xy[:, :, 1].max(axis=1) - 0.5), top + height - 1).astype(np.int64)
+    x_span = np.clip(np.ceil(tri_xy[:, :, 0].max(axis=1)) - np.floor(tri_xy[:, :, 0].min(axis=1)), 1, width)
+    rows = np.maximum(y_hi - y_lo + 1, 0)
+    alive = np.flatnonzero((rows > 0) & (np.abs(area) > 1e-12))
+    if alive.size == 0:
+        return
+
+    inv = 1.0 / tri_depth
+    d_b, d_c = inv[:, 1] - inv[:, 0], inv[:, 2] - inv[:, 0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        grad_x = (d_b * (c[:, 1] - a[:, 1]) - d_c * (b[:, 1] - a[:, 1])) / area
+        grad_y = (d_c * (b[:, 0] - a[:, 0]) - d_b * (c[:, 0] - a[:, 0])) / area
+    offset = inv[:, 0] - grad_x * a[:, 0] - grad_y * a[:, 1]
+
+    cost = np.cumsum(rows[alive] * x_span[alive])
+    chunk_id = (cost - 1) // RASTER_CHUNK
+    for chunk in np.unique(chunk_id):
+        tris = alive[chunk_id == chunk]
+        row_tri = np.repeat(tris, rows[tris])
+        row_y = y_lo[row_tri] + (np.arange(row_tri.size) - np.repeat(np.cumsum(rows[tris]) - rows[tris], rows[tris]))
+        centre_y = row_y + 0.5
+        left = np.full(row_tri.size, np.inf)
+        right = np.full(row_tri.size, -np.inf)
+        for start, end in ((0, 1), (1, 2), (2, 0)):
+            p, q = tri_xy[row_tri, start], tri_xy[row_tri, end]
+            crosses = ((p[:, 1] <= centre_y) & (centre_y < q[:, 1])) | ((q[:, 1] <= centre_y) & (centre_y < p[:, 1]))
+            with np.errstate(divide="ignore", invalid="ignore"):
+                x = p[:, 0] + (centre_y - p[:, 1]) * (q[:, 0] - p[:, 0]) / (q[:, 1] - p[:, 1])
+            left = np.where(crosses, np.minimum(left, x), left)
+            right = np.where(crosses, np.maximum(right, x), right)
+        x_lo = np.maximum(np.ceil(left - 0.5), 0)
+        x_hi = np.minimum(np.floor(right - 0.5), width - 1)
+        counts = np.where(np.isfinite(x_lo) & np.isfinite(x_hi), np.maximum(x_hi - x_lo + 1, 0), 0).astype(np.int64)
+        if counts.sum() == 0:
+            continue
+        frag_row = np.repeat(np.arange(row_tri.size), counts)
+        frag_x = x_lo[frag_row].astype(np.int64) + (np.arange(frag_row.size) - np.repeat(np.cumsum(counts) - counts, counts))
+        frag_tri = row_tri[frag_row]
+        frag_inv = grad_x[frag_tri] * (frag_x + 0.5) + grad_y[frag_tri] * centre_y[frag_row] + offset[frag_tri]
+        yield (row_y[frag_row] - top) * width + frag_x, 1.0 / frag_inv, frag_tri
+
+
+def _blend(image: np.ndarray, pixel: np.ndarray, depth: np.ndarray, rgba: np.ndarray) -> None:
+    """Composite fragments back to front; fragments of one pixel are blended in depth order."""
+    if pixel.size == 0:
+        return
+    order = np.lexsort((-depth, pixel))
+    pixel, rgba = pixel[order], rgba[order]
+    starts = np.ones(pixel.size, dtype=bool)
+    starts[1:] = pixel[1:] != pixel[:-1]
+    group_start = np.maximum.accumulate(np.where(starts, np.arange(pixel.size), 0))
+    rank = np.arange(pixel.size) - group_start
+    for layer in range(int(rank.max()) + 1):
+        sel = rank == layer
+        alpha = rgba[sel, 3:4]
+        image[pixel[sel]] = image[pixel[sel]] * (1 - alpha) + rgba[sel, :3] * alpha
+
+
+def _line_fragments(
+    ends_xy: np.ndarray, ends_depth: np.ndarray, radius: np.ndarray, width: int, height: int, top: int = 0
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Pixels covered by ``(n, 2, 2)`` segments drawn with a per-segment half-width.
+
+    Thick segments become parallel one-pixel strokes, so the fragment count grows
+    with length times width rather than with a square brush per sample.
+    """
+    if ends_xy.shape[0] == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, np.zeros(0), empty
+    direction = ends_xy[:, 1] - ends_xy[:, 0]
+    length = np.linalg.norm(direction, axis=1)
+    normal = np.stack([-direction[:, 1], direction[:, 0]], axis=1) / np.maximum(length, 1e-12)[:, None]
+    strokes = np.maximum(np.round(2 * radius), 1).astype(np.int64)
+    stroke_seg = np.repeat(np.arange(ends_xy.shape[0]), strokes)
+    stroke_idx = np.arange(stroke_seg.size) - np.repeat(np.cumsum(strokes) - strokes, strokes)
+    shift = (stroke_idx - (strokes[stroke_seg] - 1) / 2.0)[:, None] * normal[stroke_seg]
+
+    # Samples sit at i / span along each stroke; only the run of them that can land on
+    # the pixel grid is generated, so a band of rows does not pay for whole edges.
+    span = np.ceil(length[stroke_seg] / 0.7).astype(np.int64)
+    start = ends_xy[stroke_seg, 0] + shift
+    t_lo, t_hi = np.zeros(stroke_seg.size), np.ones(stroke_seg.size)
+    for axis, lo, hi in ((0, 0, width), (1, top, top + height)):
+        step = direction[stroke_seg, axis]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            enter, leave = (lo - 1.0 - start[:, axis]) / step, (hi + 1.0 - start[:, axis]) / step
+        inside = (start[:, axis] >= lo - 1.0) & (start[:, axis] <= hi + 1.0)
+        t_lo = np.maximum(t_lo, np.where(step == 0, np.where(inside, 0.0, np.inf), np.minimum(enter, leave)))
+        t_hi = np.minimum(t_hi, np.where(step == 0, np.where(inside, 1.0, -np.inf), np.maximum(enter, leave)))
+    first = np.clip(np.floor(np.minimum(t_lo, 1.0) * span), 0, span).astype(np.int64)
+    last = np.clip(np.ceil(np.maximum(t_hi, 0.0) * span), 0, span).astype(np.int64)
+    samples = np.where(t_lo <= t_hi, last - first + 1, 0)
+    frag_stroke = np.repeat(np.arange(stroke_seg.size), samples)
+    index = first[frag_stroke] + np.arange(frag_stroke.size) - np.repeat(np.cumsum(samples) - samples, samples)
+    t = index / np.maximum(span[frag_stroke], 1)
+    seg = stroke_seg[frag_stroke]
+    xy = ends_xy[seg, 0] + direction[seg] * t[:, None] + shift[frag_stroke]
+    inv = (1 - t) / ends_depth[seg, 0] + t / ends_depth[seg, 1]
+    cx = np.floor(xy[:, 0]).astype(np.int64)
+    cy = np.floor(xy[:, 1]).astype(np.int64)
+    keep = (cx >= 0) & (cx < width) & (cy >= top) & (cy < top + height)
+    return (cy[keep] - top) * width + cx[keep], 1.0 / inv[keep], seg[keep]
+
+
+def rasterize_scene(
+    scene: Scene,
+    view: View,
+    viewport: Viewport,
+    background: str,
+    dpi: float,
+) -> np.ndarray:
+    """Z-buffered software rendering of a scene into an ``(height, width, 3)`` float image.
+
+    For a :meth:`Viewport.band` only that band's rows are allocated and drawn.
+    """
+    width, height, top = viewport.width, viewport.height, viewport.top
+    image = np.empty((width * height, 3), dtype=np.float32)
+    image[:] = hex_to_rgb(background)
+    zbuffer = np.full(width * height, np.inf)
+    merged = scene.merged_polys()
+    px_per_point = dpi / 72.0
+
+    if merged is not None:
+        screen, depth = view.project(merged.verts)
+        pixels = viewport.to_pixels(screen)
+        k = merged.verts.shape[1]
+        fan = np.stack([np.zeros(k - 2, dtype=int), np.arange(1, k - 1), np.arange(2, k)], axis=1)
+        tri_xy = pixels[:, fan].reshape(-1, 3, 2)
+        tri_depth = depth[:, fan].reshape(-1, 3)
+        tri_face = np.repeat(np.arange(len(merged)), k - 2)
+        usable = (tri_depth > NEAR_DEPTH).all(axis=1) & np.isfinite(tri_xy).all(axis=(1, 2))
+        tri_xy, tri_depth, tri_face = tri_xy[usable], tri_depth[usable], tri_face[usable]
+        opaque = merged.facecolors[tri_face, 3] >= 1.0
+
+        owner = np.full(width * height, -1)
+        opaque_face = tri_face[opaque]
+        for pixel, frag_depth, tri in _triangle_fragments(tri_xy[opaque], tri_depth[opaque], width, height, top):
+            np.minimum.at(zbuffer, pixel, frag_depth)
+            won = frag_depth <= zbuffer[pixel]
+            owner[pixel[won]] = opaque_face[tri[won]]
+        covered = owner >= 0
+        image[covered] = merged.facecolors[owner[covered], :3]
+
+        edged = np.flatnonzero(merged.linewidths > 0)
+        if edged.size:
+            ends = np.stack([np.arange(k), (np.arange(k) + 1) % k], axis=1)
+            edge_xy = pixels[edged][:, ends].reshape(-1, 2, 2)
+            edge_depth = depth[edged][:, ends].reshape(-1, 2)
+            edge_face = np.repeat(edged, k)
+            usable = (edge_depth > NEAR_DEPTH).all(axis=1) & np.isfinite(edge_xy).all(axis=(1, 2))
+            usable &= np.linalg.norm(edge_xy[:, 1] - edge_xy[:, 0], axis=1) > 1e-9
+            edge_xy, edge_depth, edge_face = edge_xy[usable], edge_depth[usable], edge_face[usable]
+            radius = merged.linewidths[edge_face] * px_per_point / 2.0
+            pixel, frag_depth, seg = _line_fragments(edge_xy, edge_depth, radius, width, height, top)
+            visible = frag_depth <= zbuffer[pixel] * (1 + EDGE_DEPTH_BIAS)
+            pixel, frag_depth, seg = pixel[visible], frag_depth[visible], seg[visible]
+            edge_depth_buffer = np.full(width * height, np.inf)
+            np.minimum.at(edge_depth_buffer, pixel, frag_depth)
+            won = frag_depth <= edge_depth_buffer[pixel]
+            edge_owner = np.full(width * height, -1)
+            edge_owner[pixel[won]] = edge_face[seg[won]]
+            drawn = np.flatnonzero(edge_owner >= 0)
+            _blend(image, drawn, edge_depth_buffer[drawn], merged.edgecolors[edge_owner[drawn]])
+
+        translucent = ~opaque
+        fragments = list(_triangle_fragments(tri_xy[translucent], tri_depth[translucent], width, height, top))
+        if fragments:
+            pixel = np.concatenate([f[0] for f in fragments])
+            frag_depth = np.concatenate([f[1] for f in fragments])
+            tri = np.concatenate([f[2] for f in fragments])
+            visible = frag_depth < zbuffer[pixel]
+            faces = tri_face[translucent][tri[visible]]
+            _blend(image, pixel[visible], frag_depth[visible], merged.facecolors[faces])
+
+    for block in scene.segments:
+        screen, depth = view.project(block.segments)
+        ends_xy = viewport.to_pixels(screen)
+        usable = (depth > NEAR_DEPTH).all(axis=1)
+        radius = np.full(int(usable.sum()), block.linewidth * px_per_point / 2.0)
+        pixel, frag_depth, _ = _line_fragments(ends_xy[usable], depth[usable], radius, width, height, top)
+        visible = frag_depth <= zbuffer[pixel] * (1 + EDGE_DEPTH_BIAS)
+        image[np.unique(pixel[visible])] = block.color
+
+    for block in scene.points:
+        screen, depth = view.project(block.points)
+        centers = viewport.to_pixels(screen)
+        radius = math.sqrt(block.size) * px_per_point / 2.0
+        reach = int(math.ceil(radius))
+        grid = np.arange(-reach, reach + 1)
+        dx, dy = np.meshgrid(grid, grid)
+        disk = dx**2 + dy**2 <= radius**2
+        for (cx, cy), point_depth in zip(centers, depth):
+            if point_depth <= NEAR_DEPTH:
+                continue
+            xs, ys = int(cx) + dx[disk], int(cy) + dy[disk]
+            inside = (xs >= 0) & (xs < width) & (ys >= top) & (ys < top + height)
+            pixel = (ys[inside] - top) * width + xs[inside]
+            pixel = pixel[point_depth <= zbuffer[pixel]]
+            image[pixel] = image[pixel] * (1 - block.alpha) + np.array(block.color) * block.alpha
+
+    return image.reshape(height, width, 3)
+
+
+def load_layout(path: Path) -> dict:
+    with Path(path).open("r", encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def context_from_render(render_cfg: dict) -> RenderContext:
     light_direction = np.array(render_cfg.get("light_direction", [0.4, 0.5, 0.8]), dtype=float)
     if np.linalg.norm(light_direction) == 0:
         light_direction = np.array([0.3, 0.4, 0.85])
-    light_direction = normalize(light_direction)
-    ctx = RenderContext(light_direction=light_direction)
+    return RenderContext(light_direction=normalize(light_direction))
+
+
+# Bump when draw_* output changes so stale room caches are ignored.
+ROOM_CACHE_VERSION = 2
+
+
+class RoomCache:
+    """Per-room scene fragments stored as ``.npz`` files keyed by room and context hashes."""
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = Path(directory)
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, room: dict, ctx: RenderContext) -> str:
+        payload = json.dumps([ROOM_CACHE_VERSION, room, ctx.cache_key()], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path(self, room: dict, ctx: RenderContext) -> Path:
+        return self.directory / f"{self.key(room, ctx)}.npz"
+
+    def load(self, room: dict, ctx: RenderContext) -> Optional[Scene]:
+        path = self.path(room, ctx)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                fragment = scene_from_arrays(dict(data))
+        except (OSError, KeyError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return fragment
+
+    def store(self, room: dict, ctx: RenderContext, fragment: Scene) -> None:
+        path = self.path(room, ctx)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.stem}.{os.getpid()}.tmp")
+        with tmp.open("wb") as fh:
+            np.savez(fh, **scene_to_arrays(fragment))
+        os.replace(tmp, path)
+
+
+def scene_to_arrays(scene: Scene) -> Dict[str, np.ndarray]:
+    arrays: Dict[str, np.ndarray] = {}
+    for idx, block in enumerate(scene.polys):
+        arrays[f"poly{idx}_verts"] = block.verts
+        arrays[f"poly{idx}_face"] = block.facecolors
+        arrays[f"poly{idx}_edge"] = block.edgecolors
+        arrays[f"poly{idx}_width"] = block.linewidths
+        if block.normals is not None:
+            arrays[f"poly{idx}_normals"] = block.normals
+    for idx, block in enumerate(scene.segments):
+        arrays[f"seg{idx}"] = block.segments
+    for idx, block in enumerate(scene.points):
+        arrays[f"points{idx}"] = block.points
+    meta = {
+        "polys": len(scene.polys),
+        "segments": [[list(block.color), block.linewidth] for block in scene.segments],
+        "points": [[list(block.color), block.size, block.alpha] for block in scene.points],
+        "labels": [[list(label.position), label.text] for label in scene.labels],
+    }
+    arrays["occluders"] = np.array(scene.occluders).reshape(-1, 2, 3)
+    arrays["meta"] = np.array(json.dumps(meta, ensure_ascii=False))
+    return arrays
+
+
+def scene_from_arrays(arrays: Dict[str, np.ndarray]) -> Scene:
+    meta = json.loads(str(arrays["meta"]))
+    scene = Scene()
+    for idx in range(meta["polys"]):
+        scene.polys.append(PolyBlock(
+            arrays[f"poly{idx}_verts"], arrays[f"poly{idx}_face"], arrays[f"poly{idx}_edge"], arrays[f"poly{idx}_width"],
+            arrays.get(f"poly{idx}_normals"),
+        ))
+    for idx, (color, linewidth) in enumerate(meta["segments"]):
+        scene.segments.append(SegmentBlock(arrays[f"seg{idx}"], tuple(color), linewidth))
+    for idx, (color, size, alpha) in enumerate(meta["points"]):
+        scene.points.append(PointBlock(arrays[f"points{idx}"], tuple(color), size, alpha))
+    scene.labels.extend(Label(tuple(position), text) for position, text in meta["labels"])
+    scene.occluders.extend(arrays["occluders"])
+    return scene
+
+
+def build_scene(
+    layout: Union[dict, Sequence[RoomIR]],
+    ctx: RenderContext,
+    stats: Optional[RenderStats] = None,
+    cache: Optional[RoomCache] = None,
+) -> Scene:
+    """Draw every room of a layout (JSON or the rooms from :func:`compile_layout`)."""
+    rooms = compile_layout(layout) if isinstance(layout, dict) else layout
+    scene = Scene(stats=stats)
+    shown = visible_furniture(rooms, ctx)
+    for room in rooms:
+        if cache is None:
+            draw_room(scene, room, ctx, shown)
+            continue
+        with scene.measure((room.number, room.name), "cache"):
+            fragment = cache.load(room.source, ctx)
+            if fragment is not None:
+                scene.extend(fragment)
+                continue
+        fragment = Scene(stats=stats)
+        draw_room(fragment, room, ctx, shown)
+        cache.store(room.source, ctx, fragment)
+        scene.extend(fragment)
+    return scene
+
+
+def build_scene_within_budget(
+    layout: Union[dict, Sequence[RoomIR]],
+    ctx: RenderContext,
+    budget: int,
+    stats: Optional[RenderStats] = None,
+    cache: Optional[RoomCache] = None,
+) -> Scene:
+    """Build the scene, lowering LOD scale until it fits ``budget`` polygons (0 = no limit).
+
+    After ``LOD_BUDGET_PASSES`` proportional passes the last one uses the coarsest
+    level; a scene still over budget then is returned as is, for the caller to report.
+    """
+    rooms = compile_layout(layout) if isinstance(layout, dict) else layout
+    scene = build_scene(rooms, ctx, stats, cache)
+    lod = ctx.lod or LodPolicy()
+    for attempt in range(LOD_BUDGET_PASSES + 1):
+        if budget <= 0 or scene.polygon_count <= budget:
+            break
+        scale = lod.scale * budget / scene.polygon_count if attempt < LOD_BUDGET_PASSES else LOD_FLOOR_SCALE
+        lod = replace(lod, scale=scale)
+        if stats is not None:
+            stats.reset_rooms()
+        scene = build_scene(rooms, replace(ctx, lod=lod), stats, cache)
+    return scene
 
-    dpi = args.dpi or render_cfg.get("dpi", 260)
-    fig = plt.figure(figsize=(11, 7), dpi=dpi)
+
+@dataclass
+class Apartment:
+    """One layout file placed in a building; apartments with equal ``key`` share geometry."""
+
+    name: str
+    offset: np.ndarray  # (3,), floor plan shift with z = 0
+    rooms: List[RoomIR]
+    key: str  # digest of the layout's rooms
+
+    def bounds(self) -> np.ndarray:
+        """``(2, 3)`` world-space bounds of the room shells."""
+        lo = np.min([[*room.origin, 0.0] for room in self.rooms], axis=0)
+        hi = np.max([[room.origin[0] + room.size[0], room.origin[1] + room.size[1], room.height] for room in self.rooms], axis=0)
+        return np.stack([lo, hi]) + self.offset
+
+
+def load_building(building: dict, base_dir: Path) -> Tuple[dict, List[Apartment]]:
+    """Compose a building file into a layout for the backends plus its placed apartments.
+
+    ``apartments`` entries are ``{"layout": path, "offset": [x, y], "name": str}``
+    with paths relative to ``base_dir``; every layout file is read and compiled
+    once however often it is placed. The composed layout carries the building's
+    ``meta`` and ``render`` (falling back to the first apartment's) and room
+    bounds for :func:`compute_bounds`.
+    """
+    building = _mapping(building, "building")
+    loaded: Dict[Path, Tuple[dict, List[RoomIR], str]] = {}
+    apartments: List[Apartment] = []
+    rooms: List[dict] = []
+    entries = _items(_get(building, "apartments", "building"), "apartments")
+    if not entries:
+        raise LayoutError("apartments", "needs at least one apartment")
+    for idx, entry in enumerate(entries):
+        path = f"apartments[{idx}]"
+        source = (Path(base_dir) / _text(_get(entry, "layout", path), f"{path}.layout")).resolve()
+        if source not in loaded:
+            layout = load_layout(source)
+            try:
+                compiled = compile_layout(layout)
+            except LayoutError as exc:
+                raise LayoutError(f"{path}.layout", f"{source.name}: {exc}") from exc
+            if not compiled:
+                raise LayoutError(f"{path}.layout", f"{source.name} has no rooms")
+            digest = json.dumps(layout.get("rooms", []), sort_keys=True, ensure_ascii=False)
+            loaded[source] = (layout, compiled, hashlib.sha256(digest.encode("utf-8")).hexdigest())
+        layout, compiled, key = loaded[source]
+        offset = _vector(entry.get("offset", [0.0, 0.0]), f"{path}.offset", (2,))
+        name = _text(entry.get("name", f"{source.stem} {idx + 1}"), f"{path}.name")
+        apartments.append(Apartment(name, np.array([*offset, 0.0]), compiled, key))
+        for room in compiled:
+            origin = [room.origin[0] + offset[0], room.origin[1] + offset[1]]
+            rooms.append({"name": f"{name}/{room.name}", "origin": origin, "size": list(room.size), "height": room.height})
+    first = next(iter(loaded.values()))[0]
+    composed = {
+        "meta": building.get("meta", first.get("meta", {})),
+        "render": building.get("render", first.get("render", {})),
+        "rooms": rooms,
+    }
+    return composed, apartments
+
+
+# On-screen span in pixels from which an apartment keeps full detail, about a
+# single-apartment render at the default figure size.
+APARTMENT_FULL_DETAIL_PX = 1600
+
+
+def apartment_lod_scale(bounds: np.ndarray, view: View, viewport: Viewport) -> float:
+    """LOD scale of an apartment from its on-screen size.
+
+    Each halving of its span below ``APARTMENT_FULL_DETAIL_PX`` drops one level,
+    a quarter of the polygons.
+    """
+    corners = np.array([[x, y, z] for x in bounds[:, 0] for y in bounds[:, 1] for z in bounds[:, 2]])
+    screen, _ = view.project(corners)
+    pixels = viewport.to_pixels(screen)
+    span = pixels.max(axis=0) - pixels.min(axis=0)
+    share = float(span.max()) / APARTMENT_FULL_DETAIL_PX
+    level = min(LOD_LEVELS, max(0, round(-math.log2(max(share, 1e-6)))))
+    return 4.0 ** -level
+
+
+def build_building_scene(
+    apartments: Sequence[Apartment],
+    layout: dict,
+    ctx: RenderContext,
+    camera: Camera,
+    width: int,
+    height: int,
+    budget: int = 0,
+    stats: Optional[RenderStats] = None,
+    cache: Optional[RoomCache] = None,
+) -> Scene:
+    """Draw every apartment at its offset, labelled by apartment rather than by room.
+
+    Apartments get a LOD scale from their on-screen size, and all scales shrink
+    together until the scene fits ``budget`` polygons (0 = no limit); the last
+    pass uses the coarsest level, like :func:`build_scene_within_budget`.
+    Geometry is built once per distinct layout and scale, then translated into
+    place; ``cache`` shares rooms with earlier runs the same way. ``stats``
+    records per apartment the ``build`` of geometry it was first to need and
+    the ``place`` of its copy.
+    """
+    bounds = compute_bounds(layout.get("rooms", []))
+    view = camera.view(bounds)
+    viewport = Viewport.mplot3d(width, height)
+    scales = [apartment_lod_scale(apartment.bounds(), view, viewport) for apartment in apartments]
+    fragments: Dict[Tuple[str, str], Scene] = {}
+    factor = 1.0
+    for attempt in range(LOD_BUDGET_PASSES + 2):
+        if stats is not None:
+            stats.reset_rooms()
+        scene = Scene(stats=stats)
+        for number, (apartment, scale) in enumerate(zip(apartments, scales)):
+            apartment_ctx = replace(ctx, lod=LodPolicy(scale=scale * factor))
+            key = (apartment.key, apartment_ctx.cache_key())
+            if key not in fragments:
+                with scene.measure((number, apartment.name), "build"):
+                    fragments[key] = build_scene(apartment.rooms, apartment_ctx, None, cache)
+            with scene.measure((number, apartment.name), "place"):
+                placed = fragments[key].translated(apartment.offset)
+                placed.labels.clear()
+                scene.extend(placed)
+            lo, hi = apartment.bounds()
+            scene.add_label(((lo[0] + hi[0]) / 2.0, (lo[1] + hi[1]) / 2.0, hi[2] + 0.2), apartment.name)
+        if budget <= 0 or scene.polygon_count <= budget:
+            break
+        factor = factor * budget / scene.polygon_count if attempt < LOD_BUDGET_PASSES else LOD_FLOOR_SCALE
+    return scene
+
+
+def layout_title(layout: dict) -> str:
+    meta = layout.get("meta", {})
+    return f"{meta.get('title', 'Apartment Render')}\n{meta.get('concept', '')}"
+
+
+def render_matplotlib(
+    scene: Scene, layout: dict, camera: Camera, dpi: float, fig: Optional[Figure] = None, cull: bool = True
+) -> Figure:
+    """Reference backend: mplot3d painter's algorithm over the flushed scene.
+
+    With ``cull`` the scene is first reduced to what ``camera`` can see; pass
+    False for a scene already culled for several cameras.
+    """
+    background = layout.get("render", {}).get("background", "#fef8ef")
+    bounds = compute_bounds(layout.get("rooms", []))
+    fig = fig or plt.figure(figsize=FIGURE_SIZE, dpi=dpi)
     fig.patch.set_facecolor(background)
     ax = fig.add_subplot(111, projection="3d")
     ax.set_facecolor(background)
-
-    bounds = compute_bounds(layout.get("rooms", []))
     configure_axes(ax, bounds)
+    camera.apply(ax)
+    if cull:
+        scene = cull_scene(scene, matplotlib_eye(camera, bounds))
+    scene.flush(ax)
+    fig.suptitle(layout_title(layout), **TITLE_STYLE)
+    fig.tight_layout()
+    return fig
 
-    camera = render_cfg.get("camera", {})
-    ax.view_init(elev=camera.get("elev", 25), azim=camera.get("azim", -60))
-    if "distance" in camera:
-        ax.dist = camera["distance"]
 
-    for room in layout.get("rooms", []):
-        draw_room(ax, room, ctx)
+class PixelImage(martist.Artist):
+    """RGBA pixels drawn 1:1 into an axes' box, skipping matplotlib's image resampling."""
 
-    meta = layout.get("meta", {})
-    title = meta.get("title", "Apartment Render")
-    concept = meta.get("concept", "")
-    fig.suptitle(f"{title}\n{concept}", fontsize=16, fontweight="bold", color="#3a2d2a")
+    def __init__(self, ax, rgba: np.ndarray) -> None:
+        super().__init__()
+        self._ax = ax
+        # Renderers expect the bottom row first.
+        self._rgba = np.ascontiguousarray(rgba[::-1])
+
+    def get_window_extent(self, renderer=None):
+        return self._ax.get_window_extent(renderer)
+
+    def draw(self, renderer) -> None:
+        box = self.get_window_extent(renderer)
+        gc = renderer.new_gc()
+        renderer.draw_image(gc, round(box.x0), round(box.y0), self._rgba)
+        gc.restore()
+
+
+def _raster_axes(fig: Figure, layout: dict):
+    """The raster backend's image axes: frameless, under the layout title."""
+    ax = fig.add_subplot(111)
+    ax.set_axis_off()
+    fig.suptitle(layout_title(layout), **TITLE_STYLE)
+    fig.tight_layout()
+    return ax
+
+
+def raster_viewport(layout: dict, width: int, height: int, dpi: float) -> Viewport:
+    """Framing of :func:`render_raster` for a ``width`` x ``height`` image at ``dpi``.
 
-    output_path = Path(args.output)
+    Exporters that draw the whole image themselves use it so a poster or SVG
+    shows the scene exactly where the PNG of the same layout and camera does.
+    """
+    fig = Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+    FigureCanvasAgg(fig)
+    extent = _raster_axes(fig, layout).get_window_extent()
+    port = Viewport.mplot3d(max(1, int(round(extent.width))), max(1, int(round(extent.height))))
+    return port.placed(extent.x0, height - extent.y1, width, height)
+
+
+def render_raster(scene: Scene, layout: dict, camera: Camera, dpi: float, fig: Optional[Figure] = None) -> Figure:
+    """NumPy z-buffer backend; matplotlib only places the finished image, labels and title."""
+    background = layout.get("render", {}).get("background", "#fef8ef")
+    fig = fig or plt.figure(figsize=FIGURE_SIZE, dpi=dpi)
+    fig.patch.set_facecolor(background)
+    ax = _raster_axes(fig, layout)
+    extent = ax.get_window_extent()
+    width, height = max(1, int(round(extent.width))), max(1, int(round(extent.height)))
+
+    bounds = compute_bounds(layout.get("rooms", []))
+    view = camera.view(bounds)
+    viewport = Viewport.mplot3d(width, height)
+    image = rasterize_scene(cull_scene(scene, view.eye_world), view, viewport, background, dpi)
+    rgba = np.full((height, width, 4), 255, dtype=np.uint8)
+    rgba[..., :3] = np.round(image * 255)
+    ax.add_artist(PixelImage(ax, rgba))
+    ax.set_xlim(0, width)
+    ax.set_ylim(height, 0)
+    if scene.labels:
+        screen, depth = view.project(np.array([label.position for label in scene.labels]))
+        for label, (x, y), label_depth in zip(scene.labels, viewport.to_pixels(screen), depth):
+            if label_depth > NEAR_DEPTH:
+                ax.text(x, y, label.text, clip_on=True, **LABEL_STYLE)
+    return fig
+
+
+BACKENDS = {"matplotlib": render_matplotlib, "raster": render_raster}
+
+
+def save_figure(fig: Figure, output_path: Path, dpi: float, background: str, close: bool = True, tight: bool = True) -> None:
+    """Save ``fig``; ``tight`` crops to the drawn content, otherwise the canvas keeps the figure size."""
+    output_path = Path(output_path)
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    plt.tight_layout()
-    plt.savefig(output_path, dpi=dpi, facecolor=background, bbox_inches="tight")
-    print(f"Saved render to {output_path}")
+    fig.savefig(output_path, dpi=dpi, facecolor=background, bbox_inches="tight" if tight else None)
+    if close:
+        plt.close(fig)
+
+
+# Image rows rasterised and compressed per step of a tiled export.
+TILE_ROWS = 256
+
+
+class PngWriter:
+    """Streams RGB rows into a PNG file, so no more than one band is ever in memory."""
+
+    SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+    def __init__(self, path: Path, width: int, height: int, level: int = 6) -> None:
+        self.width = width
+        self.height = height
+        self.rows = 0
+        self._compress = zlib.compressobj(level)
+        self._fh = Path(path).open("wb")
+        self._fh.write(self.SIGNATURE)
+        # 8-bit truecolour, deflate, adaptive filtering, no interlace.
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+
+    def __enter__(self) -> "PngWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._fh.close()
+
+    def _chunk(self, kind: bytes, data: bytes) -> None:
+        self._fh.write(struct.pack(">I", len(data)) + kind + data)
+        self._fh.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(kind)) & 0xFFFFFFFF))
+
+    def write(self, rows: np.ndarray) -> None:
+        """Append ``(n, width, 3)`` uint8 rows, encoded with the Sub filter."""
+        count = rows.shape[0]
+        if rows.shape[1:] != (self.width, 3) or self.rows + count > self.height:
+            raise ValueError(f"expected at most {self.height - self.rows} rows of shape ({self.width}, 3), got {rows.shape}")
+        flat = rows.reshape(count, -1)
+        raw = np.empty((count, flat.shape[1] + 1), dtype=np.uint8)
+        raw[:, 0] = 1
+        raw[:, 1:4] = flat[:, :3]
+        np.subtract(flat[:, 3:], flat[:, :-3], out=raw[:, 4:], dtype=np.uint8, casting="unsafe")
+        data = self._compress.compress(raw.tobytes())
+        if data:
+            self._chunk(b"IDAT", data)
+        self.rows += count
+
+    def close(self) -> None:
+        try:
+            if self.rows != self.height:
+                raise ValueError(f"PNG needs {self.height} rows, got {self.rows}")
+            self._chunk(b"IDAT", self._compress.flush())
+            self._chunk(b"IEND", b"")
+        finally:
+            self._fh.close()
+
+
+def _overlay_text(band: np.ndarray, top: int, texts: Sequence[Tuple[float, float, str, dict]], dpi: float) -> None:
+    """Draw texts given in full-image pixels onto the uint8 rows ``top:top + len(band)``."""
+    height, width = band.shape[:2]
+    fig = Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+    canvas = FigureCanvasAgg(fig)
+    fig.patch.set_alpha(0.0)
+    ax = fig.add_axes((0, 0, 1, 1))
+    ax.set_axis_off()
+    ax.set_xlim(0, width)
+    ax.set_ylim(top + height, top)
+    for x, y, text, style in texts:
+        ax.text(x, y, text, **style)
+    canvas.draw()
+    rgba = np.asarray(canvas.buffer_rgba())[:height, :width]
+    alpha = rgba[..., 3:] / 255.0
+    target = band[: rgba.shape[0], : rgba.shape[1]]
+    target[:] = np.round(target * (1 - alpha) + rgba[..., :3] * alpha)
+
+
+def _fit_font_size(text: str, style: dict, width: float, dpi: float) -> float:
+    """``style``'s font size, shrunk so ``text`` fits ``width`` pixels."""
+    fig = Figure(dpi=dpi)
+    canvas = FigureCanvasAgg(fig)
+    extent = fig.text(0, 0, text, **style).get_window_extent(canvas.get_renderer())
+    return style["fontsize"] * min(1.0, width / max(extent.width, 1.0))
+
+
+def _fitted_title(layout: dict, width: int, dpi: float) -> Tuple[str, float]:
+    """Title text and its font size fitted to ``width`` pixels."""
+    title = layout_title(layout)
+    return title, _fit_font_size(title, TITLE_STYLE, 0.98 * width, dpi)
+
+
+def export_tiled(
+    scene: Scene, layout: dict, camera: Camera, dpi: float, output: Path, band_rows: int = TILE_ROWS
+) -> Tuple[int, int]:
+    """Rasterise a poster-size PNG band by band; memory depends on the band, not the image.
+
+    Uses the raster backend with the figure size at ``dpi`` and frames the scene
+    like it: a title strip on top and the scene below, with room labels drawn
+    onto each band.
+    Returns the image size.
+    """
+    output = Path(output)
+    if output.suffix.lower() != ".png":
+        raise ValueError(f"tiled export writes PNG files, got {output.name}")
+    background = layout.get("render", {}).get("background", "#fef8ef")
+    width, height = (int(round(side * dpi)) for side in FIGURE_SIZE)
+    title, title_pt = _fitted_title(layout, width, dpi)
+    view = camera.view(compute_bounds(layout.get("rooms", [])))
+    scene_port = raster_viewport(layout, width, height, dpi)
+    visible = cull_scene(scene, view.eye_world)
+
+    title_style = dict(TITLE_STYLE, fontsize=title_pt, ha="center", va="top")
+    texts: List[Tuple[float, float, str, dict]] = [(width / 2.0, 0.01 * height, title, title_style)]
+    if scene.labels:
+        screen, depth = view.project(np.array([label.position for label in scene.labels]))
+        for label, (x, y), label_depth in zip(scene.labels, scene_port.to_pixels(screen), depth):
+            if label_depth > NEAR_DEPTH:
+                texts.append((x, y, label.text, LABEL_STYLE))
+    # Texts reach at most a few lines beyond their anchor.
+    reach = 4 * title_pt * dpi / 72.0
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with PngWriter(output, width, height) as png:
+        for start in range(0, height, band_rows):
+            stop = min(height, start + band_rows)
+            image = rasterize_scene(visible, view, scene_port.band(start, stop), background, dpi)
+            band = np.round(image * 255).astype(np.uint8)
+            nearby = [text for text in texts if start - reach <= text[1] <= stop + reach]
+            if nearby:
+                _overlay_text(band, start, nearby, dpi)
+            png.write(band)
+    return width, height
+
+
+# Projected polygons smaller than this many square pixels are left out of SVG files.
+SVG_MIN_AREA = 0.5
+
+
+def _svg_number(value: float) -> str:
+    text = f"{value:.1f}"
+    return text[:-2] if text.endswith(".0") else text
+
+
+def _svg_color(rgb: np.ndarray) -> str:
+    return "#" + "".join(f"{int(round(255 * float(v))):02x}" for v in rgb[:3])
+
+
+def _svg_ring(points: np.ndarray, closed: bool = True) -> str:
+    coords = " ".join(f"{_svg_number(x)} {_svg_number(y)}" for x, y in points)
+    return f"M{coords}{'Z' if closed else ''}"
+
+
+def _svg_text(x: float, y: float, text: str, style: dict, dpi: float) -> str:
+    size = style["fontsize"] * dpi / 72.0
+    anchor = {"left": "start", "center": "middle", "right": "end"}[style.get("ha", "center")]
+    weight = style.get("weight", style.get("fontweight", "normal"))
+    lines = text.split("\n")
+    # Matplotlib anchors multi-line text by its block: "bottom" puts the last line on y.
+    first = y - (len(lines) - 1) * 1.2 * size if style.get("va") == "bottom" else y + size
+    spans = "".join(
+        f'<tspan x="{_svg_number(x)}" y="{_svg_number(first + idx * 1.2 * size)}">{_escape_xml(line)}</tspan>'
+        for idx, line in enumerate(lines)
+    )
+    return (
+        f'<text font-size="{_svg_number(size)}" font-weight="{weight}" text-anchor="{anchor}" '
+        f'fill="{style.get("color", "#000000")}">{spans}</text>'
+    )
+
+
+def _escape_xml(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def export_svg(scene: Scene, layout: dict, camera: Camera, dpi: float, output: Path) -> Dict[str, int]:
+    """Write the scene as a compact SVG drawn with the painter's algorithm.
+
+    Polygons are projected with the raster backend's camera and framing, so the
+    SVG lines up with the PNG of the same layout, and drawn farthest first.
+    Faces under ``SVG_MIN_AREA`` pixels are dropped. Coplanar faces of
+    one style become a single path; outline-less groups are unioned so tile
+    seams vanish. A group is only moved past faces its screen bounds do not
+    overlap, so visibility matches the unmerged order. Styles are CSS classes.
+    Returns face, dropped and element counts.
+    """
+    from shapely.geometry import Polygon
+    from shapely.ops import unary_union
+
+    output = Path(output)
+    if output.suffix.lower() != ".svg":
+        raise ValueError(f"vector export writes SVG files, got {output.name}")
+    background = layout.get("render", {}).get("background", "#fef8ef")
+    width, height = (int(round(side * dpi)) for side in FIGURE_SIZE)
+    title, title_pt = _fitted_title(layout, width, dpi)
+    view = camera.view(compute_bounds(layout.get("rooms", [])))
+    port = raster_viewport(layout, width, height, dpi)
+    visible = cull_scene(scene, view.eye_world)
+    px_per_point = dpi / 72.0
+
+    # Primitives: (depth key, group key, style, pixel points, closed, outlined).
+    styles: Dict[Tuple, int] = {}
+    primitives = []
+    faces = dropped = 0
+    merged = visible.merged_polys()
+    if merged is not None:
+        screen, depth = view.project(merged.verts)
+        pixels = port.to_pixels(screen)
+        x, y = pixels[..., 0], pixels[..., 1]
+        area = 0.5 * np.abs(np.sum(x * np.roll(y, -1, axis=1) - np.roll(x, -1, axis=1) * y, axis=1))
+        usable = (depth > NEAR_DEPTH).all(axis=1) & np.isfinite(pixels).all(axis=(1, 2))
+        faces = int(usable.sum())
+        keep = usable & (area >= SVG_MIN_AREA)
+        dropped = faces - int(keep.sum())
+        verts = merged.verts
+        normals = np.cross(verts[:, 1] - verts[:, 0], verts[:, -1] - verts[:, 0])
+        normals = normalize(normals)
+        offsets = np.einsum("ij,ij->i", normals, verts[:, 0])
+        for idx in np.flatnonzero(keep):
+            outlined = merged.linewidths[idx] > 0
+            style = (
+                _svg_color(merged.facecolors[idx]), round(float(merged.facecolors[idx, 3]), 3),
+                _svg_color(merged.edgecolors[idx]) if outlined else None,
+                round(float(merged.linewidths[idx]) * px_per_point, 2) if outlined else 0.0,
+            )
+            style_id = styles.setdefault(style, len(styles))
+            plane = (*np.round(normals[idx], 4), round(float(offsets[idx]), 3))
+            points = pixels[idx]
+            points = points[np.r_[True, np.any(np.diff(points, axis=0) != 0, axis=1)]]
+            primitives.append((float(depth[idx].min()), (style_id, plane), style_id, points, True, outlined))
+    for block in visible.segments:
+        screen, depth = view.project(block.segments)
+        ends = port.to_pixels(screen)
+        style_id = styles.setdefault((None, 1.0, _svg_color(np.array(block.color)), round(block.linewidth * px_per_point, 2)), len(styles))
+        for points, seg_depth in zip(ends, depth):
+            if (seg_depth > NEAR_DEPTH).all():
+                primitives.append((float(seg_depth.min()), (style_id, None), style_id, points, False, True))
+
+    primitives.sort(key=lambda item: -item[0])
+    groups: List[dict] = []
+    open_keys: Dict[Tuple, int] = {}
+    open_boxes = np.empty((0, 4))
+    open_ids: List[int] = []
+    emitted: List[int] = []
+    for _, key, style_id, points, closed, outlined in primitives:
+        box = np.concatenate([points.min(axis=0), points.max(axis=0)])
+        if open_ids:
+            hit = (open_boxes[:, 0] <= box[2]) & (open_boxes[:, 2] >= box[0]) & (open_boxes[:, 1] <= box[3]) & (open_boxes[:, 3] >= box[1])
+            closing = [pos for pos in np.flatnonzero(hit) if groups[open_ids[pos]]["key"] != key]
+            if closing:
+                # Faces drawn so far under this one must reach the file before it.
+                for pos in closing:
+                    emitted.append(open_ids[pos])
+                    del open_keys[groups[open_ids[pos]]["key"]]
+                still = np.ones(len(open_ids), dtype=bool)
+                still[closing] = False
+                open_ids = [gid for gid, keep_open in zip(open_ids, still) if keep_open]
+                open_boxes = open_boxes[still]
+        gid = open_keys.get(key)
+        if gid is None:
+            gid = len(groups)
+            groups.append({"key": key, "style": style_id, "rings": [], "closed": closed, "outlined": outlined})
+            open_keys[key] = gid
+            open_ids.append(gid)
+            open_boxes = np.vstack([open_boxes, box])
+        else:
+            pos = open_ids.index(gid)
+            open_boxes[pos, :2] = np.minimum(open_boxes[pos, :2], box[:2])
+            open_boxes[pos, 2:] = np.maximum(open_boxes[pos, 2:], box[2:])
+        groups[gid]["rings"].append(points)
+    emitted.extend(open_ids)
+
+    paths = []
+    for gid in emitted:
+        group = groups[gid]
+        rings = group["rings"]
+        if group["closed"] and not group["outlined"] and len(rings) > 1:
+            union = unary_union([Polygon(ring).buffer(0) for ring in rings if len(ring) >= 3])
+            polygons = getattr(union, "geoms", [union])
+            rings = [np.asarray(ring.coords)[:-1] for poly in polygons if not poly.is_empty for ring in (poly.exterior, *poly.interiors)]
+        data = "".join(_svg_ring(ring, group["closed"]) for ring in rings if len(ring) >= 2)
+        if data:
+            paths.append(f'<path class="s{group["style"]}" d="{data}"/>')
+
+    css = []
+    for (fill, opacity, stroke, stroke_width), style_id in styles.items():
+        rules = [f"fill:{fill or 'none'}"]
+        if opacity < 1.0:
+            rules.append(f"opacity:{opacity:g}")
+        if stroke is not None:
+            rules.append(f"stroke:{stroke};stroke-width:{stroke_width:g};stroke-linejoin:round")
+        css.append(f".s{style_id}{{{';'.join(rules)}}}")
+    texts = [_svg_text(width / 2.0, 0.01 * height, title, dict(TITLE_STYLE, fontsize=title_pt, ha="center", va="top"), dpi)]
+    if scene.labels:
+        screen, depth = view.project(np.array([label.position for label in scene.labels]))
+        for label, (lx, ly), label_depth in zip(scene.labels, port.to_pixels(screen), depth):
+            if label_depth > NEAR_DEPTH:
+                texts.append(_svg_text(lx, ly, label.text, LABEL_STYLE, dpi))
+    document = "\n".join([
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}" '
+        'font-family="DejaVu Sans, sans-serif">',
+        f"<style>{''.join(css)}</style>",
+        f'<rect width="100%" height="100%" fill="{background}"/>',
+        *paths,
+        *texts,
+        "</svg>\n",
+    ])
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(document, encoding="utf-8")
+    return {"faces": faces, "dropped": dropped, "elements": len(paths)}
+
+
+def turntable(camera: Camera, views: int) -> List[Camera]:
+    """``views`` cameras evenly spaced in azimuth, starting from ``camera``."""
+    return [Camera(camera.elev, camera.azim + 360.0 * idx / views, camera.distance) for idx in range(views)]
+
+
+def view_output_paths(output: Path, count: int, tag: str = "view") -> List[Path]:
+    output = Path(output)
+    digits = max(2, len(str(count - 1)))
+    return [output.with_name(f"{output.stem}_{tag}{idx:0{digits}d}{output.suffix}") for idx in range(count)]
+
+
+def render_views(
+    scene: Scene,
+    layout: dict,
+    cameras: Sequence[Camera],
+    outputs: Sequence[Path],
+    dpi: float,
+    backend: str = "matplotlib",
+) -> None:
+    """Render one frame per camera from an already built scene.
+
+    The matplotlib backend flushes the scene, culled for all the cameras at once,
+    into a single figure and only moves the camera between frames; the raster
+    backend culls and re-projects per view. Frames are not cropped, so every one
+    has the full figure size and sequences line up.
+    """
+    background = layout.get("render", {}).get("background", "#fef8ef")
+    if backend == "matplotlib":
+        bounds = compute_bounds(layout.get("rooms", []))
+        scene = cull_scene(scene, [matplotlib_eye(camera, bounds) for camera in cameras])
+        fig = render_matplotlib(scene, layout, cameras[0], dpi, cull=False)
+        ax = fig.axes[0]
+        for camera, output in zip(cameras, outputs):
+            camera.apply(ax)
+            save_figure(fig, output, dpi, background, close=False, tight=False)
+        plt.close(fig)
+        return
+    for camera, output in zip(cameras, outputs):
+        save_figure(BACKENDS[backend](scene, layout, camera, dpi), output, dpi, background, tight=False)
+
+
+def _render_views_job(job: Tuple[Scene, dict, List[Camera], List[Path], float, str]) -> int:
+    render_views(*job)
+    return len(job[2])
+
+
+def render_views_parallel(
+    scene: Scene,
+    layout: dict,
+    cameras: Sequence[Camera],
+    outputs: Sequence[Path],
+    dpi: float,
+    backend: str = "matplotlib",
+    workers: int = 1,
+) -> None:
+    """Split the views across a process pool; each worker receives the pickled scene once."""
+    workers = max(1, min(workers, len(cameras)))
+    if workers == 1:
+        render_views(scene, layout, cameras, outputs, dpi, backend)
+        return
+    chunks = [idx for idx in np.array_split(np.arange(len(cameras)), workers) if idx.size]
+    jobs = [(scene, layout, [cameras[i] for i in idx], [outputs[i] for i in idx], dpi, backend) for idx in chunks]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(_render_views_job, jobs))
+
+
+WALKTHROUGH_FPS = 12
+CAMERA_KEYS = ("elev", "azim", "distance")
+
+
+def walkthrough_cameras(render_cfg: dict, fps: Optional[float] = None) -> Tuple[List[Camera], float]:
+    """Cameras for every frame of ``render.walkthrough`` and the frame rate.
+
+    Keyframes are ``{"time": s, "elev": deg, "azim": deg, "distance": d}``; values
+    a keyframe leaves out carry over from the previous one (the first falls back
+    to ``render.camera``), and frames interpolate linearly between keyframes.
+    """
+    path = "render.walkthrough"
+    walkthrough = _mapping(render_cfg.get("walkthrough", {}), path)
+    fps = _number(fps if fps is not None else walkthrough.get("fps", WALKTHROUGH_FPS), f"{path}.fps")
+    if fps <= 0:
+        raise LayoutError(f"{path}.fps", "must be positive")
+    keyframes = _items(walkthrough.get("keyframes", []), f"{path}.keyframes")
+    if len(keyframes) < 2:
+        raise LayoutError(f"{path}.keyframes", "needs at least two keyframes")
+    current = asdict(Camera.from_render(render_cfg))
+    times, values = [], []
+    for idx, key in enumerate(keyframes):
+        key_path = f"{path}.keyframes[{idx}]"
+        times.append(_number(_get(key, "time", key_path), f"{key_path}.time"))
+        if idx and times[-1] <= times[-2]:
+            raise LayoutError(f"{key_path}.time", "keyframe times must increase")
+        for name in CAMERA_KEYS:
+            if name in key:
+                current[name] = _number(key[name], f"{key_path}.{name}")
+        values.append(dict(current))
+    frame_times = times[0] + np.arange(int(math.floor((times[-1] - times[0]) * fps)) + 1) / fps
+    tracks = {}
+    for name in CAMERA_KEYS:
+        track = [value[name] for value in values]
+        tracks[name] = None if None in track else np.interp(frame_times, times, track)
+    cameras = [
+        Camera(
+            float(tracks["elev"][idx]),
+            float(tracks["azim"][idx]),
+            None if tracks["distance"] is None else float(tracks["distance"][idx]),
+        )
+        for idx in range(len(frame_times))
+    ]
+    return cameras, fps
+
+
+def _check_animation_format(output: Path) -> None:
+    suffix = output.suffix.lower()
+    if suffix not in (".gif", ".mp4"):
+        raise ValueError(f"unsupported animation format: {output.name} (use .gif, .mp4 or .png)")
+    if suffix == ".mp4" and shutil.which("ffmpeg") is None:
+        raise ValueError("MP4 output needs ffmpeg on PATH; use .gif or .png frames instead")
+
+
+def assemble_animation(frames: Sequence[Path], output: Path, fps: float) -> None:
+    """Encode equally sized rendered frames as a GIF (Pillow) or an MP4 (ffmpeg)."""
+    from PIL import Image
+
+    output = Path(output)
+    _check_animation_format(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    if output.suffix.lower() == ".gif":
+        first, *rest = (Image.open(path).convert("RGB") for path in frames)
+        first.save(output, save_all=True, append_images=rest, duration=round(1000 / fps), loop=0)
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        for idx, path in enumerate(frames):
+            shutil.copyfile(path, Path(tmp) / f"{idx:06d}.png")
+        # yuv420p needs even dimensions; pad odd ones by a pixel.
+        subprocess.run(
+            [shutil.which("ffmpeg"), "-y", "-loglevel", "error", "-framerate", str(fps), "-i", str(Path(tmp) / "%06d.png"),
+             "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", "-c:v", "libx264", "-pix_fmt", "yuv420p", str(output)],
+            check=True,
+        )
+
+
+def render_walkthrough(
+    scene: Scene,
+    layout: dict,
+    output: Path,
+    dpi: float,
+    backend: str = "matplotlib",
+    workers: int = 1,
+    fps: Optional[float] = None,
+) -> int:
+    """Render the keyframed camera path of the layout to a PNG sequence, GIF or MP4.
+
+    The scene is built once by the caller; frames only re-project it and are
+    split across ``workers`` processes like ``--views``. Returns the frame count.
+    """
+    render_cfg = layout.get("render", {})
+    cameras, fps = walkthrough_cameras(render_cfg, fps)
+    output = Path(output)
+    if output.suffix.lower() == ".png":
+        render_views_parallel(scene, layout, cameras, view_output_paths(output, len(cameras), "frame"), dpi, backend, workers)
+        return len(cameras)
+    _check_animation_format(output)
+    with tempfile.TemporaryDirectory() as tmp:
+        frames = view_output_paths(Path(tmp) / "walk.png", len(cameras), "frame")
+        render_views_parallel(scene, layout, cameras, frames, dpi, backend, workers)
+        assemble_animation(frames, output, fps)
+    return len(cameras)
+
+
+class FigurePool:
+    """Agg figures kept warm between renders and recycled with ``clf()``."""
+
+    def __init__(self) -> None:
+        self._figures: Dict[float, Figure] = {}
+        self.created = 0
+        self.reused = 0
+
+    def acquire(self, dpi: float) -> Figure:
+        fig = self._figures.get(float(dpi))
+        if fig is None:
+            fig = Figure(figsize=FIGURE_SIZE, dpi=dpi)
+            FigureCanvasAgg(fig)
+            self._figures[float(dpi)] = fig
+            self.created += 1
+        else:
+            fig.clf()
+            self.reused += 1
+        return fig
+
+
+@dataclass
+class RenderJob:
+    layout: dict
+    output: Path
+    dpi: Optional[float] = None
+    backend: str = "matplotlib"
+    source: Optional[Path] = None
+    # Set by the consumer when the job could not be rendered.
+    error: Optional[str] = None
+
+
+def parse_job(entry: dict, base: Path, default_output: Path) -> RenderJob:
+    """A job is either a bare layout or ``{"layout": path-or-dict, "output": ..., "dpi": ..., "backend": ...}``."""
+    if "rooms" in entry:
+        return RenderJob(layout=entry, output=default_output)
+    layout = entry.get("layout")
+    if isinstance(layout, str):
+        layout_path = base / layout
+        layout = load_layout(layout_path)
+        default_output = layout_path.with_suffix(".png")
+    if not isinstance(layout, dict):
+        raise ValueError("job needs a layout path or an inline layout object")
+    backend = entry.get("backend", "matplotlib")
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown backend {backend!r}")
+    output = base / entry["output"] if "output" in entry else default_output
+    return RenderJob(layout=layout, output=output, dpi=entry.get("dpi"), backend=backend)
+
+
+def iter_stdin_jobs(stream: TextIO, base: Path) -> Iterator[RenderJob]:
+    for number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield parse_job(json.loads(line), base, base / f"job-{number:05d}.png")
+        except (OSError, KeyError, ValueError) as exc:
+            print(f"job {number}: {exc}", file=sys.stderr)
+
+
+def iter_directory_jobs(directory: Path, poll: float = 1.0, once: bool = False) -> Iterator[RenderJob]:
+    """Jobs from ``*.json`` files; images go to ``rendered/``.
+
+    Once the consumer is done with a job its file moves to ``done/``, or to
+    ``failed/`` with the reason in ``<name>.error.txt`` if it could not be
+    parsed or the consumer set :attr:`RenderJob.error`.
+    """
+    directory = Path(directory)
+    rendered = directory / "rendered"
+    while True:
+        pending = sorted(directory.glob("*.json"), key=lambda path: (path.stat().st_mtime, path.name))
+        for path in pending:
+            try:
+                job = parse_job(load_layout(path), directory, rendered / f"{path.stem}.png")
+            except (OSError, KeyError, ValueError) as exc:
+                print(f"{path.name}: {exc}", file=sys.stderr)
+                error = str(exc)
+            else:
+                job.source = path
+                yield job
+                error = job.error
+            target = directory / ("done" if error is None else "failed")
+            target.mkdir(exist_ok=True)
+            os.replace(path, target / path.name)
+            if error is not None:
+                (target / f"{path.stem}.error.txt").write_text(error + "\n", encoding="utf-8")
+        if once:
+            return
+        if not pending:
+            time.sleep(poll)
+
+
+def render_job(job: RenderJob, pool: FigurePool, cache: Optional[RoomCache] = None) -> None:
+    render_cfg = job.layout.get("render", {})
+    dpi = job.dpi or render_cfg.get("dpi", 260)
+    scene = build_scene(job.layout, context_from_render(render_cfg), cache=cache)
+    fig = BACKENDS[job.backend](scene, job.layout, Camera.from_render(render_cfg), dpi, pool.acquire(dpi))
+    save_figure(fig, job.output, dpi, render_cfg.get("background", "#fef8ef"), close=False)
+
+
+def serve(
+    jobs: Iterable[RenderJob],
+    pool: Optional[FigurePool] = None,
+    cache: Optional[RoomCache] = None,
+    log: Callable[[str], None] = print,
+) -> int:
+    """Render jobs as they arrive, reporting throughput; returns the number rendered."""
+    pool = pool or FigurePool()
+    rendered = 0
+    started = time.perf_counter()
+    for job in jobs:
+        job_started = time.perf_counter()
+        try:
+            render_job(job, pool, cache)
+        except Exception as exc:  # one bad job must not stop the service
+            job.error = f"{type(exc).__name__}: {exc}"
+            log(f"failed {job.source or job.output}: {job.error}")
+            continue
+        rendered += 1
+        elapsed = time.perf_counter() - started
+        log(f"rendered {job.output} in {time.perf_counter() - job_started:.2f} s; {rendered / elapsed * 60:.1f} renders/min")
+    return rendered
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Cartoon 3D renderer for the apartment layout")
+    parser.add_argument("--layout", default=Path(__file__).with_name("apartment_layout.json"), type=Path,
+                        help="Path to the layout JSON file")
+    parser.add_argument("--output", default=Path(__file__).with_name("render_output.png"), type=Path,
+                        help="Where to save the rendered image")
+    parser.add_argument("--dpi", type=int, default=None, help="Override render DPI")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="matplotlib",
+                        help="matplotlib (reference mplot3d) or raster (NumPy z-buffer)")
+    parser.add_argument("--lod", action="store_true",
+                        help="Coarsen soft-item meshes by their projected on-screen size")
+    parser.add_argument("--polygon-budget", type=int, default=0,
+                        help="Coarsen meshes and floor patterns until the scene fits N polygons")
+    parser.add_argument("--overlaps", action="store_true",
+                        help="Print furniture pieces whose bounding boxes interpenetrate before rendering")
+    parser.add_argument("--stats", type=Path, default=None,
+                        help="Write polygon counts and per-room timings as JSON and print a summary table")
+    parser.add_argument("--cache-dir", type=Path, default=None,
+                        help="Reuse per-room geometry from .npz files here; only changed rooms are rebuilt")
+    parser.add_argument("--tiled", action="store_true",
+                        help="Write a PNG band by band with the raster backend (poster-size --dpi in bounded memory)")
+    parser.add_argument("--band-rows", type=int, default=TILE_ROWS, help="Image rows per band for --tiled")
+    parser.add_argument("--vector", action="store_true",
+                        help="Write a compact SVG from projected polygons (--output .svg); merges coplanar faces")
+    parser.add_argument("--views", type=int, default=0,
+                        help="Render a turntable of N views around the layout camera (output_viewNN.png)")
+    parser.add_argument("--workers", type=int, default=1, help="Processes for --views and --walkthrough rendering")
+    parser.add_argument("--walkthrough", action="store_true",
+                        help="Animate render.walkthrough keyframes; --output .gif, .mp4 or .png (frame sequence)")
+    parser.add_argument("--fps", type=float, default=None, help="Override render.walkthrough.fps")
+    parser.add_argument("--serve", default=None,
+                        help="Worker mode: render jobs from a directory of *.json files or '-' for stdin JSONL")
+    parser.add_argument("--poll", type=float, default=1.0, help="Directory polling interval for --serve, seconds")
+    parser.add_argument("--once", action="store_true", help="With --serve DIR: drain the queue and exit")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if args.serve:
+        cache = RoomCache(args.cache_dir) if args.cache_dir else None
+        if args.serve == "-":
+            jobs = iter_stdin_jobs(sys.stdin, Path.cwd())
+        else:
+            jobs = iter_directory_jobs(Path(args.serve), args.poll, args.once)
+        try:
+            count = serve(jobs, cache=cache)
+        except KeyboardInterrupt:
+            return
+        print(f"Served {count} renders")
+        return
+    layout = load_layout(args.layout)
+    apartments: Optional[List[Apartment]] = None
+    try:
+        if "apartments" in layout:
+            layout, apartments = load_building(layout, args.layout.parent)
+        else:
+            rooms = compile_layout(layout)
+    except (OSError, ValueError) as exc:
+        sys.exit(f"{args.layout}: {exc}")
+    if args.overlaps:
+        groups = [("", rooms)] if apartments is None else [(f"{apt.name}: ", apt.rooms) for apt in apartments]
+        for prefix, group in groups:
+            for line in overlap_report(group):
+                print(f"overlap: {prefix}{line}")
+    render_cfg = layout.get("render", {})
+    background = render_cfg.get("background", "#fef8ef")
+    ctx = context_from_render(render_cfg)
+    dpi = args.dpi or render_cfg.get("dpi", 260)
+
+    camera = Camera.from_render(render_cfg)
+    width, height = (int(side * dpi) for side in FIGURE_SIZE)
+    if args.lod and apartments is None:
+        bounds = compute_bounds(layout.get("rooms", []))
+        # Only a single backend frame may drop furniture the camera cannot see.
+        single_frame = not (args.walkthrough or args.views > 0 or args.vector or args.tiled)
+        ctx = replace(ctx, lod=LodPolicy.for_camera(camera, bounds, width, height, cull=single_frame))
+    stats = RenderStats() if args.stats else None
+    stage = stats.stage if stats else lambda name: nullcontext()
+    cache = RoomCache(args.cache_dir) if args.cache_dir else None
+    with stage("build"):
+        if apartments is not None:
+            budget = args.polygon_budget or int(render_cfg.get("polygon_budget", 0))
+            scene = build_building_scene(apartments, layout, ctx, camera, width, height, budget, stats, cache)
+        else:
+            budget = args.polygon_budget
+            scene = build_scene_within_budget(rooms, ctx, budget, stats, cache)
+    if 0 < budget < scene.polygon_count:
+        print(f"Polygon budget {budget} exceeded: {scene.polygon_count} polygons at the coarsest level of detail", file=sys.stderr)
+    if cache is not None:
+        print(f"Room cache: {cache.hits} reused, {cache.misses} rebuilt")
+    # Instrumentation stays in this process; workers get a plain scene.
+    scene.stats = None
+    if args.walkthrough:
+        with stage("walkthrough"):
+            try:
+                frames = render_walkthrough(scene, layout, args.output, dpi, args.backend, args.workers, args.fps)
+            except ValueError as exc:
+                sys.exit(f"{args.layout}: {exc}")
+        print(f"Saved {frames}-frame walkthrough to {args.output}")
+    elif args.views > 0:
+        outputs = view_output_paths(args.output, args.views)
+        with stage("views"):
+            render_views_parallel(scene, layout, turntable(camera, args.views), outputs, dpi, args.backend, args.workers)
+        print(f"Saved {len(outputs)} views to {outputs[0].parent}")
+    elif args.vector:
+        with stage("vector"):
+            try:
+                counts = export_svg(scene, layout, camera, dpi, args.output)
+            except ValueError as exc:
+                sys.exit(str(exc))
+        print(f"Saved {counts['elements']} paths for {counts['faces']} faces ({counts['dropped']} sub-pixel) to {args.output}")
+    elif args.tiled:
+        with stage("tiled"):
+            width, height = export_tiled(scene, layout, camera, dpi, args.output, max(1, args.band_rows))
+        print(f"Saved {width}x{height} render to {args.output}")
+    else:
+        with stage(args.backend):
+            fig = BACKENDS[args.backend](scene, layout, camera, dpi)
+        with stage("savefig"):
+            save_figure(fig, args.output, dpi, background)
+        print(f"Saved render to {args.output}")
+    if stats is not None:
+        write_stats(stats, args.stats)
+        print(stats.table())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,65 @@
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "render"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import convert_plan_7_1  # noqa: E402
+import synthetic_plans  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def synthetic_dir(tmp_path_factory):
+    return tmp_path_factory.mktemp("synthetic_plans")
+
+
+@pytest.fixture(scope="session", params=sorted(synthetic_plans.PLAN_SIZES))
+def synthetic(request, synthetic_dir):
+    """A synthetic plan (ground truth) together with its prepared artifacts."""
+    plan = synthetic_plans.make_plan(request.param, *synthetic_plans.PLAN_SIZES[request.param])
+    path = plan.save(synthetic_dir / f"{plan.name}.png")
+    return plan, convert_plan_7_1.prepare_plan(path)
+
+
+try:
+    import pytest_benchmark  # noqa: F401
+except ImportError:  # pragma: no cover - depends on the environment
+
+    class _Stats:
+        def __init__(self, timings):
+            self.min = min(timings)
+            self.mean = statistics.fmean(timings)
+            self.rounds = len(timings)
+
+    class _FallbackBenchmark:
+        """Minimal stand-in for the pytest-benchmark fixture: best-of-N timing."""
+
+        def __init__(self, name: str, max_time: float = 0.5, max_rounds: int = 20) -> None:
+            self.name = name
+            self.max_time = max_time
+            self.max_rounds = max_rounds
+            self.stats = None
+
+        def __call__(self, func, *args, **kwargs):
+            timings = []
+            started = time.perf_counter()
+            while len(timings) < self.max_rounds and (not timings or time.perf_counter() - started < self.max_time):
+                t0 = time.perf_counter()
+                result = func(*args, **kwargs)
+                timings.append(time.perf_counter() - t0)
+            self.stats = _Stats(timings)
+            return result
+
+    @pytest.fixture
+    def benchmark(request):
+        bench = _FallbackBenchmark(request.node.name)
+        yield bench
+        if bench.stats is not None:
+            stats = bench.stats
+            print(f"\n{bench.name}: min {stats.min * 1e3:.2f} ms, mean {stats.mean * 1e3:.2f} ms over {stats.rounds} rounds")
@@ -0,0 +1,89 @@
+"""Synthetic apartment layouts for benchmarking generate_3d_layout.
+
+Rooms of 4 x 4 m sit on a grid and cycle through every floor pattern. Each room
+holds ``furniture`` boxes in rows, each carrying ``soft_items`` cushions and
+throws, plus a rug, a throw anchored to the first piece and a ceiling light.
+Colours come from a fixed palette, so equal arguments give equal layouts.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, List, Tuple
+
+FLOOR_PATTERNS = (None, "broad_planks", "checker", "plush", "bubble")
+COLORS = ("#ffa87a", "#b5e2fa", "#ffe1a8", "#c8b6ff", "#9ad1b3", "#f7a1c4", "#e8d7c3")
+SOFT_KINDS = ("pillow", "throw", "bolster", "seat_cushion", "basket")
+ROOM_SIZE = 4.0
+ROOMS_PER_ROW = 4
+
+# name -> (rooms, furniture per room, soft items per furniture piece)
+LAYOUT_SIZES: Dict[str, Tuple[int, int, int]] = {
+    "small": (2, 3, 2),
+    "medium": (5, 6, 3),
+    "large": (10, 8, 4),
+}
+
+
+def _color(idx: int) -> str:
+    return COLORS[idx % len(COLORS)]
+
+
+def _furniture(room_idx: int, count: int, soft_items: int) -> List[dict]:
+    columns = max(1, int(count**0.5 + 0.999))
+    pitch = (ROOM_SIZE - 0.6) / columns
+    pieces = []
+    for idx in range(count):
+        row, col = divmod(idx, columns)
+        soft = [
+            {
+                "kind": SOFT_KINDS[(idx + k) % len(SOFT_KINDS)],
+                "offset": [0.15 * (k - soft_items / 2), 0.0, 0.3],
+                "color": _color(room_idx + idx + k),
+            }
+            for k in range(soft_items)
+        ]
+        pieces.append({
+            "label": f"piece {idx}",
+            "position": [0.6 + pitch * (col + 0.5), 0.6 + pitch * (row + 0.5)],
+            "size": [pitch * 0.7, pitch * 0.5, 0.6],
+            "rotation": 15.0 * (idx % 3),
+            "color": _color(idx),
+            "soft_items": soft,
+        })
+    return pieces
+
+
+def make_layout(rooms: int, furniture: int, soft_items: int, dpi: int = 40) -> dict:
+    room_list = []
+    for idx in range(rooms):
+        row, col = divmod(idx, ROOMS_PER_ROW)
+        pattern = FLOOR_PATTERNS[idx % len(FLOOR_PATTERNS)]
+        floor = {"color": _color(idx + 3)}
+        if pattern is not None:
+            floor["pattern"] = pattern
+        origin = [col * ROOM_SIZE, row * ROOM_SIZE]
+        decor = [{"kind": "rug", "position": [ROOM_SIZE / 2, ROOM_SIZE / 2], "size": [1.6, 1.2, 0.04], "color": _color(idx + 1)}]
+        if furniture:
+            decor.append({"kind": "throw", "anchor": "piece 0", "offset": [0.0, 0.0, 0.35], "color": _color(idx + 2)})
+        room_list.append({
+            "name": f"room {idx}",
+            "mood": pattern or "plain",
+            "origin": origin,
+            "size": [ROOM_SIZE, ROOM_SIZE],
+            "height": 2.8,
+            "floor": floor,
+            "wall_color": "#f2f4f8",
+            "baseboard_color": "#ebe0d5",
+            "furniture": _furniture(idx, furniture, soft_items),
+            "soft_decor": decor,
+            "lighting": [{"position": [origin[0] + ROOM_SIZE / 2, origin[1] + ROOM_SIZE / 2, 2.4], "radius": 0.2}],
+        })
+    return {
+        "meta": {"title": f"Synthetic {rooms}x{furniture}x{soft_items}", "concept": "benchmark"},
+        "render": {"dpi": dpi, "camera": {"elev": 35, "azim": -55}},
+        "rooms": room_list,
+    }
+
+
+def catalog() -> Dict[str, dict]:
+    return {name: make_layout(*spec) for name, spec in LAYOUT_SIZES.items()}
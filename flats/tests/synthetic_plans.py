@@ -0,0 +1,170 @@
+"""Synthetic floor plans with known geometry for the convert_plan_7_1 detectors.
+
+The drawings mimic the conventions of the source catalog: white paper, a light
+apartment fill, black wall strokes, the balcony filled with the catalog's
+lilac colour, window bars sitting in gaps of the bottom (and right) wall and a
+door frame in the gap between the apartment and the balcony.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+from PIL import Image
+
+WHITE = (255, 255, 255)
+WALL = (20, 20, 20)
+FLOOR = (226, 222, 234)
+BALCONY = (193, 176, 213)
+
+# Thick enough that wall pieces between window gaps stay above the window area limit.
+WALL_THICKNESS = 8
+BOTTOM_MARGIN = 20
+TOP_MARGIN = 20
+SIDE_MARGIN = 30
+BALCONY_SIZE = (110, 50)  # inner fill, px: 5500 px² fits the balcony area window
+WINDOW_THICKNESS = 4
+GAP_CLEARANCE = 3
+# About 950 mm at the catalog scale: a doorway, narrower than the zone door width.
+DOORWAY_WIDTH = 37
+
+# (main width, main height, bottom window lengths, right window lengths) in pixels,
+# from a studio to a large flat.
+PLAN_SIZES = {
+    "small": (260, 320, (40,), ()),
+    "medium": (480, 560, (48, 80), (64,)),
+    "large": (800, 900, (56, 72, 96), (48, 64)),
+}
+
+Box = Tuple[int, int, int, int]  # x0, y0, x1, y1 inclusive
+
+
+@dataclass
+class SyntheticPlan:
+    name: str
+    image: np.ndarray
+    main: Box
+    balcony: Box
+    partition_y: int
+    windows: List[Box] = field(default_factory=list)
+    door: Box = (0, 0, 0, 0)
+
+    @property
+    def height(self) -> int:
+        return int(self.image.shape[0])
+
+    @property
+    def window_lengths_px(self) -> List[int]:
+        return sorted(max(x1 - x0, y1 - y0) + 1 for x0, y0, x1, y1 in self.windows)
+
+    @property
+    def door_width_px(self) -> int:
+        return self.door[2] - self.door[0] + 1
+
+    @property
+    def balcony_area_px(self) -> int:
+        x0, y0, x1, y1 = self.balcony
+        return (x1 - x0 + 1) * (y1 - y0 + 1)
+
+    @property
+    def outline_area_px(self) -> float:
+        t = WALL_THICKNESS
+        mx0, my0, mx1, my1 = self.main
+        bx0, by0, bx1, by1 = self.balcony
+        main = (mx1 - mx0 + 1 + 2 * t) * (my1 - my0 + 1 + 2 * t)
+        balcony = (bx1 - bx0 + 1 + 2 * t) * (my0 - t - (by0 - t))
+        return float(main + balcony)
+
+    def save(self, path: Path) -> Path:
+        Image.fromarray(self.image).save(path)
+        return path
+
+
+def _fill(image: np.ndarray, box: Box, color: Tuple[int, int, int]) -> None:
+    x0, y0, x1, y1 = box
+    image[y0 : y1 + 1, x0 : x1 + 1] = color
+
+
+def _frame(image: np.ndarray, box: Box, thickness: int, color: Tuple[int, int, int]) -> None:
+    x0, y0, x1, y1 = box
+    _fill(image, (x0 - thickness, y0 - thickness, x1 + thickness, y0 - 1), color)
+    _fill(image, (x0 - thickness, y1 + 1, x1 + thickness, y1 + thickness), color)
+    _fill(image, (x0 - thickness, y0, x0 - 1, y1), color)
+    _fill(image, (x1 + 1, y0, x1 + thickness, y1), color)
+
+
+def make_plan(
+    name: str,
+    main_width: int,
+    main_height: int,
+    window_lengths: Tuple[int, ...],
+    side_window_lengths: Tuple[int, ...] = (),
+) -> SyntheticPlan:
+    t = WALL_THICKNESS
+    bw, bh = BALCONY_SIZE
+    width = main_width + 2 * (SIDE_MARGIN + t)
+    height = TOP_MARGIN + bh + main_height + 3 * t + BOTTOM_MARGIN
+    image = np.full((height, width, 3), WHITE, dtype=np.uint8)
+
+    balcony = (SIDE_MARGIN + t + 10, TOP_MARGIN + t, SIDE_MARGIN + t + 10 + bw - 1, TOP_MARGIN + t + bh - 1)
+    main_y0 = balcony[3] + t + 1
+    main = (SIDE_MARGIN + t, main_y0, SIDE_MARGIN + t + main_width - 1, main_y0 + main_height - 1)
+
+    _fill(image, balcony, BALCONY)
+    _frame(image, balcony, t, WALL)
+    _fill(image, main, FLOOR)
+    _frame(image, main, t, WALL)
+
+    # Interior partition with a doorway splits the flat into two rooms.
+    partition_y = main[1] + main_height // 2
+    _fill(image, (main[0], partition_y, main[2], partition_y + t - 1), WALL)
+    doorway = main[0] + main_width // 3
+    _fill(image, (doorway, partition_y, doorway + DOORWAY_WIDTH - 1, partition_y + t - 1), FLOOR)
+
+    # Balcony door: a frame standing in a gap of the shared wall.
+    door_width = min(bw - 2 * GAP_CLEARANCE - 20, 80)
+    gap = (balcony[0] + 10, balcony[3] + 1, balcony[0] + 10 + door_width + 2 * GAP_CLEARANCE - 1, main[1] - 1)
+    _fill(image, gap, FLOOR)
+    door = (gap[0] + GAP_CLEARANCE, gap[1], gap[2] - GAP_CLEARANCE, gap[3] + 20)
+    _frame(image, (door[0] + 2, door[1] + 2, door[2] - 2, door[3] - 2), 2, WALL)
+
+    # Window bars in gaps of the bottom wall, evenly spread.
+    windows: List[Box] = []
+    wall_y0 = main[3] + 1
+    slots = len(window_lengths) + 1
+    for idx, length in enumerate(window_lengths, start=1):
+        cx = main[0] + main_width * idx // slots
+        gap_box = (cx - length // 2 - GAP_CLEARANCE, wall_y0, cx + length // 2 + GAP_CLEARANCE, wall_y0 + t - 1)
+        _fill(image, gap_box, FLOOR)
+        bar = (cx - length // 2, wall_y0, cx - length // 2 + length - 1, wall_y0 + WINDOW_THICKNESS - 1)
+        _fill(image, bar, WALL)
+        windows.append(bar)
+
+    # Vertical window bars in the right wall of the lower room.
+    wall_x0 = main[2] + 1
+    slots = len(side_window_lengths) + 1
+    room_height = main[3] - partition_y - t
+    for idx, length in enumerate(side_window_lengths, start=1):
+        cy = partition_y + t + room_height * idx // slots
+        gap_box = (wall_x0, cy - length // 2 - GAP_CLEARANCE, wall_x0 + t - 1, cy + length // 2 + GAP_CLEARANCE)
+        _fill(image, gap_box, FLOOR)
+        bar = (wall_x0, cy - length // 2, wall_x0 + WINDOW_THICKNESS - 1, cy - length // 2 + length - 1)
+        _fill(image, bar, WALL)
+        windows.append(bar)
+
+    return SyntheticPlan(
+        name=name,
+        image=image,
+        main=main,
+        balcony=balcony,
+        partition_y=partition_y,
+        windows=windows,
+        door=door,
+    )
+
+
+def catalog() -> List[SyntheticPlan]:
+    return [make_plan(name, *spec) for name, spec in PLAN_SIZES.items()]
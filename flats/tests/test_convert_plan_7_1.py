@@ -0,0 +1,192 @@
+import json
+
+import numpy as np
+import pytest
+
+import convert_plan_7_1 as converter
+import synthetic_plans
+
+
+def widths_px(entries, scale):
+    return sorted(entry["width"] / scale for entry in entries)
+
+
+def test_outline_matches_drawn_shell(synthetic):
+    plan, artifacts = synthetic
+    assert artifacts.outline_px.area == pytest.approx(plan.outline_area_px, rel=0.01)
+
+
+def test_detect_windows_finds_every_bar_with_its_width(synthetic):
+    plan, artifacts = synthetic
+    windows = converter.detect_windows(artifacts)
+    assert [w["id"] for w in windows] == [f"window_{idx}" for idx in range(1, len(plan.windows) + 1)]
+    assert widths_px(windows, artifacts.scale) == pytest.approx(plan.window_lengths_px, abs=0.5)
+    offsets = [w["centerOffset"] for w in windows]
+    assert offsets == sorted(offsets)
+
+
+def test_detect_windows_on_vertical_walls(synthetic):
+    plan, artifacts = synthetic
+    candidates = converter.window_candidates(artifacts.walls, artifacts.openings)
+    sides = sorted(converter.WALL_SIDES[side] for side in artifacts.openings.side[candidates])
+    vertical = sum(1 for x0, y0, x1, y1 in plan.windows if y1 - y0 > x1 - x0)
+    assert sides.count("right") == vertical
+    assert sides.count("bottom") == len(plan.windows) - vertical
+
+
+def test_opening_measurement_is_rotation_aware(tmp_path):
+    image = np.full((120, 120, 3), 255, dtype=np.uint8)
+    rows, cols = np.indices(image.shape[:2])
+    # A 1.5 px wide stroke at 30 degrees, 70 px long.
+    angle = np.radians(30.0)
+    along = (cols - 60) * np.cos(angle) + (rows - 60) * np.sin(angle)
+    across = -(cols - 60) * np.sin(angle) + (rows - 60) * np.cos(angle)
+    image[(np.abs(along) <= 35) & (np.abs(across) <= 0.75)] = 0
+    walls = converter.build_component_table(image[..., 0] < converter.WALL_GRAY_THRESHOLD)
+    outline = converter.Polygon([(0, 0), (120, 0), (120, 120), (0, 120)])
+    measured = converter.measure_openings(walls, outline, 120)
+    assert measured.length[0] == pytest.approx(70.0, rel=0.03)
+    assert measured.skew[0] == pytest.approx(30.0, abs=1.0)
+    assert measured.horizontal[0]
+
+
+def test_opening_measurement_uses_recessed_walls():
+    # L-shaped outline (y-up): the top-right corner is cut back to y = 60 and x = 80.
+    outline = converter.Polygon([(10, 10), (110, 10), (110, 60), (80, 60), (80, 110), (10, 110)])
+    image = np.full((120, 120), False)
+    image[59:61, 88:103] = True  # along the recessed top wall, row 60 is y = 60
+    image[20:36, 79:81] = True  # along the recessed right wall
+    walls = converter.build_component_table(image)
+    measured = converter.measure_openings(walls, outline, 120)
+    assert sorted(converter.WALL_SIDES[side] for side in measured.side) == ["right", "top"]
+    assert measured.wall_distance == pytest.approx([0.5, 0.5], abs=0.6)
+
+
+def test_detect_balcony_door_width(synthetic):
+    plan, artifacts = synthetic
+    door = converter.detect_balcony_door(artifacts)
+    assert door["width"] / artifacts.scale == pytest.approx(plan.door_width_px, abs=0.5)
+    assert door["to"] == "balcony_1"
+
+
+def test_detect_balcony_area(synthetic):
+    plan, artifacts = synthetic
+    _, polygon = converter.detect_balcony(artifacts)
+    assert polygon.area / artifacts.scale**2 == pytest.approx(plan.balcony_area_px, rel=0.03)
+
+
+def test_segment_zones_splits_rooms_at_the_partition(synthetic):
+    plan, artifacts = synthetic
+    _, balcony = converter.detect_balcony(artifacts)
+    zones = converter.segment_zones(artifacts, exclude=[balcony])
+    x0, y0, x1, y1 = plan.main
+    half_m2 = (x1 - x0 + 1) * (y1 - y0 + 1) / 2 * artifacts.scale**2 / 1e6
+    assert zones[0]["id"] == converter.MAIN_ZONE_ID
+    assert [zone["area"] for zone in zones[:2]] == pytest.approx([half_m2, half_m2], rel=0.1)
+
+
+def assert_balcony_door_leads_to_a_room(plan_json):
+    door = next(d for d in plan_json["openings"]["doors"] if d["to"] == "balcony_1")
+    zone = next(z for z in plan_json["zones"] if z["id"] == door["from"])
+    balcony = converter.Polygon(next(b for b in plan_json["balconies"] if b["id"] == "balcony_1")["polygon"])
+    assert zone["area"] >= 1.0
+    assert converter.Polygon(zone["polygon"]).distance(balcony) > 0
+
+
+def test_convert_plan_is_valid_apartment(synthetic):
+    _, artifacts = synthetic
+    plan_json = converter.convert_plan(artifacts)
+    assert converter.validate_apartment(plan_json) == []
+    zone_ids = {zone["id"] for zone in plan_json["zones"]}
+    assert plan_json["openings"]["doors"][0]["from"] in zone_ids
+    assert_balcony_door_leads_to_a_room(plan_json)
+
+
+def test_too_strict_thresholds_raise(synthetic):
+    _, artifacts = synthetic
+    strict = converter.DetectorThresholds(door_area_min=10_000, door_area_max=10_001)
+    with pytest.raises(converter.PlanExtractionError):
+        converter.detect_balcony_door(artifacts, strict)
+
+
+def test_plan_without_balcony_raises_extraction_error(tmp_path):
+    plan = synthetic_plans.make_plan("small", *synthetic_plans.PLAN_SIZES["small"])
+    plan.image[(plan.image == synthetic_plans.BALCONY).all(axis=2)] = synthetic_plans.FLOOR
+    artifacts = converter.prepare_plan(plan.save(tmp_path / "no_balcony.png"))
+    assert len(artifacts.balcony_fill) == 0
+    with pytest.raises(converter.PlanExtractionError):
+        converter.detect_balcony(artifacts)
+    assert not converter.sweep_plan(artifacts, {})[0]["valid"]
+
+
+def test_sweep_marks_default_thresholds_valid(synthetic):
+    plan, artifacts = synthetic
+    grid = {"window_area_min": [30, 1000], "balcony_area_max": [7000]}
+    results = converter.sweep_plan(artifacts, grid)
+    assert len(results) == 2
+    by_min = {row["thresholds"]["window_area_min"]: row for row in results}
+    assert by_min[30]["valid"] and by_min[30]["windows"] == len(plan.windows)
+    assert not by_min[1000]["valid"] and by_min[1000]["windows"] == 0
+
+
+def test_jsonl_stream_round_trip(tmp_path, synthetic):
+    plan, artifacts = synthetic
+    plan_json = converter.convert_plan(artifacts)
+    stream = tmp_path / "plans.jsonl"
+    with converter.JsonlPlanWriter(stream, shard_size=1) as writer:
+        writer.write("first", {"version": "apartment.v1"})
+        entry = writer.write(plan.name, plan_json)
+    assert entry["file"] == "plans-00001.jsonl"
+    assert converter.read_jsonl_record(stream, plan.name) == {"id": plan.name, **plan_json}
+
+
+def test_jsonl_writer_appends_to_an_existing_stream(tmp_path):
+    stream = tmp_path / "plans.jsonl"
+    with converter.JsonlPlanWriter(stream, shard_size=2) as writer:
+        for idx in range(3):
+            writer.write(f"plan{idx}", {"version": "apartment.v1", "n": idx})
+    with converter.JsonlPlanWriter(stream, shard_size=2) as writer:
+        entry = writer.write("plan1", {"version": "apartment.v1", "n": 10})
+        assert (writer.written, writer.count) == (1, 4)
+    assert entry["file"] == "plans-00001.jsonl"
+    assert converter.read_jsonl_record(stream, "plan1")["n"] == 10
+    assert converter.read_jsonl_record(stream, "plan2")["n"] == 2
+    with pytest.raises(KeyError):
+        converter.read_jsonl_record(stream, "missing")
+
+
+def test_jsonl_cli_counts_only_this_run(tmp_path, capsys, synthetic):
+    plan, artifacts = synthetic
+    stream = tmp_path / "plans.jsonl"
+    with converter.JsonlPlanWriter(stream) as writer:
+        writer.write("earlier", {"version": "apartment.v1"})
+    converter.main([str(artifacts.image_path), "--jsonl", str(stream)])
+    assert "Saved 1 record(s), 2 in stream" in capsys.readouterr().out
+    assert converter.read_jsonl_record(stream, artifacts.image_path.stem)["version"] == "apartment.v1"
+
+
+def test_reference_plan_regression():
+    """The bundled catalog image still converts to the committed testFlat4 output."""
+    expected = json.loads(converter.OUTPUT_PATH.read_text(encoding="utf-8"))
+    actual = converter.convert_plan(converter.prepare_plan(converter.IMAGE_PATH))
+    assert json.loads(json.dumps(actual, ensure_ascii=False)) == expected
+    assert_balcony_door_leads_to_a_room(expected)
+
+
+def test_reference_plan_zones_match_the_labelled_rooms():
+    """Rooms of testFlat4 against the areas printed on the catalog plan (m²)."""
+    plan_json = converter.convert_plan(converter.prepare_plan(converter.IMAGE_PATH))
+    zones = {zone["id"]: zone["area"] for zone in plan_json["zones"]}
+    assert list(zones) == [converter.MAIN_ZONE_ID, "z_2", "z_3"]
+    # The kitchen, living room and dining area are open plan; the WC has no drawn walls.
+    assert zones["z_main"] == pytest.approx(6.45 + 14.40 + 22.58 + 1.88, rel=0.05)
+    # The hallway is open to the room above it.
+    assert zones["z_2"] == pytest.approx(14.12 + 3.16, rel=0.06)
+    # The bath keeps its floor; the tub rim is drawn as dark as the walls.
+    assert 2.0 < zones["z_3"] < 3.69
+    assert plan_json["entrance"]["to"] == converter.MAIN_ZONE_ID
+    assert plan_json["openings"]["doors"][0]["from"] == "z_2"
+
+
+def test_catalog_covers_every_size():
+    assert [plan.name for plan in synthetic_plans.catalog()] == list(synthetic_plans.PLAN_SIZES)
@@ -0,0 +1,86 @@
+"""Timing and memory budgets for the convert_plan_7_1 stages.
+
+Budgets apply to the largest synthetic plan. Time budgets are best-of-N wall
+time with several times the headroom a developer machine needs, so a default
+run fails when a stage gets markedly slower; relax them on slow machines with
+``PLAN_BENCH_BUDGET_SCALE``.
+"""
+
+import os
+import time
+import tracemalloc
+
+import pytest
+
+import convert_plan_7_1 as converter
+import synthetic_plans
+
+BUDGET_SCALE = float(os.environ.get("PLAN_BENCH_BUDGET_SCALE", "1.0"))
+
+# stage -> (seconds, peak traced MiB)
+BUDGETS = {
+    "prepare_plan": (2.0, 200.0),
+    "detect_windows": (0.01, 2.0),
+    "detect_balcony": (0.1, 40.0),
+    "detect_balcony_door": (0.01, 2.0),
+    "segment_zones": (0.5, 40.0),
+}
+
+
+@pytest.fixture(scope="module")
+def large_plan(tmp_path_factory):
+    plan = synthetic_plans.make_plan("large", *synthetic_plans.PLAN_SIZES["large"])
+    path = plan.save(tmp_path_factory.mktemp("bench") / "large.png")
+    artifacts = converter.prepare_plan(path)
+    _, balcony = converter.detect_balcony(artifacts)
+    return path, artifacts, balcony
+
+
+def stage(name, large_plan):
+    path, artifacts, balcony = large_plan
+    calls = {
+        "prepare_plan": lambda: converter.prepare_plan(path),
+        "detect_windows": lambda: converter.detect_windows(artifacts),
+        "detect_balcony": lambda: converter.detect_balcony(artifacts),
+        "detect_balcony_door": lambda: converter.detect_balcony_door(artifacts),
+        "segment_zones": lambda: converter.segment_zones(artifacts, exclude=[balcony]),
+    }
+    return calls[name]
+
+
+def best_time(func, rounds=5):
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def peak_mib(func):
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 2**20
+
+
+@pytest.mark.parametrize("name", sorted(BUDGETS))
+def test_stage_benchmark(benchmark, large_plan, name):
+    benchmark(stage(name, large_plan))
+
+
+@pytest.mark.parametrize("name", sorted(BUDGETS))
+def test_stage_wall_time_budget(large_plan, name):
+    budget = BUDGETS[name][0] * BUDGET_SCALE
+    elapsed = best_time(stage(name, large_plan))
+    assert elapsed <= budget, f"{name} took {elapsed * 1e3:.1f} ms, budget {budget * 1e3:.1f} ms"
+
+
+@pytest.mark.parametrize("name", sorted(BUDGETS))
+def test_stage_memory_budget(large_plan, name):
+    budget = BUDGETS[name][1]
+    peak = peak_mib(stage(name, large_plan))
+    assert peak <= budget, f"{name} peaked at {peak:.1f} MiB, budget {budget:.1f} MiB"
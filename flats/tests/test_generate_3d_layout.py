@@ -0,0 +1,587 @@
+import json
+from pathlib import Path
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt  # noqa: E402
+import numpy as np  # noqa: E402
+import pytest  # noqa: E402
+from mpl_toolkits.mplot3d.art3d import Poly3DCollection  # noqa: E402
+
+import generate_3d_layout as render  # noqa: E402
+
+LAYOUT_PATH = Path(render.__file__).with_name("apartment_layout.json")
+
+
+@pytest.fixture(scope="module")
+def layout():
+    return json.loads(LAYOUT_PATH.read_text(encoding="utf-8"))
+
+
+@pytest.fixture
+def ctx():
+    return render.RenderContext(light_direction=render.normalize(np.array([0.4, 0.5, 0.8])))
+
+
+def build_scene(layout, ctx):
+    scene = render.Scene()
+    for room in render.compile_layout(layout):
+        render.draw_room(scene, room, ctx)
+    return scene
+
+
+def test_scene_flushes_into_a_single_polygon_collection(layout, ctx):
+    scene = build_scene(layout, ctx)
+    fig = plt.figure()
+    ax = fig.add_subplot(111, projection="3d")
+    scene.flush(ax)
+    fig.canvas.draw()
+    collections = [c for c in ax.collections if isinstance(c, Poly3DCollection)]
+    assert len(collections) == 1
+    assert len(collections[0].get_paths()) == scene.polygon_count
+    plt.close(fig)
+
+
+def test_surface_grid_becomes_quads(ctx):
+    scene = render.Scene()
+    render.draw_ellipsoid(scene, np.zeros(3), [1.0, 1.0, 1.0], 0.0, "#ff0000", "#000000", ctx)
+    assert scene.polygon_count == 27 * 17
+    assert scene.polys[0].verts.shape == (27 * 17, 4, 3)
+    assert np.all(scene.polys[0].linewidths == 0.0)
+
+
+def scalar_toon_shade(base_color, normal, ctx):
+    """The per-face shading formula the batch version replaced, quantised like the baseline throws."""
+    dot = abs(float(np.dot(render.normalize(normal), ctx.light_direction)))
+    dot = max(0.0, min(1.0, dot))
+    dot = round(dot * (ctx.toon_levels - 1)) / max(1, ctx.toon_levels - 1)
+    intensity = ctx.min_intensity + (ctx.max_intensity - ctx.min_intensity) * dot
+    return np.clip(np.array(base_color) * intensity, 0.0, 1.0)
+
+
+def test_toon_shade_batch_matches_single_face_shading(ctx):
+    rng = np.random.default_rng(3)
+    normals = rng.normal(size=(50, 3))
+    colors = rng.uniform(size=(50, 3))
+    batch = render.toon_shade_batch(colors, normals, ctx)
+    single = [scalar_toon_shade(c, n, ctx) for c, n in zip(colors, normals)]
+    assert batch == pytest.approx(np.array(single))
+    # A downward face: |cos| = 0.78 snaps to level 2 of 4, intensity 0.35 + 0.7 * 2 / 3.
+    shaded = render.toon_shade((1.0, 0.5, 0.25), np.array([0.0, 0.0, -2.0]), ctx)
+    assert shaded == pytest.approx((0.81667, 0.40833, 0.20417), abs=1e-5)
+    grid = render.toon_shade_batch((1.0, 0.5, 0.25), normals.reshape(5, 10, 3), ctx)
+    assert grid.shape == (5, 10, 3)
+
+
+def test_single_toon_level_is_flat(ctx):
+    flat = render.RenderContext(ctx.light_direction, toon_levels=1)
+    normals = np.random.default_rng(4).normal(size=(20, 3))
+    shaded = render.toon_shade_batch((1.0, 0.5, 0.25), normals, flat)
+    assert shaded == pytest.approx(np.tile(np.array([1.0, 0.5, 0.25]) * flat.min_intensity, (20, 1)))
+
+
+@pytest.mark.parametrize("pattern, count", [("checker", 44 * 33 // 2), ("bubble", 360), ("plush", 6)])
+def test_floor_pattern_is_one_block(ctx, pattern, count):
+    room = {"name": "hall", "origin": [0, 0], "size": [20, 15], "height": 3, "wall_color": "#ffffff",
+            "floor": {"color": "#ddccbb", "pattern": pattern}}
+    scene = render.Scene()
+    render.draw_floor(scene, render.compile_room(room), ctx)
+    base, overlay = scene.polys
+    assert len(base) == 1 and len(overlay) == count
+    assert np.all(overlay.facecolors == overlay.facecolors[0])
+
+
+def test_transform_points_matches_rotate_xy():
+    points = np.random.default_rng(5).normal(size=(4, 7, 3))
+    moved = render.transform_points(points, 35.0, (1.0, 2.0, 3.0))
+    expected_xy = [render.rotate_xy(x, y, 35.0) for x, y in points[..., :2].reshape(-1, 2)]
+    assert moved[..., :2].reshape(-1, 2) == pytest.approx(np.array(expected_xy) + (1.0, 2.0))
+    assert moved[..., 2] == pytest.approx(points[..., 2] + 3.0)
+
+
+def test_unit_meshes_are_cached_and_read_only():
+    assert render.unit_sphere(28, 18) is render.unit_sphere(28, 18)
+    with pytest.raises(ValueError):
+        render.unit_grid(20, 16)[0][0, 0] = 1.0
+
+
+def test_repeated_furniture_reuses_one_template(ctx):
+    chair = {"label": "Chair", "size": [0.5, 0.5, 0.9], "color": "#aa8866", "rotation": 90.0}
+    room = {
+        "name": "Hall",
+        "origin": [0.0, 0.0],
+        "size": [20.0, 20.0],
+        "height": 3.0,
+        "wall_color": "#eeeeee",
+        "floor": {"color": "#dddddd"},
+        "furniture": [dict(chair, position=[i % 20, i // 20]) for i in range(200)],
+    }
+    render.TEMPLATES.clear()
+    scene = render.Scene()
+    render.draw_room(scene, render.compile_room(room), ctx)
+    assert len(render.TEMPLATES) == 1
+    assert render.TEMPLATES.hits == 199
+    assert scene.polygon_count == 1 + 4 + 1 + 200 * 6
+
+
+BOUNDS = (-1.0, 1.0, -1.0, 1.0, 2.0)
+
+
+def quad_at(x, color):
+    """A 1x1 square in the plane x=const facing the camera on the +x axis."""
+    verts = [[(x, -0.5, 0.5), (x, 0.5, 0.5), (x, 0.5, 1.5), (x, -0.5, 1.5)]]
+    return verts, [render.hex_to_rgb(color)]
+
+
+def raster(scene, size=64):
+    view = render.Camera(elev=0.0, azim=0.0).view(BOUNDS)
+    viewport = render.Viewport.fit(view, BOUNDS, size, size)
+    return render.rasterize_scene(scene, view, viewport, "#ffffff", 72)
+
+
+@pytest.mark.parametrize("order", [("#ff0000", "#0000ff"), ("#0000ff", "#ff0000")])
+def test_raster_z_buffer_keeps_nearest_face(order):
+    scene = render.Scene()
+    for color in order:
+        x = 0.5 if color == "#ff0000" else -0.5
+        scene.add_polys(*quad_at(x, color), "#000000", 0.0)
+    image = raster(scene)
+    centre = image[32, 32]
+    assert centre == pytest.approx([1.0, 0.0, 0.0])
+    assert image[0, 0] == pytest.approx([1.0, 1.0, 1.0])
+
+
+def test_raster_blends_translucent_faces_over_opaque():
+    scene = render.Scene()
+    scene.add_polys(*quad_at(-0.5, "#0000ff"), "#000000", 0.0)
+    scene.add_polys(*quad_at(0.5, "#ff0000"), "#000000", 0.0, alpha=0.5)
+    assert raster(scene)[32, 32] == pytest.approx([0.5, 0.0, 0.5])
+
+
+def test_raster_backend_renders_the_layout(layout, ctx, tmp_path):
+    scene = render.build_scene(layout, ctx)
+    fig = render.render_raster(scene, layout, render.Camera.from_render(layout["render"]), 40)
+    output = tmp_path / "raster.png"
+    render.save_figure(fig, output, 40, "#fef8ef")
+    assert output.stat().st_size > 0
+
+
+def test_raster_backend_frames_the_scene_like_matplotlib(layout, ctx):
+    scene = render.build_scene(layout, ctx)
+    camera = render.Camera.from_render(layout["render"])
+    boxes = []
+    for backend in ("matplotlib", "raster"):
+        fig = render.BACKENDS[backend](scene, layout, camera, 40)
+        fig.texts.clear()  # the title
+        fig.canvas.draw()
+        pixels = np.asarray(fig.canvas.buffer_rgba())[..., :3].astype(int)
+        plt.close(fig)
+        rows, cols = np.nonzero(np.abs(pixels - pixels[0, 0]).sum(axis=2) > 30)
+        boxes.append([cols.min(), cols.max(), rows.min(), rows.max()])
+    assert boxes[0] == pytest.approx(boxes[1], abs=2)
+
+
+def test_raster_bands_match_the_full_image(layout, ctx):
+    scene = build_scene(layout, ctx)
+    bounds = render.compute_bounds(layout["rooms"])
+    view = render.Camera.from_render(layout["render"]).view(bounds)
+    viewport = render.Viewport.fit(view, bounds, 160, 100)
+    full = render.rasterize_scene(scene, view, viewport, "#ffffff", 20)
+    bands = [render.rasterize_scene(scene, view, viewport.band(top, min(top + 13, 100)), "#ffffff", 20) for top in range(0, 100, 13)]
+    assert np.array_equal(np.concatenate(bands), full)
+
+
+def test_tiled_export_streams_a_valid_png(layout, ctx, tmp_path):
+    from PIL import Image
+
+    scene = build_scene(layout, ctx)
+    camera = render.Camera.from_render(layout["render"])
+    size = render.export_tiled(scene, layout, camera, 12, tmp_path / "bands.png", band_rows=7)
+    render.export_tiled(scene, layout, camera, 12, tmp_path / "whole.png", band_rows=1000)
+    bands, whole = (np.asarray(Image.open(tmp_path / name)) for name in ("bands.png", "whole.png"))
+    assert bands.shape == (size[1], size[0], 3) == (84, 132, 3)
+    assert np.array_equal(bands, whole)
+    with pytest.raises(ValueError):
+        render.PngWriter(tmp_path / "short.png", 4, 2).close()
+
+
+def content_box(pixels):
+    rows, cols = np.nonzero(np.abs(pixels - pixels[-1, -1]).sum(axis=2) > 30)
+    return [cols.min(), cols.max(), rows.min(), rows.max()]
+
+
+def test_tiled_export_frames_the_scene_like_the_raster_backend(layout, ctx, tmp_path):
+    from PIL import Image
+
+    scene = render.build_scene(layout, ctx)
+    scene.labels.clear()
+    camera = render.Camera.from_render(layout["render"])
+    fig = render.render_raster(scene, layout, camera, 20)
+    fig.texts.clear()  # the title
+    fig.canvas.draw()
+    raster = np.asarray(fig.canvas.buffer_rgba())[..., :3].astype(int)
+    plt.close(fig)
+    render.export_tiled(scene, layout, camera, 20, tmp_path / "poster.png", band_rows=32)
+    tiled = np.asarray(Image.open(tmp_path / "poster.png")).astype(int)
+    assert tiled.shape == raster.shape
+    # Below the title both images hold the same scene pixels.
+    top = content_box(raster)[2]
+    assert content_box(tiled[top:]) == pytest.approx(content_box(raster[top:]), abs=1)
+    assert (np.abs(tiled[top:] - raster[top:]).sum(axis=2) > 30).mean() < 0.02
+
+
+def test_vector_export_merges_coplanar_tiles(tmp_path):
+    from xml.etree import ElementTree
+
+    scene = render.Scene()
+    xs, ys = np.meshgrid(np.arange(8.0), np.arange(6.0))
+    corners = np.array([[0, 0], [1, 0], [1, 1], [0, 1]], dtype=float)
+    tiles = np.concatenate([np.stack([xs, ys], axis=-1).reshape(-1, 1, 2) + corners, np.zeros((48, 4, 1))], axis=2)
+    scene.add_polys(tiles, np.tile([0.8, 0.7, 0.6], (48, 1)), "#000000", 0.0)
+    scene.add_polys(np.array([[[2, 2, 0.5], [2.001, 2, 0.5], [2.001, 2.001, 0.5]]]), [[1.0, 0.0, 0.0]], "#000000", 1.0)
+    layout = {"meta": {"title": "Tiles"}, "rooms": [{"origin": [0, 0], "size": [8, 6], "height": 1.0}]}
+    output = tmp_path / "tiles.svg"
+    counts = render.export_svg(scene, layout, render.Camera(elev=60.0, azim=-60.0), 40, output)
+    assert counts == {"faces": 49, "dropped": 1, "elements": 1}
+    root = ElementTree.parse(output).getroot()
+    paths = root.findall("{http://www.w3.org/2000/svg}path")
+    assert len(paths) == 1 and paths[0].get("d").count("M") == 1
+    with pytest.raises(ValueError):
+        render.export_svg(scene, layout, render.Camera(), 40, tmp_path / "tiles.pdf")
+
+
+def test_vector_export_frames_the_scene_like_the_raster_backend(layout, ctx, tmp_path):
+    import re
+    from xml.etree import ElementTree
+
+    scene = render.build_scene(layout, ctx)
+    scene.labels.clear()
+    camera = render.Camera.from_render(layout["render"])
+    fig = render.render_raster(scene, layout, camera, 20)
+    fig.texts.clear()  # the title
+    fig.canvas.draw()
+    raster = np.asarray(fig.canvas.buffer_rgba())[..., :3].astype(int)
+    plt.close(fig)
+    render.export_svg(scene, layout, camera, 20, tmp_path / "plan.svg")
+    root = ElementTree.parse(tmp_path / "plan.svg").getroot()
+    paths = " ".join(path.get("d") for path in root.iter("{http://www.w3.org/2000/svg}path"))
+    points = np.array([float(v) for v in re.findall(r"-?\d+(?:\.\d+)?", paths)]).reshape(-1, 2)
+    lo, hi = points.min(axis=0), points.max(axis=0)
+    assert [lo[0], hi[0], lo[1], hi[1]] == pytest.approx(content_box(raster), abs=1.5)
+
+
+def test_turntable_spreads_azimuths():
+    cameras = render.turntable(render.Camera(elev=30.0, azim=-60.0, distance=12.0), 4)
+    assert [c.azim for c in cameras] == [-60.0, 30.0, 120.0, 210.0]
+    assert {(c.elev, c.distance) for c in cameras} == {(30.0, 12.0)}
+
+
+@pytest.mark.parametrize("backend, workers", [("matplotlib", 1), ("raster", 2)])
+def test_render_views_writes_one_frame_per_camera(layout, ctx, tmp_path, backend, workers):
+    from PIL import Image
+
+    scene = render.build_scene(layout, ctx)
+    cameras = render.turntable(render.Camera.from_render(layout["render"]), 3)
+    outputs = render.view_output_paths(tmp_path / "turn.png", 3)
+    render.render_views_parallel(scene, layout, cameras, outputs, 30, backend, workers)
+    assert [p.name for p in sorted(tmp_path.iterdir())] == ["turn_view00.png", "turn_view01.png", "turn_view02.png"]
+    for output in outputs:
+        with Image.open(output) as frame:
+            assert frame.size == tuple(30 * side for side in render.FIGURE_SIZE)
+
+
+def test_walkthrough_interpolates_keyframes():
+    render_cfg = {
+        "camera": {"elev": 30, "azim": 0, "distance": 12},
+        "walkthrough": {"fps": 4, "keyframes": [{"time": 0}, {"time": 1, "azim": 40}, {"time": 2, "elev": 10}]},
+    }
+    cameras, fps = render.walkthrough_cameras(render_cfg)
+    assert fps == 4 and len(cameras) == 9
+    assert cameras[2] == render.Camera(30.0, 20.0, 12.0)
+    assert cameras[-1] == render.Camera(10.0, 40.0, 12.0)
+    with pytest.raises(render.LayoutError, match="render.walkthrough.keyframes"):
+        render.walkthrough_cameras({"walkthrough": {"keyframes": [{"time": 0}]}})
+
+
+def test_walkthrough_writes_an_animated_gif(layout, ctx, tmp_path):
+    from PIL import Image
+
+    scene = render.build_scene(layout, ctx)
+    output = tmp_path / "walk.gif"
+    frames = render.render_walkthrough(scene, layout, output, 20, "raster", workers=2, fps=1)
+    assert frames == 7
+    with Image.open(output) as gif:
+        assert gif.n_frames == frames
+        assert gif.size == tuple(20 * side for side in render.FIGURE_SIZE)
+    assert [p.name for p in tmp_path.iterdir()] == ["walk.gif"]
+
+
+def test_lod_coarsens_small_and_distant_meshes():
+    camera = render.Camera(elev=20.0, azim=0.0)
+    lod = render.LodPolicy.for_camera(camera, (-10.0, 10.0, -10.0, 10.0, 3.0), 800, 500)
+    near = lod.mesh_resolution((28, 18), (8.0, 0.0, 1.0), 0.5)
+    far = lod.mesh_resolution((28, 18), (-8.0, 0.0, 1.0), 0.5)
+    tiny = lod.mesh_resolution((28, 18), (-8.0, 0.0, 1.0), 0.02)
+    assert near[0] * near[1] >= far[0] * far[1] >= tiny[0] * tiny[1]
+    assert tiny == render.MIN_MESH_RESOLUTION
+    assert lod.mesh_resolution((28, 18), (8.0, 0.0, 1.0), 50.0) == (28, 18)
+
+
+def test_polygon_budget_caps_the_scene(layout, ctx):
+    full = render.build_scene(layout, ctx).polygon_count
+    budget = full // 3
+    assert render.build_scene_within_budget(layout, ctx, budget).polygon_count <= budget
+    assert render.build_scene_within_budget(layout, ctx, 0).polygon_count == full
+    coarsest = render.build_scene(layout, render.RenderContext(ctx.light_direction, lod=render.LodPolicy(scale=render.LOD_FLOOR_SCALE))).polygon_count
+    assert coarsest < full
+    assert render.build_scene_within_budget(layout, ctx, 1).polygon_count == coarsest
+
+
+def test_stats_attribute_every_polygon_to_a_room_and_kind(layout, ctx):
+    stats = render.RenderStats()
+    scene = render.build_scene(layout, ctx, stats)
+    report = stats.to_dict()
+    assert report["total_polygons"] == scene.polygon_count
+    assert [(room["index"], room["name"]) for room in report["rooms"]] == list(enumerate(room["name"] for room in layout["rooms"]))
+    living = report["rooms"][0]["kinds"]
+    assert living["walls"]["polygons"] == 8 and living["floor"]["calls"] == 1
+    assert "soft:pillow" in living
+    assert stats.table().splitlines()[0].split() == ["room", "kind", "calls", "polygons", "ms"]
+
+
+def test_stats_keep_rooms_with_the_same_name_apart(layout, ctx, tmp_path):
+    twin = dict(layout, rooms=[layout["rooms"][0], dict(layout["rooms"][0], origin=[20.0, 0.0])])
+    stats = render.RenderStats()
+    render.build_scene(twin, ctx, stats)
+    rooms = stats.to_dict()["rooms"]
+    assert [room["index"] for room in rooms] == [0, 1]
+    assert rooms[0]["polygons"] == rooms[1]["polygons"] and rooms[0]["kinds"]["floor"]["calls"] == 1
+    render.write_stats(stats, tmp_path / "stats.json")
+    assert json.loads((tmp_path / "stats.json").read_text(encoding="utf-8"))["rooms"][1]["name"] == rooms[0]["name"]
+
+
+def test_room_cache_rebuilds_only_changed_rooms(layout, ctx, tmp_path):
+    cache = render.RoomCache(tmp_path)
+    first = render.build_scene(layout, ctx, cache=cache)
+    assert (cache.hits, cache.misses) == (0, len(layout["rooms"]))
+
+    edited = json.loads(json.dumps(layout))
+    edited["rooms"][1]["furniture"][0]["color"] = "#123456"
+    cache = render.RoomCache(tmp_path)
+    second = render.build_scene(edited, ctx, cache=cache)
+    assert (cache.hits, cache.misses) == (len(layout["rooms"]) - 1, 1)
+
+    fresh = render.build_scene(edited, ctx).merged_polys()
+    cached = second.merged_polys()
+    assert np.array_equal(cached.verts, fresh.verts)
+    assert np.array_equal(cached.facecolors, fresh.facecolors)
+    assert [label.text for label in second.labels] == [label.text for label in first.labels]
+
+
+def test_room_cache_key_tracks_render_context(layout, ctx, tmp_path):
+    cache = render.RoomCache(tmp_path)
+    room = layout["rooms"][0]
+    assert cache.key(room, ctx) == cache.key(json.loads(json.dumps(room)), ctx)
+    assert cache.key(room, ctx) != cache.key(room, render.RenderContext(ctx.light_direction, toon_levels=3))
+
+
+def test_culling_hides_closed_rooms_and_back_faces(layout, ctx):
+    scene = build_scene(layout, ctx)
+    bounds = render.compute_bounds(layout["rooms"])
+    eye = render.matplotlib_eye(render.Camera.from_render(layout["render"]), bounds)
+    culled = render.cull_scene(scene, eye)
+    assert culled.polygon_count < 0.6 * scene.polygon_count
+    assert not culled.segments and not culled.points
+    assert len(culled.labels) == len(scene.labels)
+
+
+def test_culling_keeps_what_some_eye_can_see(ctx):
+    scene = render.Scene()
+    room = {"name": "r", "origin": [0, 0], "size": [4, 4], "height": 3, "floor": {"color": "#cccccc"},
+            "wall_color": "#eeeeee", "furniture": [{"position": [2, 2], "size": [1, 1, 1], "elevation": 0.5}]}
+    render.draw_room(scene, render.compile_room(room), ctx)
+    render.draw_box(scene, np.array([8.0, 2.0, 0.5]), np.ones(3), 0.0, "#ff0000", "#000000", ctx)
+    outside = np.array([20.0, -20.0, 15.0])
+    seen = render.cull_scene(scene, outside)
+    # Ceiling, two near walls and three faces of the outdoor box.
+    assert seen.polygon_count == 1 + 2 + 3
+    # From below as well: the floor, all walls and the whole box, still no furniture.
+    assert render.cull_scene(scene, [outside, -outside]).polygon_count == 2 + 4 + 6
+    # Inside the room: the whole shell, the top of the furniture, two faces of the outdoor box.
+    assert render.cull_scene(scene, np.array([2.0, 2.0, 2.5])).polygon_count == 6 + 1 + 2
+
+
+@pytest.mark.parametrize("edit, path", [
+    (lambda rooms: rooms[1]["furniture"][0].update(size=[1, "wide", 1]), "rooms[1].furniture[0].size[1]"),
+    (lambda rooms: rooms[0]["soft_decor"][0].update(color="teal"), "rooms[0].soft_decor[0].color"),
+    (lambda rooms: rooms[2].pop("height"), "rooms[2].height"),
+    (lambda rooms: rooms[3].update(furniture={}), "rooms[3].furniture"),
+    (lambda rooms: rooms[0].update(name=7), "rooms[0].name"),
+    (lambda rooms: rooms[0]["soft_decor"][1].update(anchor=["sofa"]), "rooms[0].soft_decor[1].anchor"),
+])
+def test_compile_layout_reports_the_bad_path(layout, edit, path):
+    bad = json.loads(json.dumps(layout))
+    edit(bad["rooms"])
+    with pytest.raises(render.LayoutError) as info:
+        render.compile_layout(bad)
+    assert info.value.path == path
+
+
+def test_room_name_defaults_to_room(layout):
+    bad = json.loads(json.dumps(layout))
+    bad["rooms"][0].pop("name")
+    assert render.compile_layout(bad)[0].name == "room"
+
+
+def test_compiled_rooms_resolve_anchors_and_pickle(layout):
+    import pickle
+
+    rooms = pickle.loads(pickle.dumps(render.compile_layout(layout)))
+    living = rooms[0]
+    sofa = next(item.info for item in living.furniture if item.info.label == "Облако-диван")
+    throw = next(item for item in living.decor if item.kind == "throw")
+    assert throw.shape == "throw" and throw.center[2] > sofa.center[2]
+    assert not hasattr(throw, "__dict__")
+
+
+def test_furniture_index_scopes_anchors_to_rooms():
+    def room(name, x, label):
+        return {
+            "name": name, "origin": [x, 0], "size": [4, 4], "height": 3, "floor": {"color": "#eeeeee"},
+            "wall_color": "#dddddd",
+            "furniture": [{"label": label, "position": [2, 2], "size": [1, 1, 1]}],
+            "soft_decor": [{"kind": "throw", "anchor": "Стол", "offset": [0, 0, 0.5]}],
+        }
+
+    rooms = render.compile_layout({"rooms": [room("A", 0, "Стол"), room("A", 10, "Стол"), room("C", 20, "Шкаф")]})
+    assert [r.decor[0].center[0] if r.decor else None for r in rooms] == [2.0, 12.0, None]
+    index = rooms[0].index
+    assert index is rooms[2].index and len(index) == 3
+    assert index.query((11.8, 1.8, 0.0), (12.2, 2.2, 0.2)) == [1]
+    assert index.near((23.0, 2.0, 0.5), 0.6) == [2] and index.near((23.0, 2.0, 0.5), 0.4) == []
+
+
+def test_furniture_index_overlaps_and_frustum():
+    index = render.FurnitureIndex()
+    for label, x, rotation in [("a", 0.0, 0.0), ("b", 0.9, 45.0), ("c", 1.95, 0.0), ("d", 40.0, 0.0)]:
+        index.add((0, "room"), render.FurnitureInfo(label, np.array([x, 0.0, 0.5]), np.array([1.0, 1.0, 1.0]), rotation, 0.0))
+    assert index.bounds()[1, 1, 0] == pytest.approx(0.9 + np.sqrt(0.5))
+    assert index.overlaps() == [(0, 1), (1, 2)]
+    bounds = (-1.0, 3.0, -1.0, 1.0, 1.0)
+    view = render.Camera(elev=20.0, azim=-90.0).view(bounds)
+    assert index.visible(view, render.Viewport.fit(view, bounds, 200, 100)) == [0, 1, 2]
+
+
+def test_furniture_frustum_query_matches_a_full_scan():
+    rng = np.random.default_rng(11)
+    index = render.FurnitureIndex()
+    for idx, (x, y) in enumerate(rng.uniform(0.0, 60.0, size=(400, 2))):
+        size = rng.uniform(0.3, 2.0, size=3)
+        index.add((idx // 20, "room"), render.FurnitureInfo(str(idx), np.array([x, y, size[2] / 2]), size, rng.uniform(0, 90), 0.0))
+    bounds = (0.0, 20.0, 0.0, 20.0, 3.0)
+    view = render.Camera(elev=30.0, azim=-60.0).view(bounds)
+    viewport = render.Viewport.mplot3d(300, 200)
+    full = np.flatnonzero(render._boxes_in_view(index.bounds(), view, viewport)).tolist()
+    assert index.visible(view, viewport) == full
+    assert 0 < len(full) < len(index)
+
+
+def test_single_frame_lod_skips_furniture_out_of_frame(ctx):
+    room = {"name": "hall", "origin": [0, 0], "size": [80, 4], "height": 3, "wall_color": "#ffffff", "floor": {"color": "#dddddd"},
+            "furniture": [{"label": str(x), "position": [x, 2], "size": [1, 1, 1]} for x in range(2, 80, 4)]}
+    rooms = render.compile_layout({"rooms": [room]})
+    bounds = (0.0, 12.0, 0.0, 4.0, 3.0)
+    policy = render.LodPolicy.for_camera(render.Camera(elev=30.0, azim=-90.0), bounds, 330, 210, cull=True)
+    shown = render.visible_furniture(rooms, render.RenderContext(ctx.light_direction, lod=policy))
+    assert {0, 1, 2} <= shown and 19 not in shown
+    full = render.build_scene(rooms, ctx).polygon_count
+    culled = render.build_scene(rooms, render.RenderContext(ctx.light_direction, lod=policy)).polygon_count
+    assert culled == full - 6 * (20 - len(shown))
+    assert render.visible_furniture(rooms, render.RenderContext(ctx.light_direction, lod=render.LodPolicy(view=policy.view))) is None
+
+
+def test_building_places_shared_apartments(layout, ctx, tmp_path):
+    (tmp_path / "flat.json").write_text(json.dumps(layout, ensure_ascii=False), encoding="utf-8")
+    building = {"apartments": [{"layout": "flat.json", "offset": [12.0 * idx, 0.0]} for idx in range(3)]}
+    composed, apartments = render.load_building(building, tmp_path)
+    assert len(composed["rooms"]) == 3 * len(layout["rooms"]) and composed["render"] == layout["render"]
+    assert apartments[0].rooms is apartments[2].rooms
+    assert apartments[2].bounds()[0, 0] == pytest.approx(24.0)
+
+    camera = render.Camera.from_render(layout["render"])
+    stats = render.RenderStats()
+    scene = render.build_building_scene(apartments, composed, ctx, camera, 4000, 2500, stats=stats)
+    assert [label.text for label in scene.labels] == ["flat 1", "flat 2", "flat 3"]
+    assert stats.total_polygons == scene.polygon_count
+    kinds = [room["kinds"] for room in stats.to_dict()["rooms"]]
+    assert ["build" in apartment for apartment in kinds] == [True, False, False]
+    assert sum(apartment["place"]["polygons"] for apartment in kinds) == scene.polygon_count
+    budget = scene.polygon_count // 2
+    assert render.build_building_scene(apartments, composed, ctx, camera, 4000, 2500, budget).polygon_count <= budget
+    coarsest = render.build_scene(apartments[0].rooms, render.RenderContext(ctx.light_direction, lod=render.LodPolicy(scale=render.LOD_FLOOR_SCALE)))
+    assert render.build_building_scene(apartments, composed, ctx, camera, 4000, 2500, 1).polygon_count == 3 * coarsest.polygon_count
+    with pytest.raises(render.LayoutError, match=r"apartments\[0\]\.layout"):
+        render.load_building({"apartments": [{"offset": [0, 0]}]}, tmp_path)
+
+
+def test_palette_interns_layout_colours(layout):
+    rooms = render.compile_layout(layout)
+    palette = rooms[0].palette
+    assert all(room.palette is palette for room in rooms)
+    colours = {room["wall_color"] for room in layout["rooms"]}
+    assert {palette.hex[room.wall_color] for room in rooms} == colours
+    assert palette.index(layout["rooms"][0]["wall_color"].upper()) == rooms[0].wall_color
+    walls = palette.colors[[room.wall_color for room in rooms]]
+    assert np.allclose(walls, [render.hex_to_rgb(room["wall_color"]) for room in layout["rooms"]])
+    assert not palette.colors.flags.writeable
+
+
+def test_serve_reuses_one_pooled_figure(layout, tmp_path):
+    import io
+
+    lines = [json.dumps({"layout": layout, "output": f"out{idx}.png", "dpi": 30}) for idx in range(3)]
+    lines.insert(1, "{not json")
+    pool = render.FigurePool()
+    log = []
+    count = render.serve(render.iter_stdin_jobs(io.StringIO("\n".join(lines)), tmp_path), pool, log=log.append)
+    assert count == 3
+    assert (pool.created, pool.reused) == (1, 2)
+    assert sorted(p.name for p in tmp_path.glob("*.png")) == ["out0.png", "out1.png", "out2.png"]
+    assert "renders/min" in log[-1]
+
+
+def test_directory_queue_moves_finished_jobs(layout, tmp_path):
+    (tmp_path / "a.json").write_text(json.dumps(layout), encoding="utf-8")
+    jobs = list(render.iter_directory_jobs(tmp_path, once=True))
+    assert [job.output for job in jobs] == [tmp_path / "rendered" / "a.png"]
+    assert (tmp_path / "done" / "a.json").exists() and not (tmp_path / "a.json").exists()
+
+
+def test_directory_queue_moves_failed_jobs_aside(layout, tmp_path, monkeypatch):
+    (tmp_path / "a.json").write_text(json.dumps(layout), encoding="utf-8")
+    (tmp_path / "b.json").write_text("{not json", encoding="utf-8")
+
+    def crash(job, pool, cache=None):
+        raise RuntimeError("renderer crashed")
+
+    monkeypatch.setattr(render, "render_job", crash)
+    log = []
+    assert render.serve(render.iter_directory_jobs(tmp_path, once=True), log=log.append) == 0
+    failed = tmp_path / "failed"
+    assert sorted(p.name for p in failed.iterdir()) == ["a.error.txt", "a.json", "b.error.txt", "b.json"]
+    assert (failed / "a.error.txt").read_text(encoding="utf-8") == "RuntimeError: renderer crashed\n"
+    assert not (tmp_path / "done").exists()
+
+
+def test_shade_cache_is_bounded(ctx, monkeypatch):
+    monkeypatch.setattr(render, "SHADE_CACHE_SIZE", 4)
+    cache = render.MeshTemplateCache()
+    template = cache.get("box", (1.0, 1.0, 1.0))
+    first = cache.shade(template, "#ff0000", 0.0, ctx)
+    for angle in range(1, 10):
+        cache.shade(template, "#ff0000", 0.0, ctx)  # kept as the most recent entry
+        cache.shade(template, "#00ff00", float(angle), ctx)
+    assert len(cache._shades) == 4
+    assert cache.shade(template, "#ff0000", 0.0, ctx) is first
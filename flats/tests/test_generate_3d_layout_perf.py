@@ -0,0 +1,171 @@
+"""Timing and polygon baselines for generate_3d_layout on synthetic layouts.
+
+Each stage is timed on its own, best of N: ``build`` draws the scene with cold
+mesh template, rotation and unit grid caches, ``shading`` replays every toon shader call of such a build
+(template shades and walls/floors) on the same inputs, ``submit`` flushes the
+scene into a fresh 3D axes and ``savefig`` renders that figure to PNG. Results
+are compared with ``render_bench_baseline.json``; polygon counts must match
+exactly.
+
+Stage times are a manual check: they depend on the machine, so a default run
+(and CI) skips them. Run with ``RENDER_BENCH_TIMING=1`` before and after a
+change that may affect speed; times may then exceed the baseline by
+``BASELINE_SLACK`` (scaled by ``RENDER_BENCH_BUDGET_SCALE`` on slow machines).
+
+Run this file directly to print the table, or with ``--update`` to store the
+current numbers as the new baseline after an intended change.
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt  # noqa: E402
+import pytest  # noqa: E402
+
+if __name__ == "__main__":
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "render"))
+
+import generate_3d_layout as render  # noqa: E402
+import synthetic_layouts  # noqa: E402
+
+BASELINE_PATH = Path(__file__).with_name("render_bench_baseline.json")
+BUDGET_SCALE = float(os.environ.get("RENDER_BENCH_BUDGET_SCALE", "1.0"))
+BASELINE_SLACK = 3.0
+timing = pytest.mark.skipif(os.environ.get("RENDER_BENCH_TIMING") != "1", reason="set RENDER_BENCH_TIMING=1 to check stage times")
+STAGES = ("build", "shading", "submit", "savefig")
+# Timed stages render the medium layout; polygon counts are checked for every size.
+TIMED_LAYOUT = "medium"
+
+
+def clear_caches() -> None:
+    """Drop every memoised mesh the renderer keeps between builds."""
+    render.TEMPLATES.clear()
+    for cached in (render.rotation_z, render.unit_grid, render.unit_sphere):
+        cached.cache_clear()
+
+
+def record_shading(layout: dict, ctx: render.RenderContext) -> list:
+    """Arguments of every ``toon_shade_batch`` call made by a cold-cache build."""
+    calls = []
+    shade = render.toon_shade_batch
+
+    def recording(base_colors, normals, shade_ctx):
+        calls.append((base_colors, normals, shade_ctx))
+        return shade(base_colors, normals, shade_ctx)
+
+    clear_caches()
+    render.toon_shade_batch = recording
+    try:
+        render.build_scene(layout, ctx)
+    finally:
+        render.toon_shade_batch = shade
+    return calls
+
+
+def layout_figure(layout: dict):
+    fig = plt.figure(figsize=render.FIGURE_SIZE, dpi=layout["render"]["dpi"])
+    ax = fig.add_subplot(111, projection="3d")
+    render.configure_axes(ax, render.compute_bounds(layout["rooms"]))
+    render.Camera.from_render(layout["render"]).apply(ax)
+    return fig, ax
+
+
+def time_stages(layout: dict, rounds: int = 3) -> dict:
+    """Best-of-``rounds`` seconds per stage and the scene's polygon count."""
+    ctx = render.context_from_render(layout["render"])
+    shading = record_shading(layout, ctx)
+    best = dict.fromkeys(STAGES, float("inf"))
+    polygons = 0
+    for _ in range(rounds):
+        clear_caches()
+        started = time.perf_counter()
+        scene = render.build_scene(layout, ctx)
+        built = time.perf_counter()
+        shade_started = time.perf_counter()
+        for base_colors, normals, shade_ctx in shading:
+            render.toon_shade_batch(base_colors, normals, shade_ctx)
+        shaded = time.perf_counter()
+        fig, ax = layout_figure(layout)
+        submit_started = time.perf_counter()
+        scene.flush(ax)
+        submitted = time.perf_counter()
+        fig.savefig(io.BytesIO(), format="png", dpi=layout["render"]["dpi"])
+        saved = time.perf_counter()
+        plt.close(fig)
+        for name, seconds in zip(STAGES, (built - started, shaded - shade_started, submitted - submit_started, saved - submitted)):
+            best[name] = min(best[name], seconds)
+        polygons = scene.polygon_count
+    return {"polygons": polygons, "seconds": best}
+
+
+def polygon_count(layout: dict) -> int:
+    return render.build_scene(layout, render.context_from_render(layout["render"])).polygon_count
+
+
+def load_baseline() -> dict:
+    return json.loads(BASELINE_PATH.read_text(encoding="utf-8"))
+
+
+@pytest.fixture(scope="module")
+def timings():
+    layout = synthetic_layouts.make_layout(*synthetic_layouts.LAYOUT_SIZES[TIMED_LAYOUT])
+    return time_stages(layout)
+
+
+@pytest.mark.parametrize("name", sorted(synthetic_layouts.LAYOUT_SIZES))
+def test_polygon_counts_match_baseline(name):
+    layout = synthetic_layouts.make_layout(*synthetic_layouts.LAYOUT_SIZES[name])
+    assert polygon_count(layout) == load_baseline()["layouts"][name]["polygons"]
+
+
+@timing
+@pytest.mark.parametrize("stage", STAGES)
+def test_stage_within_baseline(timings, stage):
+    baseline = load_baseline()["layouts"][TIMED_LAYOUT]["seconds"][stage]
+    budget = baseline * BASELINE_SLACK * BUDGET_SCALE
+    elapsed = timings["seconds"][stage]
+    assert elapsed <= budget, f"{stage} took {elapsed * 1e3:.1f} ms, baseline {baseline * 1e3:.1f} ms"
+
+
+def test_build_benchmark(benchmark):
+    layout = synthetic_layouts.make_layout(*synthetic_layouts.LAYOUT_SIZES[TIMED_LAYOUT])
+    ctx = render.context_from_render(layout["render"])
+    benchmark(render.build_scene, layout, ctx)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark generate_3d_layout on synthetic layouts")
+    parser.add_argument("--update", action="store_true", help=f"Write the results to {BASELINE_PATH.name}")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    baseline = load_baseline()["layouts"] if BASELINE_PATH.exists() else {}
+    results = {}
+    print(f"{'layout':<8} {'stage':<8} {'ms':>9} {'baseline':>9} {'ratio':>6}")
+    for name, spec in synthetic_layouts.LAYOUT_SIZES.items():
+        results[name] = time_stages(synthetic_layouts.make_layout(*spec), args.rounds)
+        for stage in STAGES:
+            seconds = results[name]["seconds"][stage]
+            before = baseline.get(name, {}).get("seconds", {}).get(stage)
+            ratio = f"{seconds / before:6.2f}" if before else f"{'-':>6}"
+            before_ms = f"{before * 1e3:9.1f}" if before else f"{'-':>9}"
+            print(f"{name:<8} {stage:<8} {seconds * 1e3:9.1f} {before_ms} {ratio}")
+        print(f"{name:<8} polygons {results[name]['polygons']:>9} {baseline.get(name, {}).get('polygons', '-'):>9}")
+    if args.update:
+        for result in results.values():
+            result["seconds"] = {stage: round(seconds, 4) for stage, seconds in result["seconds"].items()}
+        payload = {"layout_sizes": synthetic_layouts.LAYOUT_SIZES, "layouts": results}
+        BASELINE_PATH.write_text(json.dumps(payload, indent=2) + "\n", encoding="utf-8")
+        print(f"Wrote {BASELINE_PATH}")
+
+
+if __name__ == "__main__":
+    main()